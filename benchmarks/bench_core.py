@@ -0,0 +1,56 @@
+import itertools
+
+from benchmarks.common import create_arg_parser, run_silently
+from dush.core import add_transient_gitignore, install
+from dush.core import git as core_git
+from dush.utils.benchmark import BenchmarkResults
+from dush.utils.paths import LocalOrRemotePath, workspace_path
+
+
+def measure_add_transient_gitignore(results, repetitions, exclude_lines):
+    # Only the .git directory matters for finding the exclude file, so we don't need a real repository.
+    repo_dir = workspace_path / "gitignore_repo"
+    exclude_file = repo_dir / ".git/info/exclude"
+    exclude_file.parent.mkdir(parents=True)
+    with open(exclude_file, "w") as file:
+        for index in range(exclude_lines):
+            file.write(f"build_dir_{index}\n")
+
+    existing_path = repo_dir / f"build_dir_{exclude_lines // 2}"
+    results.measure(
+        "core.add_transient_gitignore.existing_cold",
+        lambda: add_transient_gitignore(existing_path),
+        repetitions,
+        setup=core_git._transient_gitignore_cache.clear,
+    )
+    results.measure("core.add_transient_gitignore.existing_cached", lambda: add_transient_gitignore(existing_path), repetitions)
+
+    new_paths = (repo_dir / f"new_build_dir_{index}" for index in itertools.count())
+    results.measure("core.add_transient_gitignore.new_entry", lambda: add_transient_gitignore(next(new_paths)), repetitions)
+
+
+def measure_install(results, repetitions, files_count):
+    src_dir = workspace_path / "install_src"
+    dst_dir = workspace_path / "install_dst"
+    src_dir.mkdir()
+    dst_dir.mkdir()
+
+    filenames = [f"file_{index}.bin" for index in range(files_count)]
+    content = bytes(range(256)) * 16
+    for filename in filenames:
+        (src_dir / filename).write_bytes(content)
+
+    dst = LocalOrRemotePath.create_mounted(dst_dir)
+    results.measure(f"core.install.{files_count}_files", run_silently(lambda: install(src_dir, dst, filenames, None)), repetitions)
+
+
+if __name__ == "__main__":
+    arg_parser = create_arg_parser("Measure commonly used dush.core functions.")
+    arg_parser.add_argument("--exclude-lines", type=int, default=20000)
+    arg_parser.add_argument("--install-files", type=int, default=500)
+    args = arg_parser.parse_args()
+
+    results = BenchmarkResults("core")
+    measure_add_transient_gitignore(results, args.repetitions, args.exclude_lines)
+    measure_install(results, args.repetitions, args.install_files)
+    results.save(args.output)
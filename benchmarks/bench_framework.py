@@ -0,0 +1,57 @@
+import os
+import time
+
+from benchmarks.common import create_arg_parser
+from dush.framework.command_controller import CommandController
+from dush.framework.command_line_args import CommandLineArgs
+from dush.utils.benchmark import BenchmarkResults
+from dush.utils.run_command import Stdout, run_command
+
+
+def measure_command_line_parsing(results, repetitions):
+    def compile(config="", perform_compilation=False):
+        pass
+
+    def list_tasks(perform_compilation=True, *args):
+        pass
+
+    command_controller = CommandController()
+    command_controller.register_command_multiple(compile)
+    command_controller.register_command_multiple(list_tasks)
+
+    # A single parse takes microseconds, so measure a batch of them and report time per parse.
+    cases = [
+        ("kwargs", ["project.py", "compile", "--config=d", "--perform_compilation=1", "--", "-q"]),
+        ("varargs", ["project.py", "list_tasks", "0", "--all", "--verbose", "--", "-v"]),
+    ]
+    batch_size = 1000
+    for case_name, argv in cases:
+        samples = []
+        for _ in range(repetitions):
+            begin = time.perf_counter()
+            for _ in range(batch_size):
+                CommandLineArgs().parse(command_controller, argv)
+            samples.append((time.perf_counter() - begin) / batch_size)
+        results.add_samples(f"framework.command_line_args_parse.{case_name}", samples)
+
+
+def measure_run_command_overhead(results, repetitions):
+    with open(os.devnull, "w") as devnull:
+        policies = [
+            ("print_to_console", Stdout.print_to_console()),
+            ("ignore", Stdout.ignore()),
+            ("return_back", Stdout.return_back()),
+            ("print_to_file", Stdout.print_to_file(devnull)),
+        ]
+        for policy_name, policy in policies:
+            results.measure(f"framework.run_command_true.{policy_name}", lambda: run_command("true", stdout=policy, stderr=policy), repetitions)
+
+
+if __name__ == "__main__":
+    arg_parser = create_arg_parser("Measure overhead of Dush framework internals.")
+    args = arg_parser.parse_args()
+
+    results = BenchmarkResults("framework")
+    measure_command_line_parsing(results, args.repetitions)
+    measure_run_command_overhead(results, args.repetitions)
+    results.save(args.output)
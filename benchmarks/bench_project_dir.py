@@ -0,0 +1,19 @@
+from benchmarks.common import create_arg_parser
+from dush.utils.benchmark import BenchmarkResults
+from dush.utils.paths import workspace_path
+from dush.utils.project_dir import DushProjectRepository, get_project_dirs
+
+if __name__ == "__main__":
+    arg_parser = create_arg_parser("Measure project loading and workspace lookup.")
+    arg_parser.add_argument("-w", "--workspaces", type=int, required=True)
+    args = arg_parser.parse_args()
+
+    # Populate the workspace with synthetic clones of a project. The workspace directory is created by
+    # run_benchmarks.py separately for each run, so it contains only our directories.
+    for index in range(args.workspaces):
+        (workspace_path / f"benchws{index + 1}").mkdir()
+
+    results = BenchmarkResults("project_dir")
+    results.measure(f"project_dir.load_all.{args.workspaces}_workspaces", lambda: DushProjectRepository().load_all(), args.repetitions)
+    results.measure(f"project_dir.get_project_dirs.{args.workspaces}_workspaces", lambda: get_project_dirs("benchws", "."), args.repetitions)
+    results.save(args.output)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import create_arg_parser
+from dush.utils.benchmark import BenchmarkResults
+
+# Smallest possible project script. It imports Dush the same way real projects do.
+minimal_project_source = """\
+import dush.core as core
+from dush.framework import *
+from dush.utils import *
+
+
+@command
+def noop():
+    pass
+
+
+if __name__ == "__main__":
+    framework.main()
+"""
+
+
+def measure_cold_start(results, project_script, repetitions):
+    # Spawn a new interpreter for every run, so nothing is cached in memory.
+    def run():
+        subprocess.run([sys.executable, str(project_script), "noop", "--", "-q"], check=True, stdout=subprocess.DEVNULL)
+
+    results.measure("startup.framework_main_noop", run, repetitions)
+
+
+def measure_import_time(results, project_script, repetitions):
+    # Python reports import time of each module in microseconds. Top level imports are the ones without any
+    # indentation before the module name and their cumulative times add up to the total import time.
+    samples = []
+    for _ in range(repetitions):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", str(project_script), "list", "--", "-q"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+        total_microseconds = 0
+        for line in process.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            if cumulative.strip() == "cumulative" or name.startswith("  "):
+                continue
+            total_microseconds += int(cumulative)
+        samples.append(total_microseconds / 1000000)
+    results.add_samples("startup.import_minimal_project", samples)
+
+
+if __name__ == "__main__":
+    arg_parser = create_arg_parser("Measure cold start time of Dush project scripts.")
+    args = arg_parser.parse_args()
+
+    results = BenchmarkResults("startup")
+    with tempfile.TemporaryDirectory(prefix="dush_bench_") as tmp_dir:
+        project_script = Path(tmp_dir) / "minimal_project.py"
+        project_script.write_text(minimal_project_source)
+
+        measure_cold_start(results, project_script, args.repetitions)
+        measure_import_time(results, project_script, args.repetitions)
+    results.save(args.output)
@@ -0,0 +1,22 @@
+from argparse import ArgumentParser
+
+
+def create_arg_parser(description):
+    # Every benchmark module is run by run_benchmarks.py in a separate process with a fresh environment. It receives
+    # a path where it should save its results and a number of repetitions for each measurement.
+    arg_parser = ArgumentParser(description=description, allow_abbrev=False)
+    arg_parser.add_argument("-o", "--output", type=str, required=True)
+    arg_parser.add_argument("-r", "--repetitions", type=int, default=20)
+    return arg_parser
+
+
+def run_silently(function):
+    # Wraps a function, so its prints don't disturb the measurements.
+    import contextlib
+    import os
+
+    def wrapper():
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            function()
+
+    return wrapper
@@ -0,0 +1,99 @@
+#!/bin/python
+
+import os
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+repo_path = Path(__file__).parent.parent
+sys.path.insert(0, str(repo_path))
+
+from dush.utils.benchmark import BenchmarkResults
+
+# Each entry is a benchmark module and its extra arguments. Every entry is run in a separate process with its own
+# temporary workspace, so measurements don't affect each other.
+benchmark_runs = [
+    ("bench_startup", []),
+    ("bench_framework", []),
+    ("bench_project_dir", ["--workspaces", "10"]),
+    ("bench_project_dir", ["--workspaces", "100"]),
+    ("bench_project_dir", ["--workspaces", "1000"]),
+    ("bench_core", []),
+]
+
+# Importing everything a minimal project needs must not take longer than this. It's a fixed limit, unlike the
+# relative threshold used for comparing with baseline results.
+import_budget_seconds = 0.075
+
+
+def get_commit_hash():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_path, check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(module_name, module_args, repetitions):
+    with tempfile.TemporaryDirectory(prefix="dush_bench_") as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        workspace_dir = tmp_dir / "workspace"
+        workspace_dir.mkdir()
+        output_path = tmp_dir / "results.json"
+
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join([str(repo_path), env.get("PYTHONPATH", "")])
+        env["DUSH_PATH"] = str(repo_path)
+        env["DUSH_WORKSPACE"] = str(workspace_dir)
+        env["XDG_CACHE_HOME"] = str(tmp_dir / "cache")
+
+        command = [sys.executable, "-m", f"benchmarks.{module_name}", "--output", str(output_path), "--repetitions", str(repetitions)]
+        subprocess.run(command + module_args, env=env, cwd=workspace_dir, check=True)
+        return BenchmarkResults.load(output_path)
+
+
+if __name__ == "__main__":
+    # fmt: off
+    arg_parser = ArgumentParser(description="Run Dush benchmarks and save results to JSON. Optionally compare them with results from another commit.", allow_abbrev=False)
+    arg_parser.add_argument("-o", "--output", type=Path, default=None)
+    arg_parser.add_argument("-r", "--repetitions", type=int, default=20)
+    arg_parser.add_argument("-b", "--baseline", type=Path, default=None)
+    arg_parser.add_argument("-t", "--threshold", type=float, default=1.25)
+    arg_parser.add_argument("-f", "--filter", type=str, default="")
+    args = arg_parser.parse_args()
+    # fmt: on
+
+    results = BenchmarkResults("dush", {"commit": get_commit_hash()})
+    for module_name, module_args in benchmark_runs:
+        if args.filter not in module_name:
+            continue
+        print(f"Running {module_name} {' '.join(module_args)}")
+        results.merge(run_benchmark(module_name, module_args, args.repetitions))
+
+    print()
+    print("Results:")
+    results.print_summary()
+    if args.output is not None:
+        results.save(args.output)
+        print(f"Saved results to {args.output}")
+
+    success = True
+    import_time = results.results.get("startup.import_minimal_project")
+    if import_time is not None and import_time["median"] > import_budget_seconds:
+        print(f"ERROR: importing a minimal project takes {import_time['median']:.3f}s, budget is {import_budget_seconds:.3f}s")
+        success = False
+
+    if args.baseline is not None:
+        baseline = BenchmarkResults.load(args.baseline)
+        regressions = results.compare(baseline, args.threshold)
+        print()
+        if regressions:
+            print(f"Regressions compared to {args.baseline} (threshold {args.threshold}x):")
+            for regression in regressions:
+                print(f"    {regression}")
+            success = False
+        else:
+            print(f"No regressions compared to {args.baseline} (threshold {args.threshold}x)")
+
+    sys.exit(0 if success else 1)
@@ -1,28 +1,78 @@
-from dush.core.clean import clean
-from dush.core.cmake import cmake
-from dush.core.compile import (
-    compile_with_cmake,
-    compile_with_make,
-    compile_with_msbuild,
-    compile_with_ninja,
-    compile_with_nmake,
-    extract_target_names_from_msbuild_metaproj,
+from dush.utils.lazy_import import make_package_lazy
+
+# Submodules are imported on first use of their attributes. Some of them are expensive to import (e.g. Gerrit
+# client or MSBuild helpers) and most commands don't need them.
+__all__, __getattr__, __dir__ = make_package_lazy(
+    __name__,
+    {
+        "dush.core.clean": [
+            "clean",
+        ],
+        "dush.core.cmake": [
+            "cmake",
+        ],
+        "dush.core.compile": [
+            "compile_with_cmake",
+            "compile_with_make",
+            "compile_with_msbuild",
+            "compile_with_ninja",
+            "compile_with_nmake",
+            "extract_target_names_from_msbuild_metaproj",
+        ],
+        "dush.core.download": [
+            "DownloadError",
+            "download_and_extract_zip",
+            "download_file",
+            "download_files",
+            "evict_download",
+            "extract_zip",
+        ],
+        "dush.core.gerrit": [
+            "GerritClient",
+            "checkout_gerrit_change_https",
+            "checkout_gerrit_stack_https",
+            "push_gerrit_change",
+        ],
+        "dush.core.git": [
+            "add_transient_gitignore",
+            "checkout",
+            "cherrypick",
+            "fetch",
+            "find_baseline_commit",
+            "find_git_dir",
+            "gc",
+            "get_branch",
+            "get_commit_hash",
+            "get_git_exclude_file",
+            "rebase",
+            "reset_repo",
+            "update_submodules",
+        ],
+        "dush.core.gtest": [
+            "TestsFailedError",
+            "list_gtests",
+            "run_gtests_sharded",
+        ],
+        "dush.core.install": [
+            "install",
+        ],
+        "dush.core.meson": [
+            "meson_configure",
+            "meson_setup",
+        ],
+        "dush.core.qmake": [
+            "qmake",
+            "qmake_deploy",
+        ],
+        "dush.core.unlock": [
+            "unlock",
+        ],
+        "dush.core.xephyr": [
+            "NoDisplayAvailableError",
+            "XDisplay",
+            "reap_stale_x_locks",
+            "reserve_x_display",
+            "reserve_x_displays",
+        ],
+    },
 )
-from dush.core.gerrit import checkout_gerrit_change_https, push_gerrit_change
-from dush.core.git import (
-    add_transient_gitignore,
-    checkout,
-    cherrypick,
-    fetch,
-    find_baseline_commit,
-    gc,
-    get_branch,
-    get_commit_hash,
-    rebase,
-    reset_repo,
-    update_submodules,
-)
-from dush.core.install import install
-from dush.core.meson import meson_configure, meson_setup
-from dush.core.qmake import qmake, qmake_deploy
-from dush.core.unlock import unlock
@@ -6,10 +6,6 @@ from dush.utils.build_config import Bitness, Compiler
 from dush.utils.os_function import is_linux
 
 
-class IncorrectGitWorkspaceError(Exception):
-    pass
-
-
 def generate_config_options(config):
     def append_linux_single_config_32bit_options(config, options):
         if is_linux() and config.bitness == Bitness.x32:
@@ -1,7 +1,5 @@
-import multiprocessing
 import os
 import re
-import xml.etree.ElementTree as XmlElementTree
 from pathlib import Path
 
 from dush.utils import EnvPath, windows_only
@@ -65,7 +63,7 @@ def compile_with_msbuild(msbuild_path, config, solution_path, targets, env={}, t
 def compile_with_make(target="", directory=None, *, additional_paths=[], additional_env={}, all_cores=True, verbose=False):
     parallelism_arg = ""
     if all_cores:
-        parallelism_arg = f"-j{multiprocessing.cpu_count()}"
+        parallelism_arg = f"-j{os.cpu_count()}"
 
     env = additional_env.copy()
     if verbose:
@@ -97,6 +95,7 @@ def extract_target_names_from_msbuild_metaproj(msbuild_path, config, solution_pa
     Project names shown by the Visual Studio IDE are not what MSBuild expects when building from commandline. Their
     MSBuild counterparts are called targets. This function extract targets from .sln file.
     """
+    import xml.etree.ElementTree as XmlElementTree
 
     # First build with MSBuildEmitSolution=1 to produce .sln.metaproj files.
     # See https://stackoverflow.com/questions/13915636/specify-project-file-of-a-solution-using-msbuild/40372894#40372894
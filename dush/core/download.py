@@ -0,0 +1,170 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from pathlib import Path, PurePosixPath
+
+from dush.utils import FileLock, get_cache_dir
+
+# Files are read and written in chunks of this size, so huge archives never have to fit in memory
+CHUNK_SIZE = 1024 * 1024
+
+DOWNLOAD_ATTEMPTS = 3
+DOWNLOAD_TIMEOUT_SECONDS = 60
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _get_cache_key(url, sha256):
+    return hashlib.sha256(f"{url}\n{sha256 or ''}".encode()).hexdigest()
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _download_to_part_file(url, part_path):
+    # Continues from the end of a partial file left by an interrupted download if the server supports ranges.
+    # Servers ignoring the Range header respond with the whole file, which is then written from scratch.
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    request = urllib.request.Request(url)
+    if offset > 0:
+        request.add_header("Range", f"bytes={offset}-")
+
+    try:
+        response = urllib.request.urlopen(request, timeout=DOWNLOAD_TIMEOUT_SECONDS)
+    except urllib.error.HTTPError as error:
+        if error.code == 416 and offset > 0:
+            # Range not satisfiable. The partial file is probably complete or belongs to a different version.
+            part_path.unlink()
+            return _download_to_part_file(url, part_path)
+        raise
+
+    with response:
+        is_resumed = response.status == 206
+        expected_size = response.headers.get("Content-Length")
+        expected_size = int(expected_size) + (offset if is_resumed else 0) if expected_size is not None else None
+        with open(part_path, "ab" if is_resumed else "wb") as file:
+            while chunk := response.read(CHUNK_SIZE):
+                file.write(chunk)
+
+    actual_size = part_path.stat().st_size
+    if expected_size is not None and actual_size != expected_size:
+        raise DownloadError(f"Download of {url} was cut short ({actual_size} of {expected_size} bytes)")
+
+
+def download_file(url, sha256=None):
+    """
+    Downloads a file to the download cache and returns its path. The cache is shared by all projects and
+    workspaces, so each file is downloaded only once. Entries are keyed by the url and the expected SHA-256 hash,
+    so changing the hash in a script causes a redownload. Interrupted downloads are resumed. If sha256 is given,
+    content of the file is verified and mismatched downloads are discarded.
+    """
+
+    cache_dir = get_cache_dir("downloads")
+    key = _get_cache_key(url, sha256)
+    file_path = cache_dir / key
+    part_path = cache_dir / f"{key}.part"
+    metadata_path = cache_dir / f"{key}.json"
+
+    # Processes downloading the same file wait for each other instead of writing to the same partial file
+    with open(cache_dir / f"{key}.lock", "a") as lock_file, FileLock(lock_file):
+        if file_path.is_file():
+            return file_path
+
+        print(f"Downloading {url}")
+        start_time = time.monotonic()
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                _download_to_part_file(url, part_path)
+                break
+            except (OSError, DownloadError) as error:
+                if attempt == DOWNLOAD_ATTEMPTS or (isinstance(error, urllib.error.HTTPError) and error.code < 500):
+                    raise DownloadError(f"Failed to download {url}: {error}") from error
+                print(f"WARNING: Download of {url} failed ({error}), retrying")
+
+        actual_sha256 = _hash_file(part_path)
+        if sha256 is not None and actual_sha256 != sha256.lower():
+            part_path.unlink()
+            raise DownloadError(f"Hash mismatch for {url}: expected {sha256}, got {actual_sha256}")
+
+        with open(metadata_path, "w") as file:
+            json.dump({"url": url, "sha256": actual_sha256, "size": part_path.stat().st_size}, file)
+        os.replace(part_path, file_path)
+        print(f"Downloaded {url} ({file_path.stat().st_size} bytes) in {time.monotonic() - start_time:.1f}s")
+        return file_path
+
+
+def download_files(downloads, jobs=4):
+    """
+    Downloads multiple files concurrently. Each element of downloads is either an url or a tuple of an url and
+    the expected SHA-256 hash. Returns cached paths in the same order.
+    """
+
+    downloads = [(download, None) if isinstance(download, str) else download for download in downloads]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(download_file, url, sha256) for url, sha256 in downloads]
+        return [future.result() for future in futures]
+
+
+def evict_download(url, sha256=None):
+    # Removes a cached file, e.g. when it turned out to be corrupted during extraction.
+    key = _get_cache_key(url, sha256)
+    cache_dir = get_cache_dir("downloads")
+    for path in (cache_dir / key, cache_dir / f"{key}.json"):
+        path.unlink(missing_ok=True)
+
+
+def extract_zip(zip_path, destination_dir, directory_inside_zip=None):
+    """
+    Extracts a zip archive to the destination directory. If directory_inside_zip is specified, only its content
+    is extracted and placed directly in the destination directory. Members are streamed straight to their final
+    paths and their CRCs are verified by zipfile. Unix permissions are preserved, so executables stay executable.
+    """
+
+    destination_dir = Path(destination_dir)
+    destination_dir.mkdir(parents=True, exist_ok=True)
+    prefix = PurePosixPath(directory_inside_zip) if directory_inside_zip else None
+
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            member_path = PurePosixPath(member.filename)
+            if prefix is not None:
+                if not member_path.is_relative_to(prefix) or member_path == prefix:
+                    continue
+                member_path = member_path.relative_to(prefix)
+            if member_path.is_absolute() or ".." in member_path.parts:
+                raise DownloadError(f"Refusing to extract {member.filename} outside of {destination_dir}")
+
+            target_path = destination_dir.joinpath(*member_path.parts)
+            if member.is_dir():
+                target_path.mkdir(parents=True, exist_ok=True)
+                continue
+
+            target_path.parent.mkdir(parents=True, exist_ok=True)
+            with archive.open(member) as source, open(target_path, "wb") as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+
+            unix_mode = (member.external_attr >> 16) & 0o777
+            if unix_mode:
+                os.chmod(target_path, unix_mode)
+
+
+def download_and_extract_zip(url, destination_dir, directory_inside_zip=None, sha256=None):
+    zip_path = download_file(url, sha256)
+    try:
+        extract_zip(zip_path, destination_dir, directory_inside_zip)
+    except zipfile.BadZipFile:
+        evict_download(url, sha256)
+        raise
@@ -1,98 +1,202 @@
 import base64
 import http.client
 import json
-from urllib.parse import urlparse
+import os
+from contextlib import ExitStack
+from urllib.parse import quote, urlparse
 
-from dush.utils import CommandError, Stdin, Stdout, run_command
+from dush.core.git import find_git_dir, get_branch
+from dush.utils import CommandError, Stdin, Stdout, get_cache_dir, run_command
 
 
 class GerritError(Exception):
     pass
 
 
-def get_gerrit_lastest_change_revision(base_url, change_id):
-    # Get credentials from git. This assumes we already used git to clone the repo and have credentials stored.
-    creds = run_command("git credential fill", stdin=Stdin.string(f"url={base_url}\n\n"), stdout=Stdout.return_back(), stderr=Stdout.ignore()).stdout
-    creds = dict(line.split("=", 1) for line in creds.splitlines() if "=" in line)
-    username = creds.get("username")
-    password = creds.get("password")
-
-    # Prepare Basic Auth header
-    auth_str = f"{username}:{password}"
-    auth_header = base64.b64encode(auth_str.encode()).decode()
-
-    # Make HTTPS request to gerrit
-    host = urlparse(base_url).netloc
-    conn = http.client.HTTPSConnection(host)
-    headers = {"Authorization": f"Basic {auth_header}"}
-    conn.request("GET", f"/a/changes/{change_id}/detail", headers=headers)
-    response = conn.getresponse()
-    if response.status != 200:
-        raise GerritError("Could not fetch change details from Gerrit")
-    detail_data = response.read().decode()
-
-    # Step 5: Strip Gerrit XSSI prefix and parse JSON
-    detail_data = detail_data.lstrip(")]}'\n")
-    detail_data = json.loads(detail_data)
-
-    with open("output.json", "w", encoding="utf-8") as f:
-        json.dump(detail_data, f, indent=4, ensure_ascii=False)
-
-    # Step 6: Output (for example, latest ref)
-    latest_revision = 0
-    for message in detail_data["messages"]:
-        if "_revision_number" in message:
-            revision = int(message["_revision_number"])
-            if revision > latest_revision:
-                latest_revision = revision
-
-    if latest_revision == 0:
-        raise GerritError("No patch sets found")
-
-    return latest_revision
-
-
-def checkout_gerrit_change_https(base_url, repo, change_id, force):
-    # Get latest revision
-    print("Retrieving latest revision for change", change_id)
-    revision = get_gerrit_lastest_change_revision(base_url, change_id)
-    print("Latest revision is", revision)
-    print()
-
-    # Fetch the change
-    command = f"git fetch {base_url}/a/{repo} refs/changes/{str(change_id)[-2:]}/{change_id}/{revision}"
-    print("Fetching the change")
-    print(command)
-    run_command(command)
-    print()
-
-    # Get fetched commit hash and existing branch commit hash (if exists)
-    branch = f"gerrit_{change_id}"
-    fetch_commit = run_command("git rev-parse FETCH_HEAD", stdout=Stdout.return_back(), stderr=Stdout.ignore()).stdout.strip()
-    try:
-        existing_commit = run_command(f"git rev-parse {branch}", stdout=Stdout.return_back(), stderr=Stdout.ignore()).stdout.strip()
-    except CommandError:
-        existing_commit = None
-
-    # Checkout into a branch
-    if existing_commit:
-        if existing_commit == fetch_commit:
-            run_command(f"git checkout {branch}")
-            print(f"Branch {branch} already exists and is up to date.")
-        elif force:
-            print(f"Branch {branch} already exists but points to a different commit - {existing_commit[:7]}. Recreating it.")
-            run_command("git checkout -f FETCH_HEAD")
-            run_command(f"git branch -D {branch}")
-            run_command(f"git checkout -b {branch}")
-        else:
-            raise GerritError(f"Branch {branch} already exists but points to a different commit. Please delete it first.")
-    else:
-        run_command(f"git checkout -b {branch} FETCH_HEAD")
-        print(f"Fetched into branch {branch}")
-
-
-def push_gerrit_change(remote, target_branch):
-    # Push the current branch to Gerrit
-    command = f"git push {remote} HEAD:refs/for/{target_branch}"
-    print(command)
-    run_command(command)
+class GerritClient:
+    """
+    Client for Gerrit REST API. Credentials are taken from git only once and all requests go through a single
+    keep-alive connection. Queried changes are cached on disk and revalidated with ETags, so a change that didn't
+    get updated is not downloaded again.
+    """
+
+    json_prefix = ")]}'"
+
+    def __init__(self, base_url, cache_dir=None):
+        parsed_url = urlparse(base_url)
+        self._base_url = base_url
+        self._is_https = parsed_url.scheme != "http"
+        self._host = parsed_url.netloc
+        self._path_prefix = parsed_url.path.rstrip("/")
+        self._cache_dir = cache_dir if cache_dir is not None else get_cache_dir("gerrit", self._host.replace(":", "_"))
+        self._auth_header = None
+        self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get_change(self, change_id):
+        # Revalidate cached change with its ETag. If nothing changed, Gerrit will return an empty 304 response.
+        cache_entry = self._read_cache_entry(change_id)
+        headers = {}
+        if cache_entry is not None and cache_entry.get("etag"):
+            headers["If-None-Match"] = cache_entry["etag"]
+
+        status, etag, data = self._request(f"/changes/{quote(str(change_id), safe='')}?o=CURRENT_REVISION", headers)
+        if status == 304:
+            return cache_entry["change"]
+        if status != 200:
+            raise GerritError(f"Could not fetch change {change_id} from Gerrit (HTTP {status})")
+
+        change = self._parse_json(data)
+        self._write_cache_entry(change_id, etag, change)
+        return change
+
+    def get_changes(self, change_ids):
+        # Query all changes in one request. Returned list is ordered the same way as change_ids. The query doesn't
+        # support ETags, so cache entries are refreshed when the 'updated' timestamp of a change differs.
+        change_ids = [str(change_id) for change_id in change_ids]
+        if not change_ids:
+            return []
+        query = "+OR+".join(f"change:{quote(change_id, safe='')}" for change_id in dict.fromkeys(change_ids))
+        status, _, data = self._request(f"/changes/?q={query}&o=CURRENT_REVISION")
+        if status != 200:
+            raise GerritError(f"Could not query changes {', '.join(change_ids)} from Gerrit (HTTP {status})")
+
+        changes = {}
+        for change in self._parse_json(data):
+            changes[str(change["_number"])] = change
+            changes[change["change_id"]] = change
+            changes[change["id"]] = change
+
+        result = []
+        for change_id in change_ids:
+            change = changes.get(change_id)
+            if change is None:
+                raise GerritError(f"Change {change_id} not found")
+            cache_entry = self._read_cache_entry(change["_number"])
+            if cache_entry is None or cache_entry.get("updated") != change["updated"]:
+                self._write_cache_entry(change_id, None, change)
+            result.append(change)
+        return result
+
+    def get_related_changes(self, change_id, revision="current"):
+        # Returns the whole relation chain of a change (both ancestors and descendants), newest first. Changes
+        # without any relations return an empty list.
+        status, _, data = self._request(f"/changes/{quote(str(change_id), safe='')}/revisions/{revision}/related")
+        if status != 200:
+            raise GerritError(f"Could not fetch related changes of {change_id} from Gerrit (HTTP {status})")
+        return self._parse_json(data)["changes"]
+
+    def get_current_revision(self, change_id):
+        change = self.get_change(change_id)
+        return GerritClient.extract_current_revision(change)
+
+    @staticmethod
+    def extract_current_revision(change):
+        # Returns a tuple of patchset number, its ref and commit hash.
+        commit = change.get("current_revision")
+        if commit is None:
+            raise GerritError("No patch sets found")
+        revision = change["revisions"][commit]
+        return (revision["_number"], revision["ref"], commit)
+
+    def _request(self, endpoint, headers={}):
+        headers = headers.copy()
+        headers["Authorization"] = self._get_auth_header()
+        path = f"{self._path_prefix}/a{endpoint}"
+
+        # Server may close an idle keep-alive connection at any time. Reconnect once in such case.
+        for attempt in range(2):
+            try:
+                connection = self._get_connection()
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                return (response.status, response.getheader("ETag"), data)
+            except ConnectionError:
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def _get_connection(self):
+        if self._connection is None:
+            connection_class = http.client.HTTPSConnection if self._is_https else http.client.HTTPConnection
+            self._connection = connection_class(self._host)
+        return self._connection
+
+    def _get_auth_header(self):
+        # Get credentials from git. This assumes we already used git to clone the repo and have credentials stored.
+        if self._auth_header is None:
+            creds = run_command(
+                "git credential fill", stdin=Stdin.string(f"url={self._base_url}\n\n"), stdout=Stdout.return_back(), stderr=Stdout.ignore()
+            ).stdout
+            creds = dict(line.split("=", 1) for line in creds.splitlines() if "=" in line)
+            username = creds.get("username")
+            password = creds.get("password")
+
+            auth_str = f"{username}:{password}"
+            self._auth_header = "Basic " + base64.b64encode(auth_str.encode()).decode()
+        return self._auth_header
+
+    def _parse_json(self, data):
+        # Strip Gerrit XSSI prefix
+        data = data.decode()
+        if data.startswith(GerritClient.json_prefix):
+            data = data[len(GerritClient.json_prefix) :]
+        return json.loads(data)
+
+    def _get_cache_file(self, change_number):
+        return self._cache_dir / f"{change_number}.json"
+
+    def _get_alias_file(self, change_id):
+        return self._cache_dir / "aliases" / quote(change_id, safe="")
+
+    def _resolve_change_number(self, change_id):
+        # Changes are cached by their numbers, so a change queried both by its number and its Change-Id is stored
+        # once. Other identifiers are mapped to numbers with alias files, which never change once written.
+        change_id = str(change_id)
+        if change_id.isdigit():
+            return change_id
+        try:
+            return self._get_alias_file(change_id).read_text().strip()
+        except FileNotFoundError:
+            return None
+
+    def _read_cache_entry(self, change_id):
+        change_number = self._resolve_change_number(change_id)
+        if change_number is None:
+            return None
+        try:
+            with open(self._get_cache_file(change_number), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_cache_entry(self, change_id, etag, change):
+        cache_entry = {
+            "etag": etag,
+            "updated": change.get("updated"),
+            "change": change,
+        }
+        change_number = str(change["_number"])
+        self._write_file_atomically(self._get_cache_file(change_number), json.dumps(cache_entry, ensure_ascii=False))
+        if self._resolve_change_number(change_id) != change_number:
+            alias_file = self._get_alias_file(str(change_id))
+            alias_file.parent.mkdir(exist_ok=True)
+            self._write_file_atomically(alias_file, change_number)
+
+    @staticmethod
+    def _write_file_atomically(path, content):
+        tmp_file = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as file:
+            file.write(content)
+        tmp_file.replace(path)
@@ -1,64 +1,107 @@
+import os
 from pathlib import Path
 
-from dush.utils import CommandError, RaiiChdir, Stdout, run_command
+from dush.utils import CommandError, FileLock, RaiiChdir, Stdout, run_command
 
 
 class GithubNotAllowed(Exception):
     pass
 
 
-github_error = None
-try:
-    from github import Github
-except ImportError:
-    github_error = GithubNotAllowed("PyGithub library is not installed")
+def import_github():
+    # PyGithub is optional and slow to import, so only import it when it's really needed.
+    try:
+        from github import Github
+    except ImportError:
+        raise GithubNotAllowed("PyGithub library is not installed")
+    return Github
 
 
 class IncorrectProjectDirectory(Exception):
     pass
 
 
-def add_transient_gitignore(path_to_ignore):
-    def find_exclude_file(git_dir):
-        if git_dir.is_dir():
-            # We are in a normal git repository with a .git directory
-            return git_dir / "info/exclude"
-        elif git_dir.is_file():
-            # We are in a submodule with a .git file. It contains a path
-            # to the git directory of this module.
-            with open(".git", "r") as file:
+class IncorrectGitWorkspaceError(Exception):
+    pass
+
+
+def find_git_dir(path):
+    """
+    Walks up from the path to find the root of its work tree and the git directory. This is the same thing git
+    rev-parse does, but without spawning a process. Submodules and worktrees contain a .git file instead of a
+    directory. The file contains a path to the actual git directory of the module.
+    """
+    path = Path(os.path.abspath(path))
+    for directory in (path, *path.parents):
+        dot_git = directory / ".git"
+        if dot_git.is_dir():
+            return (directory, dot_git)
+        elif dot_git.is_file():
+            with open(dot_git, "r") as file:
                 for line in file.readlines():
                     prefix = "gitdir: "
                     if line.startswith(prefix):
                         module_git_dir = line[len(prefix) :]
                         module_git_dir = module_git_dir.strip()
-                        module_git_dir = git_dir.parent / module_git_dir
+                        module_git_dir = directory / module_git_dir
                         module_git_dir = module_git_dir.resolve()
-                        return find_exclude_file(module_git_dir)
-            raise IncorrectGitWorkspaceError(f"{git_dir} does not contain gitdir line")
-        else:
-            raise IncorrectGitWorkspaceError(f"{git_dir} does not exist")
-
-    # Get the path to exclude file
-    top_level_dir = run_command("git rev-parse --show-toplevel", stdout=Stdout.return_back()).stdout
-    top_level_dir = top_level_dir.strip()
-    top_level_dir = Path(top_level_dir)
-    git_dir = top_level_dir / ".git"
-    exclude_file = find_exclude_file(git_dir)
-
-    # Gather existing lines in the exclude file
-    with open(exclude_file, "r") as file:
-        existing_lines = file.read()
-        existing_lines = existing_lines.split("\n")
-
-    # Add build dir if neccessary
+                        return (directory, module_git_dir)
+            raise IncorrectGitWorkspaceError(f"{dot_git} does not contain gitdir line")
+    raise IncorrectGitWorkspaceError(f"{path} is not inside a git repository")
+
+
+def get_git_exclude_file(git_dir):
+    # Worktrees have their own git directories, but they share info/exclude with the main repository. Their
+    # git directory contains a commondir file pointing to it.
+    commondir_file = git_dir / "commondir"
+    if commondir_file.is_file():
+        with open(commondir_file, "r") as file:
+            git_dir = (git_dir / file.read().strip()).resolve()
+    return git_dir / "info/exclude"
+
+
+# Entries found in info/exclude files, keyed by path to the exclude file. Stat signature of the file is kept along
+# the entries, so we notice when someone else modifies the file.
+_transient_gitignore_cache = {}
+
+
+def add_transient_gitignore(path_to_ignore):
+    def get_file_signature(file_path):
+        try:
+            stat = file_path.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    # Get the path to exclude file and the line we want to have inside it
+    top_level_dir, git_dir = find_git_dir(path_to_ignore)
+    exclude_file = get_git_exclude_file(git_dir)
+    path_to_ignore = Path(os.path.abspath(path_to_ignore))
     path_to_ignore = path_to_ignore.relative_to(top_level_dir)
-    path_to_ignore = str(path_to_ignore)
-    if path_to_ignore not in existing_lines:
-        with open(exclude_file, "w") as file:
-            for line in existing_lines:
-                file.write(f"{line}\n")
+    path_to_ignore = path_to_ignore.as_posix()
+    if path_to_ignore == ".":
+        return
+
+    # Early return if we've already seen the line and the file hasn't changed since then
+    cached_signature, cached_lines = _transient_gitignore_cache.get(exclude_file, (None, None))
+    if cached_lines is not None and path_to_ignore in cached_lines and cached_signature == get_file_signature(exclude_file):
+        return
+
+    # Append the line if neccessary. Other Dush processes may be appending to the same file right now, so do it
+    # under a lock and gather existing lines only after taking it.
+    exclude_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(exclude_file, "a+") as file, FileLock(file):
+        file.seek(0)
+        content = file.read()
+        existing_lines = set(line.strip() for line in content.split("\n"))
+
+        if path_to_ignore not in existing_lines:
+            if content and not content.endswith("\n"):
+                file.write("\n")
             file.write(f"{path_to_ignore}\n")
+            existing_lines.add(path_to_ignore)
+
+    _transient_gitignore_cache[exclude_file] = (get_file_signature(exclude_file), existing_lines)
 
 
 def reset_repo(directory="."):
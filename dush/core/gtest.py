@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import statistics
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+from dush.utils import Stdout, get_cache_dir, run_command, start_command
+
+# Linux limits length of a single command line argument to 128KiB. Longer test filters cannot be passed.
+MAX_GTEST_FILTER_LENGTH = 100 * 1024
+
+
+class TestsFailedError(Exception):
+    pass
+
+
+def list_gtests(binary, test_filter="", cwd=None, env={}):
+    # Output of --gtest_list_tests looks like below. Parametrized tests have comments after names.
+    #   SuiteA.
+    #     Test1
+    #     Test2  # GetParam() = 4
+    command = f"{binary} --gtest_list_tests"
+    if test_filter:
+        command += f" --gtest_filter={test_filter}"
+    output = run_command(command, stdout=Stdout.return_back(), cwd=cwd, env=env).stdout
+
+    tests = []
+    suite = None
+    for line in output.splitlines():
+        name = line.split("#")[0].rstrip()
+        if not name.strip():
+            continue
+        if not line.startswith(" "):
+            suite = name.strip()
+        elif suite is not None:
+            tests.append(f"{suite}{name.strip()}")
+    return tests
+
+
+class _TestDurations:
+    # Durations of tests from previous runs kept in user's cache directory. Used to balance shards.
+    def __init__(self, binary):
+        key = hashlib.sha1(str(Path(binary).absolute()).encode()).hexdigest()
+        self._path = get_cache_dir("gtest") / f"{key}.json"
+        try:
+            with open(self._path, "r") as file:
+                self._durations = json.load(file)
+        except (OSError, ValueError):
+            self._durations = {}
+
+    def is_empty(self):
+        return not self._durations
+
+    def get_estimates(self, tests):
+        # Tests which have not been run yet are assumed to take a typical time.
+        default_duration = statistics.median(self._durations.values()) if self._durations else 0.0
+        return {test: self._durations.get(test, default_duration) for test in tests}
+
+    def update(self, durations):
+        self._durations.update(durations)
+        tmp_path = self._path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self._durations, file)
+        os.replace(tmp_path, self._path)
+
+
+def _split_tests_by_duration(estimates, shards_count):
+    # Greedy longest-first assignment to the least loaded shard. It's not optimal, but close enough.
+    shards = [[] for _ in range(shards_count)]
+    loads = [0.0] * shards_count
+    for test, duration in sorted(estimates.items(), key=lambda item: item[1], reverse=True):
+        index = loads.index(min(loads))
+        shards[index].append(test)
+        loads[index] += duration
+    return [shard for shard in shards if shard]
+
+
+def _merge_results(xml_paths, merged_xml_path):
+    # Gtest writes one <testsuites> root with <testsuite> children containing <testcase> elements. Tests of one
+    # suite can be spread across shards, so suites with the same name are merged and their counters summed.
+    counters = ("tests", "failures", "disabled", "errors", "skipped")
+    merged_root = ElementTree.Element("testsuites", name="AllTests")
+    merged_suites = {}
+    test_cases = []
+    for xml_path in xml_paths:
+        root = ElementTree.parse(xml_path).getroot()
+        for suite in root.findall("testsuite"):
+            merged_suite = merged_suites.get(suite.get("name"))
+            if merged_suite is None:
+                merged_suite = ElementTree.SubElement(merged_root, "testsuite", name=suite.get("name"))
+                for counter in counters:
+                    merged_suite.set(counter, "0")
+                merged_suite.set("time", "0")
+                merged_suites[suite.get("name")] = merged_suite
+
+            for counter in counters:
+                value = int(merged_suite.get(counter)) + int(suite.get(counter, "0"))
+                merged_suite.set(counter, str(value))
+            merged_suite.set("time", f"{float(merged_suite.get('time')) + float(suite.get('time', '0')):.3f}")
+
+            for test_case in suite.findall("testcase"):
+                merged_suite.append(test_case)
+                test_cases.append(test_case)
+
+    for counter in counters:
+        merged_root.set(counter, str(sum(int(suite.get(counter)) for suite in merged_suites.values())))
+    merged_root.set("time", f"{sum(float(suite.get('time')) for suite in merged_suites.values()):.3f}")
+
+    ElementTree.indent(merged_root)
+    ElementTree.ElementTree(merged_root).write(merged_xml_path, encoding="utf-8", xml_declaration=True)
+    return test_cases
+
+
+def run_gtests_sharded(binary, shards_count=None, test_filter="", output_dir=None, cwd=None, env={}, slowest_tests_count=10):
+    """
+    Runs gtest binary in multiple concurrent processes, each executing a part of tests. When durations of tests
+    from previous runs are known, tests are distributed to shards with explicit filters, so all shards take similar
+    time. Otherwise the built-in sharding of gtest is used (GTEST_TOTAL_SHARDS and GTEST_SHARD_INDEX environment
+    variables), which splits tests by count. Output of each shard is saved to a log file and results are merged to
+    a single XML report. Raises TestsFailedError if any test failed or any shard crashed.
+    """
+
+    binary = Path(binary).absolute()
+    if shards_count is None:
+        shards_count = os.cpu_count()
+    if output_dir is None:
+        output_dir = binary.parent / "gtest_results"
+    output_dir = Path(output_dir).absolute()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Prepare arguments of each shard
+    durations = _TestDurations(binary)
+    tests = list_gtests(binary, test_filter, cwd=cwd, env=env)
+    if not tests:
+        print("No tests to run")
+        return
+    shards_count = min(shards_count, len(tests))
+    shard_filters = None
+    if not durations.is_empty():
+        shards = _split_tests_by_duration(durations.get_estimates(tests), shards_count)
+        shard_filters = [":".join(shard) for shard in shards]
+        if any(len(shard_filter) > MAX_GTEST_FILTER_LENGTH for shard_filter in shard_filters):
+            shard_filters = None
+    if shard_filters is not None:
+        shard_args = [(f"--gtest_filter={shard_filter}", {}) for shard_filter in shard_filters]
+        print(f"Running {len(tests)} tests in {len(shard_args)} shards balanced by duration")
+    else:
+        filter_arg = f"--gtest_filter={test_filter}" if test_filter else ""
+        shard_args = [(filter_arg, {"GTEST_TOTAL_SHARDS": shards_count, "GTEST_SHARD_INDEX": index}) for index in range(shards_count)]
+        print(f"Running {len(tests)} tests in {len(shard_args)} shards")
+
+    # Start all shards and wait for them. Outputs go to files, so pipes do not fill up.
+    commands = []
+    log_files = []
+    xml_paths = []
+    try:
+        for index, (filter_arg, shard_env) in enumerate(shard_args):
+            xml_path = output_dir / f"shard_{index}.xml"
+            xml_path.unlink(missing_ok=True)
+            xml_paths.append(xml_path)
+            log_file = open(output_dir / f"shard_{index}.log", "w")
+            log_files.append(log_file)
+
+            command = f"{binary} {filter_arg} --gtest_output=xml:{xml_path}"
+            commands.append(start_command(command, stdout=Stdout.print_to_file(log_file), stderr=Stdout.print_to_file(log_file), cwd=cwd, env={**env, **shard_env}))
+        for command in commands:
+            command.wait(ignore_error=True)
+    finally:
+        for command in commands:
+            if command.is_running():
+                command.process.kill()
+        for log_file in log_files:
+            log_file.close()
+
+    # Merge results
+    crashed_shards = [index for index, xml_path in enumerate(xml_paths) if not xml_path.is_file()]
+    merged_xml_path = output_dir / "results.xml"
+    test_cases = _merge_results([xml_path for xml_path in xml_paths if xml_path.is_file()], merged_xml_path)
+    durations.update({f"{test_case.get('classname')}.{test_case.get('name')}": float(test_case.get("time", "0")) for test_case in test_cases})
+
+    # Print summary
+    failed_tests = [f"{test_case.get('classname')}.{test_case.get('name')}" for test_case in test_cases if test_case.find("failure") is not None]
+    slowest_tests = sorted(test_cases, key=lambda test_case: float(test_case.get("time", "0")), reverse=True)[:slowest_tests_count]
+    print("Slowest tests:")
+    for test_case in slowest_tests:
+        print(f"    {float(test_case.get('time', '0')):8.3f}s  {test_case.get('classname')}.{test_case.get('name')}")
+    print(f"Executed {len(test_cases)} tests, {len(failed_tests)} failed. Report: {merged_xml_path}")
+    for test in failed_tests:
+        print(f"    FAILED: {test}")
+    for index in crashed_shards:
+        print(f"    CRASHED: shard {index}, see {output_dir / f'shard_{index}.log'}")
+
+    if failed_tests or crashed_shards or any(command.return_value != 0 for command in commands):
+        raise TestsFailedError(f"{len(failed_tests)} tests failed, {len(crashed_shards)} shards crashed")
@@ -0,0 +1,192 @@
+import os
+import time
+from pathlib import Path
+
+from dush.utils import FileLock, Stdout, run_command, start_command
+
+# Displays used for testing. Lower numbers are left for real X servers.
+TEST_DISPLAY_NUMBERS = range(5, 16)
+
+# How long to wait for Xephyr to create its socket before considering the display unusable
+XEPHYR_STARTUP_TIMEOUT_SECONDS = 10
+
+
+class NoDisplayAvailableError(Exception):
+    pass
+
+
+def _get_x_lock_path(display_number):
+    return Path(f"/tmp/.X{display_number}-lock")
+
+
+def _get_x_socket_path(display_number):
+    return Path(f"/tmp/.X11-unix/X{display_number}")
+
+
+def _get_reservation_path(display_number):
+    # Lives next to the X lock files, so all users of the machine compete for the same displays.
+    return Path(f"/tmp/.dush-X{display_number}-reservation")
+
+
+def _read_x_lock_owner(display_number):
+    # X servers write their PID as a decimal number padded with spaces. Returns None if the lock does not exist
+    # and 0 if its content is unreadable, which is treated as alive to be on the safe side.
+    try:
+        content = _get_x_lock_path(display_number).read_text()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        return 0
+    try:
+        return int(content.strip())
+    except ValueError:
+        return 0
+
+
+def _is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Process of another user
+
+
+def _remove_file(path):
+    # Files in /tmp can only be removed by their owners. Lock files of X servers started as root need sudo.
+    try:
+        path.unlink(missing_ok=True)
+    except PermissionError:
+        run_command(f"sudo rm -f {path}")
+
+
+def reap_stale_x_lock(display_number):
+    """
+    Removes lock file and socket of an X server which is not running anymore. Xephyr often leaves them behind when
+    it's killed, which makes the display unusable. Returns True if the display is free afterwards.
+    """
+
+    owner_pid = _read_x_lock_owner(display_number)
+    if owner_pid is None:
+        return True
+    if owner_pid == 0 or _is_process_alive(owner_pid):
+        return False
+
+    print(f"Removing stale lock of display :{display_number} (PID {owner_pid} is not running)")
+    _remove_file(_get_x_lock_path(display_number))
+    _remove_file(_get_x_socket_path(display_number))
+    return True
+
+
+def reap_stale_x_locks():
+    for display_number in TEST_DISPLAY_NUMBERS:
+        reap_stale_x_lock(display_number)
+
+
+class XDisplay:
+    """
+    X display reserved for exclusive use by this process. Reservation is an advisory lock, so concurrent Dush
+    processes cannot pick the same display between checking it and starting an X server on it. The display can be
+    passed to a script starting its own X server or a Xephyr instance can be started with start_xephyr().
+    """
+
+    def __init__(self, number, reservation_file):
+        self.number = number
+        self.name = f":{number}"
+        self._reservation_file = reservation_file
+        self._xephyr = None
+
+    def start_xephyr(self, screen_size="800x600"):
+        self._xephyr = start_command(
+            f"Xephyr -br -ac -noreset -screen {screen_size} {self.name}",
+            stdout=Stdout.ignore(),
+            stderr=Stdout.ignore(),
+        )
+
+        deadline = time.monotonic() + XEPHYR_STARTUP_TIMEOUT_SECONDS
+        while not _get_x_socket_path(self.number).exists():
+            if not self._xephyr.is_running() or time.monotonic() > deadline:
+                self.stop_xephyr()
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop_xephyr(self):
+        if self._xephyr is not None:
+            if self._xephyr.is_running():
+                self._xephyr.process.terminate()
+            self._xephyr.wait(ignore_error=True)
+            self._xephyr = None
+
+    def release(self):
+        self.stop_xephyr()
+        if self._reservation_file is not None:
+            FileLock(self._reservation_file).release()
+            self._reservation_file.close()
+            self._reservation_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def _try_reserve_display(display_number):
+    try:
+        reservation_file = open(_get_reservation_path(display_number), "a")
+    except PermissionError:
+        return None  # Reservation file of another user, who may be using the display right now
+    if not FileLock(reservation_file).try_acquire():
+        reservation_file.close()
+        return None
+
+    # We own the reservation, but X servers started outside of Dush do not know about it.
+    if not reap_stale_x_lock(display_number):
+        FileLock(reservation_file).release()
+        reservation_file.close()
+        return None
+    return XDisplay(display_number, reservation_file)
+
+
+def reserve_x_displays(count, start_xephyr=False, screen_size="800x600", min_count=None):
+    """
+    Reserves given number of free X displays. Stale locks of dead X servers are removed along the way. If
+    start_xephyr is set, Xephyr is started on every display. Displays on which it fails to start are skipped.
+    Fewer displays than requested are accepted if min_count is specified. Returns a list of XDisplay objects,
+    which have to be released by the caller.
+    """
+
+    if min_count is None:
+        min_count = count
+
+    displays = []
+    try:
+        for display_number in TEST_DISPLAY_NUMBERS:
+            if len(displays) == count:
+                break
+
+            display = _try_reserve_display(display_number)
+            if display is None:
+                continue
+            if start_xephyr and not display.start_xephyr(screen_size):
+                print(f"WARNING: Xephyr failed to start on display {display.name}")
+                display.release()
+                continue
+            displays.append(display)
+    except BaseException:
+        for display in displays:
+            display.release()
+        raise
+
+    if len(displays) < min_count:
+        for display in displays:
+            display.release()
+        raise NoDisplayAvailableError(f"Could not reserve {min_count} X displays, only {len(displays)} are free")
+    return displays
+
+
+def reserve_x_display(start_xephyr=False, screen_size="800x600"):
+    return reserve_x_displays(1, start_xephyr, screen_size)[0]
+
@@ -1,5 +1,7 @@
 import argparse
-import inspect
+
+# Same as inspect.CO_VARARGS. Importing inspect is expensive and we need it only for printing help.
+CO_VARARGS = 0x04
 
 
 class CommandLineArgs:
@@ -9,6 +11,7 @@ class CommandLineArgs:
         self._framework_args_parser.add_argument("-v", "--verbose", action="store_true")
         self._framework_args_parser.add_argument("-q", "--quiet", action="store_true")
         self._framework_args_parser.add_argument("-h", "--help", action="store_true")
+        self._framework_args_parser.add_argument("-w", "--watch", action="store_true")
 
         self._process_name = None
         self._command_args = None
@@ -80,45 +83,14 @@ class CommandLineArgs:
 
         # If the command takes positional *args, then do not parse --key=value as kwargs, but instead
         # pass them verbatim as positional arguments.
-        arg_spec = inspect.getfullargspec(command)
-        vararg_name = arg_spec[1]
-        return vararg_name is None
+        if isinstance(command, CommandSignature):
+            return command.varargs_name is None
+        return not command.__code__.co_flags & CO_VARARGS
 
     def print_help_for_command(self, command):
-        arg_spec = inspect.getfullargspec(command)
-        arg_names = arg_spec[0]
-        arg_defaults = arg_spec[3]
-        varargs_name = arg_spec[1]
-        kwargs_supported = varargs_name is None
-
-        # TODO: simply converting to string is ok for strings and ints, but we'd need something like interpret_arg for enums.
-        if arg_defaults is not None:
-            arg_default_strs = [f'"{default}"' for default in arg_defaults]
-        else:
-            arg_default_strs = []
-        required_args_count = len(arg_names) - len(arg_default_strs)
-        if required_args_count > 0:
-            arg_default_strs = required_args_count * [None] + arg_default_strs
-
-        if len(arg_names) == 0:
-            if varargs_name is not None:
-                print(f"The {command.__name__} command supports only positional style of passing arguments. Arguments are:")
-                print(f"  *{varargs_name}")
-            else:
-                print(f"The {command.__name__} command does not take any arguments.")
-        elif kwargs_supported:
-            print(f"The {command.__name__} command supports both positional or keyword (key=value) styles of passing arguments. Arguments are:")
-            for name, default in zip(arg_names, arg_default_strs):
-                if default is None:
-                    default = "  (required)"
-                print(f"  --{name}={default}")
-        else:
-            print(f"The {command.__name__} command supports only positional style of passing arguments. Arguments are:")
-            print("  ", end="")
-            for name, default in zip(arg_names, arg_default_strs):
-                default_str = f"(default: {default})" if default is not None else ""
-                print(f"{name}{default_str}", end=", ")
-            print(f"*{varargs_name}")
+        if not isinstance(command, CommandSignature):
+            command = CommandSignature.from_function(command)
+        command.print_help()
 
     @staticmethod
     def _parse_to_args_kwargs(input_args, are_kwargs_supported):
@@ -142,3 +114,61 @@ class CommandLineArgs:
                 # This is a normal arg
                 args.append(input_arg)
         return args, kwargs
+
+
+class CommandSignature:
+    """
+    Description of command's arguments used for printing help. It can be created from a function object or
+    directly from values extracted from source code, when the function itself is not available. Signature
+    mimics the function's __name__, so it can be registered in a CommandController like a regular command.
+    """
+
+    def __init__(self, name, arg_names, arg_default_strs, varargs_name):
+        self.__name__ = name
+        self.arg_names = arg_names
+        self.arg_default_strs = arg_default_strs  # One entry per arg. None for args without default value.
+        self.varargs_name = varargs_name
+
+    @staticmethod
+    def from_function(function):
+        import inspect
+
+        arg_spec = inspect.getfullargspec(function)
+        arg_names = arg_spec[0]
+        arg_defaults = arg_spec[3]
+        varargs_name = arg_spec[1]
+
+        # TODO: simply converting to string is ok for strings and ints, but we'd need something like interpret_arg for enums.
+        if arg_defaults is not None:
+            arg_default_strs = [f'"{default}"' for default in arg_defaults]
+        else:
+            arg_default_strs = []
+        required_args_count = len(arg_names) - len(arg_default_strs)
+        if required_args_count > 0:
+            arg_default_strs = required_args_count * [None] + arg_default_strs
+
+        return CommandSignature(function.__name__, arg_names, arg_default_strs, varargs_name)
+
+    def print_help(self):
+        name = self.__name__
+        kwargs_supported = self.varargs_name is None
+
+        if len(self.arg_names) == 0:
+            if self.varargs_name is not None:
+                print(f"The {name} command supports only positional style of passing arguments. Arguments are:")
+                print(f"  *{self.varargs_name}")
+            else:
+                print(f"The {name} command does not take any arguments.")
+        elif kwargs_supported:
+            print(f"The {name} command supports both positional or keyword (key=value) styles of passing arguments. Arguments are:")
+            for arg_name, default in zip(self.arg_names, self.arg_default_strs):
+                if default is None:
+                    default = "  (required)"
+                print(f"  --{arg_name}={default}")
+        else:
+            print(f"The {name} command supports only positional style of passing arguments. Arguments are:")
+            print("  ", end="")
+            for arg_name, default in zip(self.arg_names, self.arg_default_strs):
+                default_str = f"(default: {default})" if default is not None else ""
+                print(f"{arg_name}{default_str}", end=", ")
+            print(f"*{self.varargs_name}")
@@ -0,0 +1,134 @@
+import os
+import signal
+import sys
+import time
+
+from dush.utils.file_watcher import FileWatcher, IgnoreRules
+
+# Paths which change during builds or editing, but are never sources. Patterns from .gitignore and info/exclude
+# are added to these.
+DEFAULT_IGNORE_PATTERNS = [
+    ".git",
+    "build*/",
+    "target/",
+    "__pycache__",
+    "*.swp",
+    "*~",
+    ".#*",
+    "4913",  # Vim creates this file to check whether a directory is writable
+]
+
+
+class CommandWatcher:
+    """
+    Runs a command and reruns it whenever files in the source tree change. Source tree is the git repository
+    containing current working directory or the directory itself, if it's not a repository.
+
+    On platforms supporting fork() each run happens in a child process forked from the framework. The child
+    inherits all imported modules, so the startup cost is paid only once. It also runs in its own process group, so
+    a run still in progress when sources change can be cancelled together with all processes it spawned. On other
+    platforms the command runs in this process and changes made during a run are handled after it ends.
+    """
+
+    def __init__(self, execute, debounce=0.3):
+        self._execute = execute
+        self._debounce = debounce
+
+    def run(self):
+        root_dir, ignore_rules = self._get_source_tree()
+        with FileWatcher(root_dir, ignore_rules) as watcher:
+            backend = "inotify" if watcher.is_using_inotify() else "polling"
+            print(f"Watching {root_dir} for changes ({backend}). Press Ctrl+C to stop.")
+            try:
+                while True:
+                    changes = self._run_once(watcher)
+                    if not changes:
+                        print("Waiting for changes...")
+                        changes = watcher.wait_debounced(self._debounce)
+                    self._print_changes(root_dir, changes)
+            except KeyboardInterrupt:
+                return 2
+
+    @staticmethod
+    def _get_source_tree():
+        from dush.core.git import IncorrectGitWorkspaceError, find_git_dir, get_git_exclude_file
+
+        ignore_rules = IgnoreRules(DEFAULT_IGNORE_PATTERNS)
+        try:
+            root_dir, git_dir = find_git_dir(os.getcwd())
+            ignore_rules.add_file(root_dir / ".gitignore")
+            ignore_rules.add_file(get_git_exclude_file(git_dir))
+        except IncorrectGitWorkspaceError:
+            root_dir = os.getcwd()
+        return root_dir, ignore_rules
+
+    def _run_once(self, watcher):
+        # Returns changes which cancelled the run or an empty set if the run has finished.
+        if not hasattr(os, "fork"):
+            self._execute()
+            return set()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 1
+            try:
+                os.setpgid(0, 0)
+                exit_code = self._execute()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+
+        # Both processes set the group, because either of them may run first. Without this, a change arriving before
+        # the child called setpgid() could not kill the group.
+        try:
+            os.setpgid(pid, pid)
+        except (PermissionError, ProcessLookupError):
+            pass  # Child has already exited
+
+        try:
+            while True:
+                finished_pid, _ = os.waitpid(pid, os.WNOHANG)
+                if finished_pid != 0:
+                    return set()
+
+                changes = watcher.wait(timeout=0.1)
+                if changes:
+                    print("\nSources changed. Cancelling current run.")
+                    self._kill_process_group(pid)
+                    return changes | watcher.wait_debounced(self._debounce, timeout=self._debounce)
+        except KeyboardInterrupt:
+            self._kill_process_group(pid)
+            raise
+
+    @staticmethod
+    def _kill_process_group(pid):
+        # Ask nicely first, so the processes can clean up, e.g. remove partially written object files.
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            finished_pid, _ = os.waitpid(pid, os.WNOHANG)
+            if finished_pid != 0:
+                return
+            time.sleep(0.05)
+
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        os.waitpid(pid, 0)
+
+    @staticmethod
+    def _print_changes(root_dir, changes):
+        changes = sorted(os.path.relpath(path, root_dir) for path in changes)
+        max_printed = 5
+        print(f"\nDetected changes in {len(changes)} path(s): {', '.join(changes[:max_printed])}", end="")
+        if len(changes) > max_printed:
+            print(", ...", end="")
+        print("\n")
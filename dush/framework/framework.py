@@ -1,17 +1,23 @@
-import inspect
+import os
+import shlex
 import sys
-import traceback
 from datetime import datetime
 from pathlib import Path
 
 from dush.framework.command_controller import CommandController
-from dush.framework.command_line_args import CommandLineArgs
+from dush.framework.command_line_args import CommandLineArgs, CommandSignature
+
+# Separates commands when many of them are passed in one command line, e.g. "meson d ;; compile d".
+BATCH_SEPARATOR = ";;"
 
 
 class Framework:
-    def __init__(self):
-        self._command_controller = CommandController()
+    def __init__(self, command_controller=None):
+        # Command controller can be passed already filled, e.g. with commands extracted statically from source code.
+        self._command_controller = command_controller if command_controller is not None else CommandController()
         self._command_line_args = CommandLineArgs()
+        self._caches = []
+        self._flush_functions = []
 
     def get_command_decorator_main(self):
         return self._command_controller.register_command_main
@@ -34,15 +40,59 @@ class Framework:
     def get_command(self, name):
         return self._command_controller.get_command(name)
 
-    def main(self):
+    def register_cache(self, cache):
+        # Caches are objects with a clear() method. They are cleared before executing each command, so the
+        # cached state can be shared between functions called by the command, but not between commands.
+        self._caches.append(cache)
+
+    def register_flush(self, function):
+        # Functions called after each command, e.g. to save state collected during the command with one write
+        # instead of many small ones. They are called even if the command failed.
+        self._flush_functions.append(function)
+
+    def _clear_caches(self):
+        for cache in self._caches:
+            cache.clear()
+
+    def _flush(self):
+        for function in self._flush_functions:
+            try:
+                function()
+            except Exception as e:
+                print(f"WARNING: {e}")
+
+    def main(self, argv=None):
+        if argv is None:
+            argv = sys.argv
         self._insert_framework_commands()
 
+        # Multiple commands can be passed in one command line separated with ";;". They are executed as a batch.
+        process_name = argv[0]
+        args = argv[1:]
+        if BATCH_SEPARATOR in args:
+            command_lines = [[]]
+            for arg in args:
+                if arg == BATCH_SEPARATOR:
+                    command_lines.append([])
+                else:
+                    command_lines[-1].append(arg)
+            exit_code = self._run_batch(process_name, command_lines)
+        else:
+            exit_code = self._run_command(process_name, args)
+
+        # Return exit code
+        sys.exit(exit_code)
+
+    def _run_command(self, process_name, args):
+        # Framework args are specific to each command, so they have to be parsed anew.
+        self._command_line_args = CommandLineArgs()
+
         # Parse command line
         try:
-            self._command_line_args.parse(self._command_controller, sys.argv)
+            self._command_line_args.parse(self._command_controller, [process_name] + args)
         except:
             self._print_help()
-            sys.exit(1)
+            return 1
 
         # Get command to execute. It can either be parsed from cmdline (in case of MultipleCommands mode)
         # or implicitly defined (in case of SingleCommand mode).
@@ -50,30 +100,73 @@ class Framework:
         if command is None:
             print(f'ERROR: Command "{self._command_line_args.command_name}" not found!')
             self._print_help()
-            sys.exit(1)
+            return 1
         if self.get_framework_args().help:
             self._print_help(command)
-            sys.exit(0)
+            return 0
+        if isinstance(command, CommandSignature):
+            # Statically extracted commands only describe arguments. They cannot be executed.
+            print(f'ERROR: Command "{self._command_line_args.command_name}" cannot be executed without loading the project script')
+            return 1
+
+        # Keep rerunning the command when sources change, if requested.
+        if self.get_framework_args().watch:
+            from dush.framework.command_watcher import CommandWatcher
+
+            return CommandWatcher(lambda: self._execute_command(command)).run()
 
+        return self._execute_command(command)
+
+    def _execute_command(self, command):
         # Try to execute the command and, handle any exception and print user-friendly summary.
         try:
             # Execute command
             begin_timestamp = datetime.now()
+            self._clear_caches()
             command_args, command_kwargs = self._command_line_args.get_command_args_kwargs()
             command(*command_args, **command_kwargs)
             self._print_execution_time(begin_timestamp, "SUCCESS")
-            exit_code = 0
+            return 0
         except Exception as e:
             self._print_exception_info()
             self._print_execution_time(begin_timestamp, f"ERROR: {e}")
-            exit_code = 1
+            return 1
         except KeyboardInterrupt:
             self._print_exception_info()
             self._print_execution_time(begin_timestamp, "INTERRUPT (Ctrl+C detected)")
-            exit_code = 2
-
-        # Return exit code
-        sys.exit(exit_code)
+            return 2
+        finally:
+            self._flush()
+
+    def _run_batch(self, process_name, command_lines):
+        # Execute commands one by one in this process, so the interpreter startup, imports and all caches are paid
+        # for only once. Each command starts in the same working directory, as if it was called separately. Stop
+        # at the first failure, because subsequent commands usually depend on the previous ones.
+        command_lines = [command_line for command_line in command_lines if command_line]
+        cwd = os.getcwd()
+        results = []
+        exit_code = 0
+        for index, command_line in enumerate(command_lines):
+            print(f">>> [{index + 1}/{len(command_lines)}] {shlex.join(command_line)}")
+            os.chdir(cwd)
+            begin_timestamp = datetime.now()
+            exit_code = self._run_command(process_name, command_line)
+            results.append((command_line, exit_code, datetime.now() - begin_timestamp))
+            print()
+            if exit_code != 0:
+                break
+        os.chdir(cwd)
+
+        # Print summary
+        status_names = {0: "SUCCESS", 1: "ERROR", 2: "INTERRUPT"}
+        print("Batch summary:")
+        for command_line, command_exit_code, duration in results:
+            seconds = duration.total_seconds()
+            duration = f"{int(seconds // 3600)}:{int(seconds % 3600 // 60):02}:{seconds % 60:06.3f}"
+            print(f"    {status_names[command_exit_code]:<9}  {duration:>12}  {shlex.join(command_line)}")
+        for command_line in command_lines[len(results) :]:
+            print(f"    {'SKIPPED':<9}  {'':>12}  {shlex.join(command_line)}")
+        return exit_code
 
     def _insert_framework_commands(self):
         if self._command_controller.is_multi_command():
@@ -82,7 +175,27 @@ class Framework:
                 commands_names = [command for command in self._command_controller.get_commands()]
                 print(" ".join(commands_names))
 
+            def batch(script):
+                # Each line of the script is one command with its arguments, like in command line. Empty lines and
+                # lines starting with # are ignored. Script "-" means standard input.
+                if script == "-":
+                    lines = sys.stdin.readlines()
+                else:
+                    with open(script, "r") as file:
+                        lines = file.readlines()
+                command_lines = [shlex.split(line) for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+                # Batch is run from inside of a command, so save its framework args and restore them afterwards.
+                command_line_args = self._command_line_args
+                exit_code = self._run_batch(command_line_args.get_process_name(), command_lines)
+                self._command_line_args = command_line_args
+                if exit_code == 2:
+                    raise KeyboardInterrupt()
+                if exit_code != 0:
+                    raise ValueError("Batch failed")
+
             self._command_controller.register_command_multiple(list)
+            self._command_controller.register_command_multiple(batch)
 
     def _print_help(self, command=None):
         # Print usage
@@ -120,6 +233,8 @@ class Framework:
     def _print_exception_info(self):
         if not self._command_line_args.get_framework_args().verbose:
             return
+        import traceback
+
         traceback.print_exc()
 
 
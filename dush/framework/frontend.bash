@@ -84,7 +84,83 @@ dush_init_project() {
 	config["is_loaded"]="0"
 	config["main_func"]="$main_func"
 
-	# Define known keys. All project's config.ini should define those keys and only those keys.
+	# Read config. Projects from Dush repository are read from the precompiled catalogue, which is already
+	# validated. Projects located elsewhere have to parse their config.ini.
+	local catalogue_name="_dush_catalogue_${project_path##*/}"
+	catalogue_name="${catalogue_name//[^a-zA-Z0-9_]/_}"
+	if [ "${project_path%/*}" -ef "$DUSH_PATH/dush/projects" ] && _dush_load_catalogue && declare -p "$catalogue_name" &>/dev/null; then
+		declare -n catalogue_config="$catalogue_name"
+		declare -n config_errors="_dush_catalogue_errors_${catalogue_name#_dush_catalogue_}"
+		local key
+		for key in "${!catalogue_config[@]}"; do
+			config["$key"]="${catalogue_config[$key]}"
+		done
+	else
+		_dush_read_config_file "$project_name" "$project_path/config.ini"
+		local config_errors=("${_dush_config_errors[@]}")
+	fi
+
+	# Call reload on init if requested.
+	if [ "$DUSH_ENABLE_AUTOLOAD" = "1" ]; then
+		_dush_project_reload 1
+	fi
+
+	# Do not initialize projects with missing config keys
+	if [ "${#config_errors[@]}" != 0 ]; then
+		printf "%s\n" "${config_errors[@]}"
+		return 1
+	fi
+
+	# Generate project main, which will serve as a frontend for all interactions with this project.
+	local project_main_definition="$main_func() { _dush_project_main $1 \"\$@\" ; return \$? ; }"
+	eval "$project_main_definition"
+}
+
+
+
+_dush_load_catalogue() {
+	# Catalogue is sourced once per shell. It is regenerated by Python, if any config.ini was added, removed or
+	# modified after the catalogue was written.
+	if [ "$_dush_catalogue_loaded" = 1 ]; then
+		return 0
+	fi
+
+	local projects_path="$DUSH_PATH/dush/projects"
+	local catalogue_file="$projects_path/catalogue.bash"
+	local is_stale=0
+	if [ -f "$catalogue_file" ]; then
+		source "$catalogue_file"
+
+		local config_count=0
+		local config_file
+		for config_file in "$projects_path"/*/config.ini; do
+			if [ -e "$config_file" ]; then
+				config_count=$((config_count + 1))
+				if [ "$config_file" -nt "$catalogue_file" ]; then
+					is_stale=1
+				fi
+			fi
+		done
+		if [ "$config_count" != "$_dush_catalogue_config_count" ]; then
+			is_stale=1
+		fi
+	else
+		is_stale=1
+	fi
+
+	if [ "$is_stale" = 1 ]; then
+		PYTHONPATH=$DUSH_PATH $DUSH_PYTHON_COMMAND -m dush.utils.project_catalogue || return 1
+		source "$catalogue_file"
+	fi
+	_dush_catalogue_loaded=1
+}
+
+_dush_read_config_file() {
+	local project_name="$1"
+	local config_file="$2"
+
+	# Define known keys. All project's config.ini should define those keys and only those keys. Keep in sync with
+	# KNOWN_KEYS in dush/utils/project_catalogue.py.
 	local known_keys=(name name_friendly name_directory dir_inside_root has_repository has_main_command has_bash_scripts has_python_scripts
 	                  has_git_submodules upstream_url upstream_main_branch upstream_dev_branch)
 
@@ -112,28 +188,15 @@ dush_init_project() {
 		else
 			echo "WARNING: Dush project $project_name defines unexpected setting \"$key\" in its config.ini"
 		fi
-	done < "$project_path/config.ini"
-
-	# Call reload on init if requested.
-	if [ "$DUSH_ENABLE_AUTOLOAD" = "1" ]; then
-		_dush_project_reload 1
-	fi
+	done < "$config_file"
 
 	# Validate all required keys are present
-	local success=1
+	_dush_config_errors=()
 	for key in "${known_keys[@]}"; do
 		if ! [ "${config[$key]+abc}" ]; then
-			echo "ERROR: Dush project $project_name does not define config key $key"
-			success=0
+			_dush_config_errors+=("ERROR: Dush project $project_name does not define config key $key")
 		fi
 	done
-	if [ "$success" = 0 ]; then
-		return 1
-	fi
-
-	# Generate project main, which will serve as a frontend for all interactions with this project.
-	local project_main_definition="$main_func() { _dush_project_main $1 \"\$@\" ; return \$? ; }"
-	eval "$project_main_definition"
 }
 
 
@@ -212,11 +275,36 @@ _dush_call_python_script() {
 	return $?
 }
 
+_dush_is_static_command_call() {
+	# Listing commands and printing help does not require executing the project script. It can be answered by
+	# analyzing its source code, which is much faster and works without setting up the project's environment.
+	# Batches of commands separated with ";;" always have to be executed. Whether "list" means listing or is an
+	# argument of a @main_command is known only after analyzing the script, so static_commands decides that.
+	local is_framework_arg=0
+	local is_help=0
+	for arg in "$@"; do
+		if [ "$arg" == ";;" ]; then
+			return 1
+		fi
+		if [ "$is_framework_arg" == 1 ] && { [ "$arg" == "-h" ] || [ "$arg" == "--help" ]; }; then
+			is_help=1
+		fi
+		if [ "$arg" == "--" ]; then
+			is_framework_arg=1
+		fi
+	done
+	[ "$1" == "list" ] || [ "$is_help" == 1 ]
+}
+
 _dush_project_python_script() {
 	local project_path=${config["path"]}
 	local project_name=${config["name"]}
 
 	local script_name="$project_path/$project_name.py"
+	if _dush_is_static_command_call "$@"; then
+		PYTHONPATH=$DUSH_PATH $DUSH_PYTHON_COMMAND -m dush.framework.static_commands "$script_name" "$@"
+		return $?
+	fi
 	_dush_call_python_script "$script_name" "$@"
 	return $?
 }
@@ -294,18 +382,172 @@ _dush_project_reload() {
 }
 
 _dush_generate_main_function_completion() {
-	local project_path=${config["path"]}
+	local project_name=${config["main_func"]}
 
+	_dush_load_completion_cache
+	complete -F _dush_complete_main_function "$project_name"
+}
+
+# Completion data is generated by scanning project's Python script for command definitions. This is done in pure
+# Bash, without importing the script or even starting Python. The cache file has following lines:
+#   dependency <path to a file the data was generated from>
+#   command <command name> --<argument name>= --<argument name>= ...
+_dush_load_completion_cache() {
+	local project_path=${config["path"]}
+	local script_file="$project_path/${config["name"]}.py"
 	local cache_file="$project_path/commands.cache"
-	local args=
-	if [ -f "$cache_file" ]; then
-		read -r args < "$cache_file"
+
+	if ! _dush_is_completion_cache_valid "$cache_file"; then
+		_dush_scan_commands "$script_file" > "$cache_file"
+	fi
+
+	local commands=()
+	local kind name args
+	while read -r kind name args; do
+		if [ "$kind" = "command" ]; then
+			commands+=("$name")
+			config["args:$name"]="$args"
+		fi
+	done < "$cache_file"
+	config["commands"]="${commands[*]}"
+}
+
+_dush_is_completion_cache_valid() {
+	local cache_file="$1"
+	if ! [ -f "$cache_file" ]; then
+		return 1
+	fi
+
+	# The cache is valid if none of the files it was generated from was modified after generating it.
+	local has_dependencies=0
+	local kind path
+	while read -r kind path; do
+		if [ "$kind" = "dependency" ]; then
+			has_dependencies=1
+			if ! [ -e "$path" ] || [ "$path" -nt "$cache_file" ]; then
+				return 1
+			fi
+		fi
+	done < "$cache_file"
+
+	# Caches from older Dush versions contain only command names and no dependencies.
+	[ "$has_dependencies" = 1 ]
+}
+
+_dush_scan_commands() {
+	local script_file="$1"
+	local -A visited_files
+	local has_multiple_commands=0
+	_dush_scan_commands_in_file "$script_file"
+
+	# These commands are inserted by the framework in multi-command mode.
+	if [ "$has_multiple_commands" = 1 ]; then
+		echo "command list"
+		echo "command batch --script="
+	fi
+}
+
+_dush_scan_commands_in_file() {
+	local script_file="$1"
+	if [ -n "${visited_files[$script_file]}" ] || ! [ -f "$script_file" ]; then
+		return
+	fi
+	visited_files["$script_file"]=1
+	echo "dependency $script_file"
+
+	local decorator_regex='^@(command|command_conditional\(.*\)|main_command)[[:space:]]*$'
+	local def_regex='^def[[:space:]]+([A-Za-z_][A-Za-z0-9_]*)[[:space:]]*\((.*)$'
+	local def_end_regex='\)[^)]*:[[:space:]]*(#.*)?$'
+	local import_regex='^(from|import)[[:space:]]+dush\.([A-Za-z0-9_.]+)'
+
+	local is_command=0
+	local is_main_command=0
+	local line
+	while IFS= read -r line || [ -n "$line" ]; do
+		line="${line%$'\r'}"
+
+		if [[ "$line" =~ $import_regex ]]; then
+			# Commands can also be defined in imported Dush modules, e.g. common_commands. Packages are skipped,
+			# because they only reexport things.
+			local module="${BASH_REMATCH[2]}"
+			_dush_scan_commands_in_file "$DUSH_PATH/dush/${module//.//}.py"
+		elif [[ "$line" =~ $decorator_regex ]]; then
+			is_command=1
+			[ "${BASH_REMATCH[1]}" = "main_command" ] && is_main_command=1
+		elif [ "$is_command" = 1 ] && [[ "$line" =~ $def_regex ]]; then
+			local name="${BASH_REMATCH[1]}"
+			local signature="${BASH_REMATCH[2]}"
+
+			# Signature may span multiple lines
+			while ! [[ "$signature" =~ $def_end_regex ]] && IFS= read -r line; do
+				signature="$signature ${line%$'\r'}"
+			done
+			signature="${signature%)*}"
+
+			# Extract argument names. Commands taking *args get their arguments only positionally, so there is
+			# nothing to complete for them.
+			local args=""
+			local arg
+			local arg_tokens
+			IFS=',' read -ra arg_tokens <<< "$signature"
+			for arg in "${arg_tokens[@]}"; do
+				arg="${arg%%=*}"
+				arg="${arg%%:*}"
+				arg="${arg//[[:space:]]/}"
+				if [[ "$arg" == \*[!*]* ]]; then
+					args=""
+					break
+				elif [ -n "$arg" ] && [[ "$arg" != [*/]* ]]; then
+					args="$args --$arg="
+				fi
+			done
+
+			if [ "$is_main_command" = 1 ]; then
+				name="main"
+			else
+				has_multiple_commands=1
+			fi
+			echo "command $name$args"
+			is_command=0
+			is_main_command=0
+		elif ! [[ "$line" =~ ^@ ]]; then
+			is_command=0
+			is_main_command=0
+		fi
+	done < "$script_file"
+}
+
+_dush_complete_main_function() {
+	local main_func="$1"
+	local current_word="${COMP_WORDS[COMP_CWORD]}"
+	local previous_word="${COMP_WORDS[COMP_CWORD-1]}"
+	declare -n config="dush_project_$main_func"
+
+	# Reparsing the script is cheap, so we can do it each time, if it has been modified.
+	if ! _dush_is_completion_cache_valid "${config["path"]}/commands.cache"; then
+		_dush_load_completion_cache
+	fi
+
+	# Do not complete argument values. Bash splits words at equals signs, so "--config=" will be two words.
+	if [ "$current_word" = "=" ] || [ "$previous_word" = "=" ]; then
+		COMPREPLY=()
+		return
+	fi
+
+	local candidates
+	if [ "${config["commands"]}" = "main" ]; then
+		candidates="${config["args:main"]}"
+	elif [ "$COMP_CWORD" = 1 ]; then
+		candidates="${config["commands"]} reload"
 	else
-		args="$(_dush_project_python_script list -- -q | tr -d '\n' | tr -d '\r')"
-		printf "$args\n" > "$cache_file"
+		candidates="${config["args:${COMP_WORDS[1]}"]}"
 	fi
+	COMPREPLY=($(compgen -W "$candidates" -- "$current_word"))
 
-	complete -W "$args reload" "$project_name"
+	# Do not put a space after "--key=", so user can type the value right away.
+	if [[ "${COMPREPLY[0]}" == *= ]]; then
+		compopt -o nospace
+	fi
 }
 
 _dush_load_python_scripts_as_bash_functions() {
@@ -365,9 +607,11 @@ _dush_load_bash_scripts() {
 
 # --------------------------------------------------------------------- Other utilities
 dush_clear_caches() {
-	local dush_path="$DUSH_PATH"
-	if [ "$DUSH_IS_WINDOWS" = 1 ]; then
-		dush_path="$(echo "$dush_path" | sed -E "s/\\\\/\//g" | sed -E "s/(C):\//\/\l\1\//g")"
-	fi
-	find "$dush_path" -name "commands.cache" | xargs rm
+	local array_name
+	for array_name in ${!dush_project_@}; do
+		declare -n project_config="$array_name"
+		rm -f "${project_config["path"]}/commands.cache"
+	done
+	rm -f "$DUSH_PATH"/dush/projects/catalogue.*
+	_dush_catalogue_loaded=0
 }
@@ -0,0 +1,269 @@
+import ast
+import hashlib
+import json
+import os
+import platform
+import sys
+from pathlib import Path
+
+from dush.framework.command_controller import CommandController
+from dush.framework.command_line_args import CommandSignature
+
+"""
+Extracts commands defined in a project script by analyzing its source code instead of executing it. Executing
+the script loads project repositories, resolves environment paths and configures builds, which is slow and fails
+when the environment is not set up. This is not needed for listing commands or printing help.
+
+Extraction understands the decorators from dush.framework and follows imports of other Dush modules. Conditions
+of @command_conditional are evaluated if they consist of literals, is_windows()/is_linux() calls, framework's
+get_command() checks and module-level variables assigned from such expressions. Commands with conditions that
+cannot be evaluated statically are assumed to be available.
+
+Results are cached per hash of the script content, so subsequent calls only have to read the files. The module
+can be used from command line the same way as the project script itself, e.g.:
+    python -m dush.framework.static_commands dush/projects/mesa/mesa.py list
+    python -m dush.framework.static_commands dush/projects/mesa/mesa.py meson -- -h
+"""
+
+# Increment when the extraction logic or cache format changes to invalidate old cache entries.
+CACHE_VERSION = 1
+
+UNKNOWN = object()
+
+
+class StaticCommandExtractor:
+    def __init__(self, dush_root_dir):
+        self._dush_root_dir = Path(dush_root_dir)
+        self._visited_files = set()
+        self._dependencies = {}
+        self._is_single_command = False
+        self._commands = {}
+        self._variables = {}
+
+    def extract(self, script_path, script_source=None):
+        self._visit_file(Path(script_path), script_source)
+        return {
+            "version": CACHE_VERSION,
+            "platform": platform.system(),
+            "dependencies": self._dependencies,
+            "is_single_command": self._is_single_command,
+            "commands": self._commands,
+        }
+
+    def _visit_file(self, path, source=None):
+        path = path.resolve()
+        if path in self._visited_files:
+            return
+        self._visited_files.add(path)
+
+        if source is None:
+            source = path.read_bytes()
+        self._dependencies[str(path)] = _hash_content(source)
+
+        # Module-level variables are evaluated per file. Star imports could leak them between modules, but
+        # commands conditions never rely on that.
+        outer_variables = self._variables
+        self._variables = {}
+        self._visit_statements(ast.parse(source, filename=str(path)).body)
+        self._variables = outer_variables
+
+    def _visit_module(self, module_name):
+        # Only Dush modules are followed. Packages are skipped, because their __init__ files do not define commands.
+        if module_name is None or not module_name.startswith("dush."):
+            return
+        path = self._dush_root_dir.joinpath(*module_name.split(".")).with_suffix(".py")
+        if path.is_file():
+            self._visit_file(path)
+
+    def _visit_statements(self, statements):
+        for statement in statements:
+            match statement:
+                case ast.Import(names=names):
+                    for alias in names:
+                        self._visit_module(alias.name)
+                case ast.ImportFrom(module=module, level=0):
+                    self._visit_module(module)
+                case ast.Assign(targets=[ast.Name(id=name)], value=value):
+                    self._variables[name] = self._evaluate(value)
+                case ast.If(test=test, body=body, orelse=orelse):
+                    condition = self._evaluate(test)
+                    if condition is UNKNOWN or condition:
+                        self._visit_statements(body)
+                    if condition is UNKNOWN or not condition:
+                        self._visit_statements(orelse)
+                case ast.FunctionDef():
+                    self._visit_function(statement)
+
+    def _visit_function(self, function):
+        for decorator in function.decorator_list:
+            match decorator:
+                case ast.Name(id="command"):
+                    self._commands[function.name] = self._get_signature(function)
+                case ast.Call(func=ast.Name(id="command_conditional"), args=[condition]):
+                    if self._evaluate(condition) is not False:
+                        self._commands[function.name] = self._get_signature(function)
+                case ast.Name(id="main_command"):
+                    self._is_single_command = True
+                    self._commands[CommandController.MAIN_COMMAND_NAME] = self._get_signature(function)
+
+    def _get_signature(self, function):
+        arguments = function.args
+        positional_args = arguments.posonlyargs + arguments.args
+        arg_names = [arg.arg for arg in positional_args]
+        arg_default_strs = [None] * (len(positional_args) - len(arguments.defaults))
+        arg_default_strs += [f'"{_format_default(default)}"' for default in arguments.defaults]
+        varargs_name = arguments.vararg.arg if arguments.vararg is not None else None
+        return {
+            "name": function.name,
+            "arg_names": arg_names,
+            "arg_default_strs": arg_default_strs,
+            "varargs_name": varargs_name,
+        }
+
+    def _evaluate(self, node):
+        # Returns value of a simple expression or UNKNOWN, if it cannot be determined without running the code.
+        match node:
+            case ast.Constant(value=value):
+                return value
+            case ast.Name(id=name):
+                return self._variables.get(name, UNKNOWN)
+            case ast.Call(func=ast.Name(id="is_windows"), args=[]):
+                return platform.system() == "Windows"
+            case ast.Call(func=ast.Name(id="is_linux"), args=[]):
+                return platform.system() == "Linux"
+            case ast.Call(func=ast.Attribute(value=ast.Name(id="framework"), attr="get_command"), args=[ast.Constant(value=name)]):
+                # Return any non-None value for existing commands. Only comparisons with None make sense here.
+                return name if name in self._commands else None
+            case ast.UnaryOp(op=ast.Not(), operand=operand):
+                value = self._evaluate(operand)
+                return UNKNOWN if value is UNKNOWN else not value
+            case ast.BoolOp(op=op, values=values):
+                values = [self._evaluate(value) for value in values]
+                if isinstance(op, ast.And):
+                    if any(value is not UNKNOWN and not value for value in values):
+                        return False
+                    return UNKNOWN if UNKNOWN in values else True
+                else:
+                    if any(value is not UNKNOWN and value for value in values):
+                        return True
+                    return UNKNOWN if UNKNOWN in values else False
+            case ast.Compare(left=left, ops=[op], comparators=[right]):
+                left = self._evaluate(left)
+                right = self._evaluate(right)
+                if left is UNKNOWN or right is UNKNOWN:
+                    return UNKNOWN
+                match op:
+                    case ast.Is():
+                        return left is right
+                    case ast.IsNot():
+                        return left is not right
+                    case ast.Eq():
+                        return left == right
+                    case ast.NotEq():
+                        return left != right
+        return UNKNOWN
+
+
+def _format_default(node):
+    # Mimic converting the default value to string at runtime. Literals are evaluated. Other expressions, like
+    # enum values, are printed as written in the source, which usually is the same thing.
+    try:
+        return str(ast.literal_eval(node))
+    except ValueError:
+        return ast.unparse(node)
+
+
+def _hash_content(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def _is_cache_entry_valid(entry):
+    if entry.get("version") != CACHE_VERSION or entry.get("platform") != platform.system():
+        return False
+    for path, content_hash in entry["dependencies"].items():
+        try:
+            with open(path, "rb") as file:
+                if _hash_content(file.read()) != content_hash:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def extract_commands(script_path):
+    script_path = Path(script_path).resolve()
+    script_source = script_path.read_bytes()
+    dush_root_dir = Path(__file__).parent.parent.parent
+
+    # Cache is optional. Do not import paths module before it's needed, because it requires Dush environment.
+    cache_file = None
+    try:
+        from dush.utils.paths import get_cache_dir
+
+        cache_key = _hash_content(script_source + str(script_path).encode())
+        cache_file = get_cache_dir("static_commands") / f"{cache_key}.json"
+        with open(cache_file, "r") as file:
+            entry = json.load(file)
+        if _is_cache_entry_valid(entry):
+            return entry
+    except (OSError, KeyError, ValueError):
+        pass
+
+    entry = StaticCommandExtractor(dush_root_dir).extract(script_path, script_source)
+    if cache_file is not None:
+        try:
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w") as file:
+                json.dump(entry, file)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            pass
+    return entry
+
+
+def load_static_commands(script_path, entry=None):
+    if entry is None:
+        entry = extract_commands(script_path)
+
+    command_controller = CommandController()
+    for name, signature in entry["commands"].items():
+        command = CommandSignature(
+            signature["name"],
+            signature["arg_names"],
+            signature["arg_default_strs"],
+            signature["varargs_name"],
+        )
+        if entry["is_single_command"]:
+            command_controller.register_command_main(command)
+        else:
+            command_controller.register_command_multiple(command)
+    return command_controller
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} SCRIPT_PATH [ARGS...]")
+        sys.exit(1)
+
+    # Import framework module here, because it creates a global Framework instance.
+    from dush.framework.framework import Framework
+
+    script_path = sys.argv[1]
+    args = sys.argv[2:]
+    entry = extract_commands(script_path)
+
+    # Frontends send every "list" call here, but for a @main_command it's an argument of the command, not listing
+    # of commands. Such calls have to be executed by the script itself.
+    framework_args = args[args.index("--") + 1 :] if "--" in args else []
+    is_help = "-h" in framework_args or "--help" in framework_args
+    if entry["is_single_command"] and args[:1] == ["list"] and not is_help:
+        import subprocess
+
+        sys.exit(subprocess.run([sys.executable, script_path, *args]).returncode)
+
+    framework = Framework(load_static_commands(script_path, entry))
+    framework.main(sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
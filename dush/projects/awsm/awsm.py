@@ -22,6 +22,46 @@ def get_install_dir(build_dir):
     return build_dir / "install"
 
 
+def run_integration_test_shards(project_dir, env, test_files, displays, output_dir):
+    # Every shard runs tests/run.sh with its own subset of test files. The script starts its own Xephyr on display
+    # passed in D variable, so the shards do not interfere with each other.
+    output_dir.mkdir(parents=True, exist_ok=True)
+    shards = [test_files[index :: len(displays)] for index in range(len(displays))]
+
+    commands = []
+    log_files = []
+    try:
+        for index, (shard, display) in enumerate(zip(shards, displays)):
+            log_file = open(output_dir / f"shard_{index}.log", "w")
+            log_files.append(log_file)
+            shard_command = "tests/run.sh " + " ".join(shard)
+            commands.append(start_command(shard_command, stdout=Stdout.print_to_file(log_file), stderr=Stdout.print_to_file(log_file), cwd=project_dir, env={**env, "D": display.name}))
+        for shard_command in commands:
+            shard_command.wait(ignore_error=True)
+    finally:
+        for shard_command in commands:
+            if shard_command.is_running():
+                shard_command.process.kill()
+        for log_file in log_files:
+            log_file.close()
+
+    # Print combined result
+    failed_shards = []
+    for index, (shard, shard_command) in enumerate(zip(shards, commands)):
+        status = "SUCCESS" if shard_command.return_value == 0 else f"ERROR (exit code {shard_command.return_value})"
+        print(f"Shard {index} on display {displays[index].name}: {status}, {len(shard)} test files")
+        if shard_command.return_value != 0:
+            failed_shards.append(index)
+    for index in failed_shards:
+        print(f"\nFailed shard {index} ({' '.join(shards[index])}), last lines of {output_dir / f'shard_{index}.log'}:")
+        log_lines = (output_dir / f"shard_{index}.log").read_text(errors="replace").splitlines()
+        for line in log_lines[-20:]:
+            print(f"    {line}")
+
+    if failed_shards:
+        raise core.TestsFailedError(f"{len(failed_shards)} of {len(shards)} shards failed")
+
+
 # ----------------------------------------------------------- Commands
 @command
 def cmake(config=""):
@@ -59,33 +99,21 @@ def test(config="", use_default_config=False):
     binary_path = install_dir / "bin/awesome"
     script_path = Path(__file__).parent / "run_in_xephyr.sh"
 
-    display = None
-    for display_idx in range(5, 16):
-        lock_file = Path(f"/tmp/.X{display_idx}-lock")
-        if not lock_file.exists():
-            display = f":{display_idx}"
-            break
-
-    if display is None:
-        raise ValueError("No X displays available")
-
-    run_command(f"{script_path} {binary_path} {display} {int(use_default_config)}")
+    # Keep the display reserved while the script runs, so other Dush processes do not pick it
+    with core.reserve_x_display() as display:
+        run_command(f"{script_path} {binary_path} {display.name} {int(use_default_config)}")
 
 
 @command
 def clear_test_xorg_locks():
-    # This isn't very safe, but there's a low chance anything really useful runs on these displays
-    # These lock files are often left behind by Xephyr.
-    for display_idx in range(5, 16):
-        lock_file = Path(f"/tmp/.X{display_idx}-lock")
-        if lock_file.exists():
-            print(f"Removing {lock_file}")
-            run_command(f"sudo rm {lock_file}")
+    # Stale locks are also removed automatically whenever a display is reserved
+    core.reap_stale_x_locks()
 
 
 @command
-def run_integration_tests(config=""):
+def run_integration_tests(config="", shards=1):
     config = interpret_arg(config, BuildConfig, "config")
+    shards = interpret_arg(shards, int, "shards")
 
     project_dir = get_project_dir()
     build_dir = get_build_dir(project_dir, config)
@@ -97,7 +125,20 @@ def run_integration_tests(config=""):
         "LUA": "lua",
     }
 
-    run_command("tests/run.sh", cwd=project_dir, env=env)
+    # Distribute test files across displays. Value 0 means as many shards as there are free displays.
+    test_files = sorted(path.name for path in (project_dir / "tests").glob("test-*.lua"))
+    if shards == 0:
+        shards = len(test_files)
+    shards = max(1, min(shards, len(test_files)))
+    displays = core.reserve_x_displays(shards, min_count=1)
+    try:
+        if len(displays) == 1:
+            run_command("tests/run.sh", cwd=project_dir, env={**env, "D": displays[0].name})
+        else:
+            run_integration_test_shards(project_dir, env, test_files, displays, build_dir / "integration_tests")
+    finally:
+        for display in displays:
+            display.release()
 
 
 # ----------------------------------------------------------- Main procedure
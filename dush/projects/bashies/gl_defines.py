@@ -0,0 +1,437 @@
+#!/bin/python
+
+import bisect
+import concurrent.futures
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+from dush.utils import get_cache_dir
+
+"""
+Looks up #defines from OpenGL and OpenGL ES headers bundled in opengl_headers directory. Headers are parsed once
+into an index saved in Dush cache directory. It's rebuilt automatically when any header is added, removed or
+modified. Supported queries:
+    GL_TEXTURE_2D       exact name, falls back to case-insensitive substring search if there is no such define
+    GL_TEXTURE_*        prefix
+    /TEXTURE_[23]D$/    regular expression searched in names
+    0x0de1, 3553        numeric value, decimal or hexadecimal with any number of leading zeros
+
+It can also decode traces (apitrace dumps, driver debug logs), replacing numeric enum values with their names:
+    python gl_defines.py --decode trace.txt -o decoded.txt
+"""
+
+HEADER_DIRS = ["GL", "GLES"]
+INDEX_VERSION = 1
+
+DEFINE_REGEX = re.compile(r"^\s*#\s*define\s+([A-Za-z_]\w*)(?:\s+(.*?))?\s*$")
+NUMBER_REGEX = re.compile(r"^\(?\s*(0[xX][0-9a-fA-F]+|\d+)[uUlL]*\s*\)?$")
+NUMERIC_QUERY_REGEX = re.compile(r"^(0[xX][0-9a-fA-F]+|\d+)$")
+
+# Numbers in traces, which are not parts of identifiers, floats or other numbers, optionally preceded by name of
+# the parameter they are assigned to, e.g. "target = 0x0DE1" or "mode: 4"
+TRACE_NUMBER_REGEX = re.compile(r"(?:\b(\w+)\s*[=:]\s*)?(?<![\w.])(0[xX][0-9a-fA-F]+|\d+)(?![\w.])")
+TRACE_FUNCTION_REGEX = re.compile(r"\b((?:gl|egl|glX|wgl)[A-Z]\w*)\s*\(")
+VENDOR_SUFFIX_REGEX = re.compile(r"_(ARB|EXT|OES|KHR|NV|NVX|AMD|ATI|APPLE|INTEL|MESA|SGIX?|SGIS|IBM|SUN|HP|IMG|QCOM|ANGLE|ARM|OVR|3DFX|OML|INGR|PGI|REND|S3|WIN|GREMEDY|VIV|DMP|FJ|MESAX|NVX)$")
+
+# Parameters which take enums, with substrings of names which are expected for them. Decimal numbers are decoded
+# only for these parameters, because most decimal numbers in traces are sizes, offsets or object names. Hints help
+# to pick the right name when many share the value, e.g. 0x0004 is GL_TRIANGLES for "mode", but also a bit flag.
+PARAMETER_HINTS = {
+    "target": ["TEXTURE", "BUFFER", "FRAMEBUFFER", "RENDERBUFFER", "QUERY", "SAMPLES_PASSED", "PRIMITIVES", "TIME_ELAPSED"],
+    "mode": ["POINTS", "LINE", "TRIANGLE", "QUAD", "POLYGON", "PATCHES", "FILL", "POINT", "CW", "CCW", "FRONT", "BACK"],
+    "type": ["BYTE", "SHORT", "INT", "FLOAT", "DOUBLE", "HALF_FLOAT", "FIXED", "SHADER"],
+    "shadertype": ["SHADER"],
+    "format": ["RED", "GREEN", "BLUE", "ALPHA", "RG", "RGB", "RGBA", "BGR", "BGRA", "DEPTH", "STENCIL", "LUMINANCE", "INTEGER"],
+    "internalformat": ["R8", "R16", "R32", "RG", "RGB", "RGBA", "SRGB", "DEPTH", "STENCIL", "COMPRESSED", "ALPHA", "LUMINANCE", "RED"],
+    "cap": ["TEST", "BLEND", "CULL_FACE", "DITHER", "POLYGON_OFFSET", "SAMPLE", "PRIMITIVE_RESTART", "DEBUG_OUTPUT", "CLIP_DISTANCE", "MULTISAMPLE", "RASTERIZER_DISCARD", "PROGRAM_POINT_SIZE", "FRAMEBUFFER_SRGB", "TEXTURE_CUBE_MAP_SEAMLESS"],
+    "face": ["FRONT", "BACK"],
+    "func": ["NEVER", "LESS", "EQUAL", "LEQUAL", "GREATER", "NOTEQUAL", "GEQUAL", "ALWAYS"],
+    "sfactor": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "dfactor": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "srcrgb": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "dstrgb": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "srcalpha": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "dstalpha": ["ZERO", "ONE", "SRC_", "DST_", "CONSTANT_"],
+    "usage": ["_DRAW", "_READ", "_COPY"],
+    "access": ["READ_ONLY", "WRITE_ONLY", "READ_WRITE"],
+    "attachment": ["ATTACHMENT", "DEPTH", "STENCIL"],
+    "buf": ["FRONT", "BACK", "LEFT", "RIGHT", "NONE", "COLOR_ATTACHMENT"],
+    "pname": ["TEXTURE_", "PARAMETER", "STATUS", "LENGTH", "BINDING", "MAX_", "SIZE", "COUNT", "TYPE", "MODE"],
+    "param": ["NEAREST", "LINEAR", "REPEAT", "CLAMP", "MIRRORED", "COMPARE", "NONE"],
+    "error": ["NO_ERROR", "INVALID", "STACK_", "OUT_OF_MEMORY", "CONTEXT_LOST"],
+    "precisiontype": ["LOW_", "MEDIUM_", "HIGH_"],
+    "binaryformat": ["BINARY", "PROGRAM"],
+    "severity": ["DEBUG_SEVERITY"],
+    "source": ["DEBUG_SOURCE"],
+}
+
+BITFIELD_PARAMETERS = {"mask", "flags", "barriers", "access", "stages"}
+
+# Parameters which never take enums, even if their values happen to match some, e.g. "offset = 0x1000" is not
+# GL_TEXTURE_WIDTH. Matched against ends of lowercase names, so "bufSize" or "readOffset" are covered as well.
+NON_ENUM_PARAMETER_REGEX = re.compile(r"(offset|size|stride|pointer|ptr|length|address|addr|data|count|first|indices|handle)$")
+
+# Functions taking enums as unnamed arguments, whose names don't say what the enums are. Their arguments are decoded
+# as if they were assigned to the given parameter.
+FUNCTION_PARAMETERS = {
+    "glEnable": "cap",
+    "glDisable": "cap",
+    "glIsEnabled": "cap",
+    "glEnablei": "cap",
+    "glDisablei": "cap",
+    "glIsEnabledi": "cap",
+    "glCullFace": "mode",
+    "glFrontFace": "mode",
+    "glPolygonMode": "mode",
+    "glDepthFunc": "func",
+    "glStencilFunc": "func",
+    "glBlendFunc": "sfactor",
+    "glBlendFuncSeparate": "sfactor",
+    "glGetError": "error",
+}
+
+
+def parse_number(text):
+    # Leading zeros do not mean octal in queries, so treat them the same way in headers
+    match = NUMBER_REGEX.match(text) or NUMERIC_QUERY_REGEX.match(text)
+    if match is None:
+        return None
+    number = match.group(1)
+    return int(number, 16) if number[:2].lower() == "0x" else int(number, 10)
+
+
+def get_headers_root():
+    return Path(__file__).parent / "opengl_headers"
+
+
+def find_headers():
+    root = get_headers_root()
+    return sorted(path for header_dir in HEADER_DIRS for path in (root / header_dir).glob("*.h"))
+
+
+def get_header_mtimes():
+    root = get_headers_root()
+    return {path.relative_to(root).as_posix(): path.stat().st_mtime_ns for path in find_headers()}
+
+
+def build_index():
+    # Each define is stored as [name, value, numeric value or None, header, line]. Names defined in multiple
+    # headers (e.g. core enums repeated in GL.h and glext.h) are stored once with the first location.
+    root = get_headers_root()
+    defines = {}
+    for path in find_headers():
+        header = path.relative_to(root).as_posix()
+        with open(path, "r", errors="replace") as file:
+            for line_number, line in enumerate(file, 1):
+                match = DEFINE_REGEX.match(line)
+                if match is None or line[match.end(1) : match.end(1) + 1] == "(":
+                    continue  # Not a define or a function-like macro
+                name, value = match.group(1), (match.group(2) or "").split("/*")[0].split("//")[0].strip()
+                if name not in defines:
+                    defines[name] = [name, value, parse_number(value), header, line_number]
+
+    # Resolve aliases, e.g. "#define GL_DRAW_FRAMEBUFFER_BINDING GL_FRAMEBUFFER_BINDING"
+    for define in defines.values():
+        target = defines.get(define[1])
+        if define[2] is None and target is not None:
+            define[2] = target[2]
+
+    return {
+        "version": INDEX_VERSION,
+        "headers": get_header_mtimes(),
+        "defines": sorted(defines.values()),
+    }
+
+
+def load_index():
+    index_path = get_cache_dir("gl_defines") / "index.json"
+    try:
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        if index.get("version") == INDEX_VERSION and index.get("headers") == get_header_mtimes():
+            return index
+    except (OSError, ValueError):
+        pass
+
+    index = build_index()
+    tmp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump(index, file, separators=(",", ":"))
+    os.replace(tmp_path, index_path)
+    return index
+
+
+class GlDefines:
+    """
+    In-memory lookup structures built from the index. Exact and numeric queries are dictionary lookups and prefix
+    queries are a binary search in sorted names, so they take microseconds. Regular expressions scan all names.
+    """
+
+    def __init__(self, index):
+        self._defines = index["defines"]
+        self._names = [define[0] for define in self._defines]
+        self._by_name = {define[0]: define for define in self._defines}
+        self._by_value = {}
+        for define in self._defines:
+            if define[2] is not None:
+                self._by_value.setdefault(define[2], []).append(define)
+
+    def find_by_name(self, name):
+        define = self._by_name.get(name)
+        return [define] if define is not None else []
+
+    def find_by_value(self, value):
+        return self._by_value.get(value, [])
+
+    def find_by_prefix(self, prefix):
+        begin = bisect.bisect_left(self._names, prefix)
+        end = begin
+        while end < len(self._names) and self._names[end].startswith(prefix):
+            end += 1
+        return self._defines[begin:end]
+
+    def find_by_regex(self, pattern, flags=0):
+        regex = re.compile(pattern, flags)
+        return [define for define in self._defines if regex.search(define[0])]
+
+    def query(self, query):
+        query = query.strip()
+        if NUMERIC_QUERY_REGEX.match(query):
+            return self.find_by_value(parse_number(query))
+        if len(query) > 1 and query.startswith("/") and query.endswith("/"):
+            return self.find_by_regex(query[1:-1])
+        if query.endswith("*"):
+            return self.find_by_prefix(query[:-1])
+        return self.find_by_name(query) or self.find_by_regex(re.escape(query), re.IGNORECASE)
+
+
+def _split_identifier_words(identifier):
+    # glDrawArrays -> {"DRAW", "ARRAYS"}, GL_TEXTURE_2D -> {"TEXTURE", "2D"}
+    words = re.findall(r"[A-Z]+[a-z0-9]*|[a-z]+[0-9]*|[0-9]+[A-Za-z]*", identifier)
+    return {word.upper() for word in words} - {"GL", "EGL", "GLX", "WGL"}
+
+
+class GlTraceDecoder:
+    """
+    Replaces numeric enum values in lines of text traces with names of GL defines. Many names can share a value,
+    e.g. 0x0001 is GL_LINES, GL_ONE, GL_TRUE and a few dozen bit flags. Candidates are scored by the context the
+    number appears in:
+        - name of the parameter it's assigned to ("target = 0x0DE1", "mode: 4"), matched against PARAMETER_HINTS,
+        - words of the called function's name, e.g. glCreateShader(0x8B31) prefers names containing SHADER,
+        - core names are preferred over vendor-suffixed aliases, GL_ names over GLX_/WGL_ ones,
+        - bit flags are avoided unless the parameter is a bitfield.
+    Numbers assigned to parameters like offsets or sizes are never decoded. Unnamed numbers are decoded only inside
+    GL calls and only if the parameter or function context matches the chosen name, so addresses or sizes printed
+    without names are left alone. Decisions depend only on the parameter, function and value, so they are memoized.
+    Memory usage is constant.
+    """
+
+    def __init__(self, gl_defines):
+        self._gl_defines = gl_defines
+        self._decisions = {}
+
+    def _choose_name(self, value, parameter, function):
+        # Returns the best name and whether the parameter or function context matched it
+        key = (value, parameter, function)
+        if key in self._decisions:
+            return self._decisions[key]
+
+        hints = PARAMETER_HINTS.get(parameter, []) if parameter is not None else []
+        function_words = _split_identifier_words(function) if function is not None else set()
+
+        best_name = None
+        best_score = None
+        for define in self._gl_defines.find_by_value(value):
+            name = define[0]
+            if not name.startswith(("GL_", "GLX_", "WGL_", "EGL_")) or define[1] in ("", name):
+                continue
+            context_score = 0
+            if any(hint in name for hint in hints):
+                context_score += 4
+            context_score += 2 * len(function_words & _split_identifier_words(name))
+            score = context_score
+            if name.startswith("GL_"):
+                score += 1
+            if VENDOR_SUFFIX_REGEX.search(name) is None:
+                score += 1
+            if "_BIT" in name and parameter not in BITFIELD_PARAMETERS:
+                score -= 2  # Bit flags share small values with everything else, but are rarely passed alone
+            score = (score, context_score, -len(name))
+            if best_score is None or score > best_score:
+                best_name, best_score = name, score
+
+        decision = (best_name, best_score is not None and best_score[1] > 0)
+        self._decisions[key] = decision
+        return decision
+
+    @staticmethod
+    def _find_enclosing_function(line, position):
+        # Name of the GL function whose argument list contains the position, e.g. glBindTexture for 0x0DE1 in
+        # "glBindTexture(0x0DE1, 5)". Calls which were already closed don't count.
+        function_match = None
+        for match in TRACE_FUNCTION_REGEX.finditer(line, 0, position):
+            function_match = match
+        if function_match is None or ")" in line[function_match.end() : position]:
+            return None
+        return function_match.group(1)
+
+    def _replace_number(self, match):
+        parameter, number = match.group(1, 2)
+        parameter = parameter.lower() if parameter is not None else None
+        if parameter is not None and NON_ENUM_PARAMETER_REGEX.search(parameter):
+            return match.group(0)
+        value = parse_number(number)
+
+        # Unnamed numbers are decoded only as arguments of GL calls. Some functions say what their arguments are.
+        function = None
+        is_unnamed = parameter is None
+        if is_unnamed:
+            function = self._find_enclosing_function(match.string, match.start())
+            if function is None:
+                return match.group(0)
+            parameter = FUNCTION_PARAMETERS.get(function)
+
+        # Decimal numbers and small hex numbers (0x0 - 0xFF are mostly bit flags and booleans) are usually not enums.
+        # Decode them only when assigned to a parameter known to take enums.
+        if parameter not in PARAMETER_HINTS and (number[:2] not in ("0x", "0X") or value < 0x100):
+            return match.group(0)
+        candidates = self._gl_defines.find_by_value(value)
+        if not candidates:
+            return match.group(0)
+
+        # Function name of named parameters matters only when there is something to choose from
+        if not is_unnamed and len(candidates) > 1:
+            function = self._find_enclosing_function(match.string, match.start())
+
+        name, is_context_matched = self._choose_name(value, parameter, function)
+        if name is None or (is_unnamed and not is_context_matched):
+            return match.group(0)
+        return match.group(0)[: match.start(2) - match.start()] + name
+
+    def decode_line(self, line):
+        return TRACE_NUMBER_REGEX.sub(self._replace_number, line)
+
+    def decode_stream(self, input_file, output_file):
+        for line in input_file:
+            output_file.write(self.decode_line(line))
+
+
+def _find_chunk_boundaries(path, chunks_count):
+    # Splits the file into byte ranges starting at line beginnings
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as file:
+        for index in range(1, chunks_count):
+            file.seek(max(size * index // chunks_count, boundaries[-1]))
+            file.readline()
+            boundaries.append(file.tell())
+    boundaries.append(size)
+    return sorted(set(boundaries))
+
+
+_worker_decoder = None
+
+
+def _decode_chunk(path, begin, end, output_path):
+    global _worker_decoder
+    if _worker_decoder is None:
+        _worker_decoder = GlTraceDecoder(GlDefines(load_index()))
+
+    with open(path, "rb") as input_file, open(output_path, "w", newline="") as output_file:
+        input_file.seek(begin)
+        while input_file.tell() < end:
+            line = input_file.readline().decode("utf-8", errors="replace")
+            output_file.write(_worker_decoder.decode_line(line))
+
+
+def decode_file_parallel(path, output_file, jobs):
+    # Chunks are decoded to temporary files by worker processes and concatenated in order. There are more chunks
+    # than workers, so a chunk with unusually long lines does not hold up everything.
+    boundaries = _find_chunk_boundaries(path, jobs * 4)
+    with tempfile.TemporaryDirectory(prefix="gl_decode_") as tmp_dir:
+        chunk_paths = [Path(tmp_dir) / f"chunk_{index}.txt" for index in range(len(boundaries) - 1)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(_decode_chunk, path, begin, end, chunk_path) for begin, end, chunk_path in zip(boundaries, boundaries[1:], chunk_paths)]
+            for future in futures:
+                future.result()
+        for chunk_path in chunk_paths:
+            with open(chunk_path, "r", newline="") as chunk_file:
+                shutil.copyfileobj(chunk_file, output_file)
+
+
+def format_defines(defines):
+    if not defines:
+        return "    (no matches)"
+    name_width = max(len(define[0]) for define in defines)
+    value_width = max(len(define[1]) for define in defines)
+    return "\n".join(f"    {name:<{name_width}}  {value:<{value_width}}  {header}:{line}" for name, value, _, header, line in defines)
+
+
+def run_repl(gl_defines):
+    try:
+        import readline  # noqa: F401 Enables line editing and history in input()
+    except ImportError:
+        pass
+
+    while True:
+        try:
+            query = input("Specify pattern to search in GL headers: ")
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if query.strip():
+            print(format_defines(gl_defines.query(query)))
+            print()
+
+
+def run_batch(gl_defines, input_file, output_file):
+    # One query per line, one line of output per query: the query, a tab and matching names separated with "|".
+    # Meant for scripts decoding many enum values from API traces, which would otherwise start a process each.
+    for line in input_file:
+        query = line.strip()
+        if query:
+            names = "|".join(define[0] for define in gl_defines.query(query))
+            output_file.write(f"{query}\t{names}\n")
+
+
+if __name__ == "__main__":
+    # fmt: off
+    arg_parser = ArgumentParser(description="Search #defines in OpenGL and OpenGL ES headers.", allow_abbrev=False)
+    arg_parser.add_argument('queries', type=str, nargs='*', help="Name, NAME_PREFIX*, /regex/ or a numeric value. Starts interactive mode if not specified.")
+    arg_parser.add_argument('-b', '--batch', action="store_true", help="Read queries from stdin, one per line")
+    arg_parser.add_argument('-d', '--decode', type=str, default=None, help='Decode enum values in a trace file or "-" for stdin')
+    arg_parser.add_argument('-o', '--output', type=str, default=None, help="Output file for decoded trace, stdout by default")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="Number of processes decoding a trace file")
+    arg_parser.add_argument('--rebuild-index', action="store_true")
+    args = arg_parser.parse_args()
+    # fmt: on
+
+    if args.rebuild_index:
+        get_cache_dir("gl_defines").joinpath("index.json").unlink(missing_ok=True)
+    gl_defines = GlDefines(load_index())
+
+    if args.decode is not None:
+        output_file = open(args.output, "w", newline="") if args.output else sys.stdout
+        with output_file:
+            # Small files and pipes are decoded in this process. Large files are split into chunks.
+            if args.decode == "-" or args.jobs <= 1 or os.path.getsize(args.decode) < 16 * 1024 * 1024:
+                input_file = sys.stdin if args.decode == "-" else open(args.decode, "r", errors="replace", newline="")
+                with input_file:
+                    GlTraceDecoder(gl_defines).decode_stream(input_file, output_file)
+            else:
+                output_file.flush()
+                decode_file_parallel(args.decode, output_file, args.jobs)
+    elif args.batch:
+        run_batch(gl_defines, sys.stdin, sys.stdout)
+    elif args.queries:
+        for query in args.queries:
+            print(f'Searching for "{query}"', file=sys.stderr)
+            print(format_defines(gl_defines.query(query)))
+    else:
+        run_repl(gl_defines)
@@ -1,8 +1,17 @@
 #!/bin/python
 
+import os
+import shlex
+import sys
 from argparse import ArgumentParser
+from array import array
 from enum import Enum
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class SwizzleNotation(Enum):
     Xyzw = "XYZW"
@@ -12,19 +21,118 @@ class SwizzleNotation(Enum):
     NumbersOne = "1234"
 
 
+# Component type name -> (NumPy dtype, size in bytes)
+COMPONENT_TYPES = {
+    "u8": ("uint8", 1),
+    "u16": ("uint16", 2),
+    "f32": ("float32", 4),
+}
+
+# Buffers are processed in chunks of this many pixels, so memory usage does not depend on the size of the input
+CHUNK_PIXELS = 1024 * 1024
+
+
 def error(*args, **kwargs):
     print("ERROR: ", *args, **kwargs)
     exit(1)
 
 
+class SwizzleError(Exception):
+    pass
+
+
+class SwizzleArgumentsError(SwizzleError):
+    pass
+
+
+# There are only 4^4 = 256 swizzle patterns. Each one is identified by an index with the first component in the
+# most significant position, so ordering of indices is the lexicographical ordering of patterns.
+SWIZZLES_COUNT = 256
+NO_SWIZZLE = 0xFF  # Marks non-invertible patterns in the reverse table. Pattern 3333 is never anyone's reverse.
+
+
+def _pattern_to_index(pattern_value):
+    return (pattern_value[0] << 6) | (pattern_value[1] << 4) | (pattern_value[2] << 2) | pattern_value[3]
+
+
+def _index_to_pattern(index):
+    return [(index >> 6) & 3, (index >> 4) & 3, (index >> 2) & 3, index & 3]
+
+
+def _get_canonical_numbers(vector):
+    # Assigns values numbers of their first occurrences, e.g. [x, y, x, z] is numbered as 0, 1, 0, 2. Solutions of
+    # find_swizzle only depend on which components are equal, not on the values themselves.
+    numbers = {}
+    for value in vector:
+        if value not in numbers:
+            numbers[value] = len(numbers)
+    return numbers
+
+
+class SwizzleTables:
+    """
+    Precomputed results of all operations on swizzles, so each query is a table lookup:
+        - compose: 256x256 array of indices of a swizzle equal to applying two swizzles one after another,
+        - reverse: 256 array of indices of inverse swizzles or NO_SWIZZLE for patterns which are not permutations,
+        - solutions: all swizzles transforming a source vector to a destination vector. Both vectors are
+          expressed with canonical numbers of the source components, so they can be encoded like patterns. Source
+          is one of 15 ways to split 4 components into groups of equal values. Solutions are sorted, so the first
+          one is the lexicographically smallest, which is what greedy search of the first matching component
+          returns.
+    Building them takes a few tens of milliseconds, so it's done on first use.
+    """
+
+    def __init__(self):
+        self.patterns = patterns = [_index_to_pattern(index) for index in range(SWIZZLES_COUNT)]
+        is_permutation = [len(set(pattern)) == 4 for pattern in patterns]
+
+        self.compose = array("B", bytes(SWIZZLES_COUNT * SWIZZLES_COUNT))
+        for first_index, first in enumerate(patterns):
+            row = first_index * SWIZZLES_COUNT
+            for second_index, second in enumerate(patterns):
+                self.compose[row + second_index] = _pattern_to_index([first[v] for v in second])
+
+        self.reverse = array("B", [NO_SWIZZLE] * SWIZZLES_COUNT)
+        for index, pattern in enumerate(patterns):
+            if is_permutation[index]:
+                self.reverse[index] = _pattern_to_index([pattern.index(v) for v in range(4)])
+
+        self.solutions = {}
+        self.permutation_solutions = {}
+        for signature in patterns:
+            numbers = _get_canonical_numbers(signature)
+            if [numbers[value] for value in signature] != signature:
+                continue  # Not canonical
+            for index, pattern in enumerate(patterns):
+                key = _pattern_to_index(signature) * SWIZZLES_COUNT + _pattern_to_index([signature[v] for v in pattern])
+                self.solutions.setdefault(key, []).append(index)
+                if is_permutation[index]:
+                    self.permutation_solutions.setdefault(key, []).append(index)
+
+
+_tables = None
+
+
+def get_swizzle_tables():
+    global _tables
+    if _tables is None:
+        _tables = SwizzleTables()
+    return _tables
+
+
 class Swizzle:
-    def __init__(self, pattern_value):
+    def __init__(self, pattern_value, index=None):
         self._pattern_value = pattern_value
+        self._index = index if index is not None else _pattern_to_index(pattern_value)
+
+    @staticmethod
+    def from_index(index):
+        return Swizzle(list(get_swizzle_tables().patterns[index]), index)
 
     @staticmethod
     def parse_pattern_notation(pattern_string):
         if len(pattern_string) != 4:
-            error(f'Invalid pattern "{pattern_string}". Must be 4 characters.')
+            raise SwizzleError(f'Invalid pattern "{pattern_string}". Must be 4 characters.')
 
         detected_notation = None
         for notation in SwizzleNotation:
@@ -35,7 +143,7 @@ class Swizzle:
                 break
 
         if detected_notation is None:
-            error(f'Invalid pattern "{pattern_string}". Unexpected characters.')
+            raise SwizzleError(f'Invalid pattern "{pattern_string}". Unexpected characters.')
 
         return detected_notation
 
@@ -45,45 +153,55 @@ class Swizzle:
             pattern_value = [notation.value.index(c) for c in pattern_string.upper()]
             return Swizzle(pattern_value)
         except ValueError:
-            error("Invalid pattern value.")
+            raise SwizzleError("Invalid pattern value.")
 
     @staticmethod
-    def find_swizzle(vector_src, vector_dst, allow_duplicates):
-        available_indices = [0, 1, 2, 3]
-        result = [None, None, None, None]
+    def _find_solution_indices(vector_src, vector_dst, allow_duplicates):
+        numbers = _get_canonical_numbers(vector_src)
+        try:
+            signature_src = _pattern_to_index([numbers[value] for value in vector_src])
+            signature_dst = _pattern_to_index([numbers[value] for value in vector_dst])
+        except KeyError:
+            return ()
 
-        for dst_i, dst in enumerate(vector_dst):
-            # Find matching element in src vector
-            src_i = None
-            src = None
-            for i in available_indices:
-                if vector_src[i] == dst:
-                    src_i = i
-                    src = vector_src[i]
-                    break
-            if src is None:
-                error("Cannot match src and dst vectors")
+        tables = get_swizzle_tables()
+        solutions = tables.solutions if allow_duplicates else tables.permutation_solutions
+        return solutions.get(signature_src * SWIZZLES_COUNT + signature_dst, ())
 
-            # Remove from allowed indices list
-            if not allow_duplicates:
-                available_indices.remove(i)
+    @staticmethod
+    def find_all_swizzles(vector_src, vector_dst, allow_duplicates):
+        # Returns all swizzles transforming src vector to dst vector, lexicographically sorted
+        return [Swizzle.from_index(index) for index in Swizzle._find_solution_indices(vector_src, vector_dst, allow_duplicates)]
 
-            result[dst_i] = src_i
+    @staticmethod
+    def find_swizzle(vector_src, vector_dst, allow_duplicates):
+        solutions = Swizzle._find_solution_indices(vector_src, vector_dst, allow_duplicates)
+        if not solutions:
+            raise SwizzleError("Cannot match src and dst vectors")
+        return Swizzle.from_index(solutions[0])
 
-        return Swizzle(result)
+    @staticmethod
+    def _prepare_solve(vector_src, pre_swizzles, post_swizzles, vector_dst):
+        # Searched swizzle X satisfies post(X(pre(src))) = dst, so it transforms pre(src) to reverse(post)(dst)
+        vector_src = Swizzle.compose(pre_swizzles).apply(vector_src)
+        vector_dst = Swizzle.compose(post_swizzles).reverse_pattern().apply(vector_dst)
+        return vector_src, vector_dst
 
     @staticmethod
     def solve(vector_src, pre_swizzles, post_swizzles, vector_dst, allow_duplicates):
-        for s in pre_swizzles:
-            vector_src = s.apply(vector_src)
-        for s in post_swizzles:
-            vector_dst = s.reverse_pattern().apply(vector_dst)
-
+        vector_src, vector_dst = Swizzle._prepare_solve(vector_src, pre_swizzles, post_swizzles, vector_dst)
         return Swizzle.find_swizzle(vector_src, vector_dst, allow_duplicates)
 
+    @staticmethod
+    def solve_all(vector_src, pre_swizzles, post_swizzles, vector_dst, allow_duplicates):
+        vector_src, vector_dst = Swizzle._prepare_solve(vector_src, pre_swizzles, post_swizzles, vector_dst)
+        return Swizzle.find_all_swizzles(vector_src, vector_dst, allow_duplicates)
+
     def reverse_pattern(self):
-        new_value = [self._pattern_value.index(v) for v in [0, 1, 2, 3]]
-        return Swizzle(new_value)
+        reverse_index = get_swizzle_tables().reverse[self._index]
+        if reverse_index == NO_SWIZZLE:
+            raise SwizzleError(f"Pattern {self.format_pattern(SwizzleNotation.Rgba)} cannot be reversed, because it duplicates components.")
+        return Swizzle.from_index(reverse_index)
 
     def format_pattern(self, notation):
         return "".join([notation.value[v] for v in self._pattern_value])
@@ -91,11 +209,126 @@ class Swizzle:
     def apply(self, vector):
         return [vector[v] for v in self._pattern_value]
 
-
-if __name__ == "__main__":
+    @staticmethod
+    def compose(swizzles):
+        # Chain of swizzles is equivalent to a single one, which is looked up in the composition table
+        compose_table = get_swizzle_tables().compose
+        index = _pattern_to_index([0, 1, 2, 3])
+        for s in swizzles:
+            index = compose_table[index * SWIZZLES_COUNT + s._index]
+        return Swizzle.from_index(index)
+
+    def apply_buffer_chunk(self, chunk, component_size):
+        # Reorders components of pixels in a chunk of raw data. NumPy gathers the components with indexed take,
+        # which, unlike chunk[:, pattern], returns a C-contiguous array that can be written straight to a file.
+        # Without NumPy, each byte lane of each component is copied with an extended slice of a memoryview, which
+        # still runs at C speed.
+        if numpy is not None:
+            return numpy.take(chunk, self._pattern_value, axis=1)
+
+        source = memoryview(chunk)
+        result = bytearray(len(chunk))
+        pixel_size = 4 * component_size
+        for dst_component, src_component in enumerate(self._pattern_value):
+            for byte in range(component_size):
+                dst_offset = dst_component * component_size + byte
+                src_offset = src_component * component_size + byte
+                result[dst_offset::pixel_size] = source[src_offset::pixel_size]
+        return result
+
+
+def _read_chunk(file, size):
+    # Pipes can return less data than requested, so keep reading until the chunk is full or input ends
+    chunk = bytearray()
+    while len(chunk) < size:
+        data = file.read(size - len(chunk))
+        if not data:
+            break
+        chunk += data
+    return chunk
+
+
+def _swizzle_stream(swizzle, input_file, output_file, component_type):
+    dtype, component_size = COMPONENT_TYPES[component_type]
+    pixel_size = 4 * component_size
+    while chunk := _read_chunk(input_file, CHUNK_PIXELS * pixel_size):
+        if len(chunk) % pixel_size != 0:
+            raise SwizzleError(f"Input size is not a multiple of pixel size ({pixel_size} bytes)")
+        if numpy is not None:
+            chunk = numpy.frombuffer(chunk, dtype=dtype).reshape(-1, 4)
+        output_file.write(swizzle.apply_buffer_chunk(chunk, component_size))
+
+
+def _swizzle_file_in_place(swizzle, path, component_type):
+    dtype, component_size = COMPONENT_TYPES[component_type]
+    if numpy is not None and os.path.getsize(path) > 0:
+        pixels = numpy.memmap(path, dtype=dtype, mode="r+").reshape(-1, 4)
+        for begin in range(0, len(pixels), CHUNK_PIXELS):
+            pixels[begin : begin + CHUNK_PIXELS] = swizzle.apply_buffer_chunk(pixels[begin : begin + CHUNK_PIXELS], component_size)
+        pixels.flush()
+        return
+
+    with open(path, "r+b") as file:
+        while True:
+            position = file.tell()
+            chunk = file.read(CHUNK_PIXELS * 4 * component_size)
+            if not chunk:
+                break
+            file.seek(position)
+            file.write(swizzle.apply_buffer_chunk(chunk, component_size))
+
+
+def _swizzle_file(swizzle, input_path, output_path, component_type):
+    dtype, component_size = COMPONENT_TYPES[component_type]
+    if numpy is None or os.path.getsize(input_path) == 0:
+        with open(input_path, "rb") as input_file, open(output_path, "wb") as output_file:
+            _swizzle_stream(swizzle, input_file, output_file, component_type)
+        return
+
+    # Memory-mapping lets the OS page data in and out, so files larger than RAM are fine
+    input_pixels = numpy.memmap(input_path, dtype=dtype, mode="r").reshape(-1, 4)
+    output_pixels = numpy.memmap(output_path, dtype=dtype, mode="w+", shape=input_pixels.shape)
+    for begin in range(0, len(input_pixels), CHUNK_PIXELS):
+        output_pixels[begin : begin + CHUNK_PIXELS] = swizzle.apply_buffer_chunk(input_pixels[begin : begin + CHUNK_PIXELS], component_size)
+    output_pixels.flush()
+
+
+def apply_swizzle_to_buffer(swizzle, input_path, output_path, component_type, in_place):
+    """
+    Reorders components of raw 4-component pixel data, e.g. RGBA to BGRA or YUVA to AYUV. Paths equal to "-"
+    stand for stdin and stdout.
+    """
+
+    _, component_size = COMPONENT_TYPES[component_type]
+    pixel_size = 4 * component_size
+    if input_path != "-" and os.path.getsize(input_path) % pixel_size != 0:
+        raise SwizzleError(f"Size of {input_path} is not a multiple of pixel size ({pixel_size} bytes)")
+
+    if in_place:
+        if input_path == "-":
+            raise SwizzleError("Cannot swizzle stdin in place")
+        _swizzle_file_in_place(swizzle, input_path, component_type)
+    elif input_path != "-" and output_path != "-" and os.path.exists(output_path) and os.path.samefile(input_path, output_path):
+        raise SwizzleError("Output is the same file as input. Use --in-place instead.")
+    elif input_path == "-" or output_path == "-":
+        input_file = sys.stdin.buffer if input_path == "-" else open(input_path, "rb")
+        output_file = sys.stdout.buffer if output_path == "-" else open(output_path, "wb")
+        with input_file, output_file:
+            _swizzle_stream(swizzle, input_file, output_file, component_type)
+    else:
+        _swizzle_file(swizzle, input_path, output_path, component_type)
+
+
+class BatchArgumentParser(ArgumentParser):
+    # Reports errors with an exception instead of exiting, so one bad query does not end the batch
+    def error(self, message):
+        raise SwizzleArgumentsError(message)
+
+
+def create_arg_parser(parser_class=ArgumentParser):
     # fmt: off
-    arg_parser = ArgumentParser(description="Downscale images to match given disk size constraints.", allow_abbrev=False)
-    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    arg_parser = parser_class(description="Manipulate and solve 4-component swizzle patterns.", allow_abbrev=False)
+    subparsers = arg_parser.add_subparsers(dest='command', required=True, parser_class=parser_class)
 
     arg_parser_reverse = subparsers.add_parser('reverse')
     arg_parser_reverse.add_argument('pattern', type=str)
@@ -108,6 +341,13 @@ if __name__ == "__main__":
     arg_parser_apply.add_argument('component3', type=str)
     arg_parser_apply.add_argument('patterns', type=str, nargs='+')
 
+    arg_parser_apply_buffer = subparsers.add_parser('apply-buffer')
+    arg_parser_apply_buffer.add_argument('patterns', type=str, nargs='+')
+    arg_parser_apply_buffer.add_argument('-i', '--input', type=str, required=True, help='Raw pixel data file or "-" for stdin')
+    arg_parser_apply_buffer.add_argument('-o', '--output', type=str, default=None, help='Output file or "-" for stdout')
+    arg_parser_apply_buffer.add_argument('-t', '--component-type', choices=COMPONENT_TYPES.keys(), default="u8")
+    arg_parser_apply_buffer.add_argument('--in-place', action="store_true")
+
     arg_parser_convert = subparsers.add_parser('convert')
     arg_parser_convert.add_argument('pattern', type=str)
     arg_parser_convert.add_argument("out", type=SwizzleNotation)
@@ -120,10 +360,20 @@ if __name__ == "__main__":
     arg_parser_solve.add_argument('rest', type=str, nargs='+')
     arg_parser_solve.add_argument('-o', '--out', type=SwizzleNotation, default=SwizzleNotation.Rgba)
     arg_parser_solve.add_argument('-d', '--allow-duplicates', action="store_true")
+    arg_parser_solve.add_argument('-a', '--all', action="store_true", help="Print all solutions instead of the first one")
 
-    args = arg_parser.parse_args()
+    subparsers.add_parser('batch', help="Execute queries read from stdin, one per line")
     # fmt: on
 
+    return arg_parser, subparsers.choices
+
+
+def parse_swizzles(patterns):
+    return [Swizzle.from_string(pattern, Swizzle.parse_pattern_notation(pattern)) for pattern in patterns]
+
+
+def execute(args):
+    # Executes a query and returns its output. Errors are raised as SwizzleError.
     match (args.command):
         case "reverse":
             inp_notation = Swizzle.parse_pattern_notation(args.pattern)
@@ -131,23 +381,23 @@ if __name__ == "__main__":
 
             swizzle = Swizzle.from_string(args.pattern, inp_notation)
             swizzle = swizzle.reverse_pattern()
-            print(swizzle.format_pattern(out_notation))
+            return swizzle.format_pattern(out_notation)
         case "apply":
             vector = [args.component0, args.component1, args.component2, args.component3]
-
-            for pattern in args.patterns:
-                inp_notation = Swizzle.parse_pattern_notation(pattern)
-                swizzle = Swizzle.from_string(pattern, inp_notation)
-                vector = swizzle.apply(vector)
-
-            for component in vector:
-                print(component, end=" ")
-            print()
+            vector = Swizzle.compose(parse_swizzles(args.patterns)).apply(vector)
+            return " ".join(vector) + " "
+        case "apply-buffer":
+            if args.in_place == (args.output is not None):
+                raise SwizzleArgumentsError("Specify either an output or --in-place.")
+
+            swizzle = Swizzle.compose(parse_swizzles(args.patterns))
+            apply_swizzle_to_buffer(swizzle, args.input, args.output, args.component_type, args.in_place)
+            return None
         case "convert":
             inp_notation = Swizzle.parse_pattern_notation(args.pattern)
             out_notation = args.out if args.out is not None else inp_notation
             swizzle = Swizzle.from_string(args.pattern, inp_notation)
-            print(swizzle.format_pattern(out_notation))
+            return swizzle.format_pattern(out_notation)
         case "solve":
             vector_src = [args.component_src0, args.component_src1, args.component_src2, args.component_src3]
 
@@ -161,26 +411,67 @@ if __name__ == "__main__":
                 # Do not let passing extra swizzles, because we wouldn't know which ones
                 # are pre-swizzles and which ones are post-swizzles.
                 if len(args.rest) < 4:
-                    arg_parser_solve.print_help()
-                    error("Destination vector not fully specified.")
+                    raise SwizzleArgumentsError("Destination vector not fully specified.")
                 if len(args.rest) > 4:
-                    arg_parser_solve.print_help()
-                    error('Too many arguments. Either specify "?" to show which swizzle is searched or specify only src and dst vectors')
+                    raise SwizzleArgumentsError('Too many arguments. Either specify "?" to show which swizzle is searched or specify only src and dst vectors')
                 pre_swizzles = []
                 post_swizzles = []
                 vector_dst = args.rest
             else:
                 # Question mark shows the location of the swizzle we are searching for.
                 if position >= len(args.rest) - 4:
-                    arg_parser_solve.print_help()
-                    error("Destination vector not fully specified.")
+                    raise SwizzleArgumentsError("Destination vector not fully specified.")
                 vector_dst = args.rest[-4:]
                 pre_swizzles = args.rest[:position]
                 post_swizzles = args.rest[position + 1 : -4]
 
             # Parse the swizzles
-            pre_swizzles = [Swizzle.from_string(s, Swizzle.parse_pattern_notation(s)) for s in pre_swizzles]
-            post_swizzles = [Swizzle.from_string(s, Swizzle.parse_pattern_notation(s)) for s in post_swizzles]
-
+            pre_swizzles = parse_swizzles(pre_swizzles)
+            post_swizzles = parse_swizzles(post_swizzles)
+
+            if args.all:
+                swizzles = Swizzle.solve_all(vector_src, pre_swizzles, post_swizzles, vector_dst, args.allow_duplicates)
+                if not swizzles:
+                    raise SwizzleError("Cannot match src and dst vectors")
+                return " ".join(swizzle.format_pattern(args.out) for swizzle in swizzles)
             swizzle = Swizzle.solve(vector_src, pre_swizzles, post_swizzles, vector_dst, args.allow_duplicates)
-            print(swizzle.format_pattern(args.out))
+            return swizzle.format_pattern(args.out)
+
+
+def execute_batch(input_file, output_file):
+    # Every line is a query with the same syntax as command line arguments, e.g. "solve x y z w ? w z y x".
+    # Exactly one line is printed per query. Failed queries print a line starting with "ERROR:" and the batch
+    # goes on. Output is flushed after each query, so the tool can be driven interactively through pipes.
+    arg_parser, _ = create_arg_parser(BatchArgumentParser)
+    for line in input_file:
+        try:
+            query = shlex.split(line, comments=True)
+            if not query:
+                continue
+            args = arg_parser.parse_args(query)
+            if args.command in ("batch", "apply-buffer"):
+                raise SwizzleError(f"{args.command} is not supported in batch mode")
+            output = execute(args)
+        except (SwizzleError, ValueError) as e:
+            output = f"ERROR: {e}"
+        output_file.write(f"{output}\n")
+        output_file.flush()
+
+
+if __name__ == "__main__":
+    arg_parser, subparsers = create_arg_parser()
+    args = arg_parser.parse_args()
+
+    if args.command == "batch":
+        execute_batch(sys.stdin, sys.stdout)
+        exit(0)
+
+    try:
+        output = execute(args)
+    except SwizzleArgumentsError as e:
+        subparsers[args.command].print_help()
+        error(e)
+    except SwizzleError as e:
+        error(e)
+    if output is not None:
+        print(output)
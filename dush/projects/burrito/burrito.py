@@ -1,9 +1,11 @@
-import tempfile
+import concurrent.futures
+import re
 from pathlib import Path
 
 import dush.core as core
 from dush.framework import *
 from dush.utils import *
+from dush.utils import Jobserver, run_cached_step
 
 # ----------------------------------------------------------- Helpers for commands
 is_main = __name__ == "__main__"
@@ -30,74 +32,57 @@ def get_godot_gui(godot_binary_dir):
     return godot_binary_dir / "godot_gui"
 
 
-# ----------------------------------------------------------- Commands
-
-import os
-
-
-@linux_only
-def download_file(url, destination_path):
-    command = f"wget -q {url} -O {destination_path}"
-    run_command(command)
-
-
-@linux_only
-def unzip(zip_path, destination_dir_path, directory_inside_zip=None):
-    directory_inside_zip_arg = f"{directory_inside_zip}/*" if directory_inside_zip else ""
+def get_cargo_crates():
+    return ["burrito-fg", "taco_parser"]
 
-    destination_dir_path.mkdir(parents=True, exist_ok=True)
-    command = f"unzip -o {zip_path} {directory_inside_zip_arg} -d {destination_dir_path}"
-    run_command(command)
 
-    if directory_inside_zip:
-        extracted_dir = destination_dir_path / directory_inside_zip
-        for extracted_file in extracted_dir.iterdir():
-            renamed_extracted_file = destination_dir_path / extracted_file.name
-            extracted_file.rename(renamed_extracted_file)
-        extracted_dir.rmdir()
-
-
-@linux_only
-def download_and_unpack_zip(url, destination_dir_path, directory_inside_zip=None):
-    destination_dir_path.mkdir(parents=True, exist_ok=True)
-    with tempfile.NamedTemporaryFile(dir=destination_dir_path, prefix="dush_tmp_", suffix=".zip") as f:
-        f.close()
-        download_file(url, f.name)
-        unzip(f.name, destination_dir_path, directory_inside_zip)
-        os.remove(f.name)
+def get_godot_native_libraries(project_dir):
+    # Godot loads native libraries listed in .gdnlib files, e.g. X11.64="res://burrito-fg/target/release/lib.so".
+    # Returns paths of those libraries relative to the project directory.
+    libraries = set()
+    for gdnlib_path in [*project_dir.glob("*.gdnlib"), *project_dir.glob("*/*.gdnlib")]:
+        libraries.update(re.findall(r'"res://([^"]+)"', gdnlib_path.read_text()))
+    return sorted(libraries)
 
 
+# ----------------------------------------------------------- Commands
 @command
 def download_build_dependencies():
     godot_version = "3.3.2"
+    releases_url = f"https://github.com/godotengine/godot/releases/download/{godot_version}-stable"
 
     project_dir = get_project_dir()
     bin_dir = get_godot_binary_dir(project_dir)
     core.add_transient_gitignore(bin_dir)
     godot_cli = get_godot_cli(bin_dir)
     godot_gui = get_godot_gui(bin_dir)
+    templates_dir = Path.home() / f".local/share/godot/templates/{godot_version}.stable"
 
-    # Download headless Godot
-    url = f"https://github.com/godotengine/godot/releases/download/{godot_version}-stable/Godot_v{godot_version}-stable_linux_headless.64.zip"
-    download_and_unpack_zip(url, bin_dir)
-    (bin_dir / f"Godot_v{godot_version}-stable_linux_headless.64").rename(godot_cli)
+    headless_url = f"{releases_url}/Godot_v{godot_version}-stable_linux_headless.64.zip"
+    gui_url = f"{releases_url}/Godot_v{godot_version}-stable_x11.64.zip"
+    templates_url = f"{releases_url}/Godot_v{godot_version}-stable_export_templates.tpz"
 
-    # Download GUI Godot
-    url = f"https://github.com/godotengine/godot/releases/download/{godot_version}-stable/Godot_v{godot_version}-stable_x11.64.zip "
-    download_and_unpack_zip(url, bin_dir)
-    (bin_dir / f"Godot_v{godot_version}-stable_x11.64").rename(godot_gui)
+    # Download all archives at once. They are cached, so subsequent calls and other clones reuse them.
+    core.download_files([headless_url, gui_url, templates_url])
 
-    # Download export templates for godot
-    url = f"https://github.com/godotengine/godot/releases/download/{godot_version}-stable/Godot_v{godot_version}-stable_export_templates.tpz"
-    templates_dir = Path(os.getenv("HOME")) / f".local/share/godot/templates/{godot_version}.stable"
-    download_and_unpack_zip(url, templates_dir, directory_inside_zip="templates")
+    # Headless Godot
+    core.download_and_extract_zip(headless_url, bin_dir)
+    (bin_dir / f"Godot_v{godot_version}-stable_linux_headless.64").replace(godot_cli)
+
+    # GUI Godot
+    core.download_and_extract_zip(gui_url, bin_dir)
+    (bin_dir / f"Godot_v{godot_version}-stable_x11.64").replace(godot_gui)
+
+    # Export templates for godot
+    core.download_and_extract_zip(templates_url, templates_dir, directory_inside_zip="templates")
 
 
 @command
-def compile(compile_burrito_fg=True, compile_taco_parser=True, compile_gui=True):
+def compile(compile_burrito_fg=True, compile_taco_parser=True, compile_gui=True, force=False):
     compile_burrito_fg = interpret_arg(compile_burrito_fg, bool, "compile_burrito_fg")
     compile_taco_parser = interpret_arg(compile_taco_parser, bool, "compile_taco_parser")
     compile_gui = interpret_arg(compile_gui, bool, "compile_gui")
+    force = interpret_arg(force, bool, "force")
 
     project_dir = get_project_dir()
     build_dir = get_build_dir(project_dir)
@@ -105,15 +90,50 @@ def compile(compile_burrito_fg=True, compile_taco_parser=True, compile_gui=True)
     godot_bin_dir = get_godot_binary_dir(project_dir)
     godot_cli = get_godot_cli(godot_bin_dir)
 
-    if compile_burrito_fg:
-        run_command("cargo build --release", cwd=project_dir / "burrito-fg")
-    if compile_taco_parser:
-        run_command("cargo build --release", cwd=project_dir / "taco_parser")
-    if compile_gui:
+    def build_crate(crate, jobserver):
+        crate_dir = project_dir / crate
+        run_cached_step(
+            f"cargo build of {crate}",
+            lambda: run_command("cargo build --release", cwd=crate_dir, env=jobserver.get_env(), pass_fds=jobserver.get_fds()),
+            inputs=[crate_dir],
+            outputs=[crate_dir / "target/release"],
+            excluded=[crate_dir / "target"],
+            force=force,
+        )
+
+    def export_gui():
         build_dir.mkdir(exist_ok=True)
-        run_command(f"{godot_cli} --export Linux/X11")
+        run_command(f"{godot_cli} --export Linux/X11", cwd=project_dir)
         run_command(f"chmod +x {executable}")
 
+    # Crates are independent, so build them concurrently. Each has its own target directory, because Godot loads
+    # libraries from there and cargo would serialize builds sharing one directory anyway. A shared jobserver keeps
+    # the total number of compiler processes at the number of CPUs.
+    crates = [crate for crate, enabled in zip(get_cargo_crates(), [compile_burrito_fg, compile_taco_parser]) if enabled]
+    with Jobserver(clients_count=max(1, len(crates))) as jobserver, concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(crates))) as executor:
+        crate_futures = {crate: executor.submit(build_crate, crate, jobserver) for crate in crates}
+
+        if compile_gui:
+            # Export only needs crates providing native libraries of the Godot project. If the libraries cannot
+            # be found, wait for all of them to be safe.
+            native_libraries = get_godot_native_libraries(project_dir)
+            for crate, future in crate_futures.items():
+                if not native_libraries or any(library.startswith(f"{crate}/") for library in native_libraries):
+                    future.result()
+
+            ignored_names = [".git", ".import", build_dir.name, godot_bin_dir.name, *get_cargo_crates()]
+            run_cached_step(
+                "Godot export",
+                export_gui,
+                inputs=[project_dir, *[project_dir / library for library in native_libraries]],
+                outputs=[executable],
+                excluded=[project_dir / name for name in ignored_names],
+                force=force,
+            )
+
+        for future in crate_futures.values():
+            future.result()
+
 
 @command
 def run(perform_compilation=False):
@@ -1,34 +1,102 @@
 import json
-import shutil
+import os
+from pathlib import Path
 
 from dush.utils import *
 
 if is_linux():
     vk_icd_installation_amdgpupro_path = HardcodedPath("/etc/vulkan/icd.d/amd_icd64.json", is_directory=False)
     vk_icd_installation_radv_path = HardcodedPath("/usr/share/vulkan/icd.d/radeon_icd.x86_64.json", is_directory=False)
-    vk_icd_dush_path = HardcodedPath(workspace_path / "vk.json", required=False, is_directory=False)
+    vk_icd_dush_path = HardcodedPath("vk.json", required=False, is_directory=False, base=workspace_path)
+    vk_profiles_dir = HardcodedPath("vk_profiles", required=False, base=workspace_path)
 
-    def install_linux_vulkan_driver(vk_icd, driver_path_override=None):
-        if driver_path_override is not None:
-            with open(vk_icd, "r") as file:
-                data = json.load(file)
-                data["ICD"]["library_path"] = str(driver_path_override)
+    # Drivers installed in the system are registered as profiles with these names
+    system_profiles = {
+        "radv": vk_icd_installation_radv_path,
+        "amdgpupro": vk_icd_installation_amdgpupro_path,
+    }
+
+    def get_profile_path(name):
+        return vk_profiles_dir.get() / f"{name}.json"
 
-            with open(vk_icd_dush_path.get(), "w") as file:
-                json.dump(data, file, indent=4)
+    def get_profile_driver_path(name):
+        with open(get_profile_path(name), "r") as file:
+            return json.load(file)["ICD"]["library_path"]
 
-            installed_driver_path = driver_path_override
+    def register_profile(name, vk_icd, driver_path_override=None):
+        # Profile is an ICD manifest named after the driver build. It's written only if its content changed, so
+        # registering the same driver again is cheap and doesn't disturb Vulkan applications reading it.
+        with open(vk_icd, "r") as file:
+            data = json.load(file)
+        if driver_path_override is not None:
+            data["ICD"]["library_path"] = str(driver_path_override)
         else:
-            shutil.copy2(vk_icd, vk_icd_dush_path.get())
+            # Vulkan loader resolves relative paths against the manifest's directory, which is different for the
+            # profile. Bare file names are searched in system library paths, so they are left as they are.
+            library_path = Path(data["ICD"]["library_path"])
+            if not library_path.is_absolute() and len(library_path.parts) > 1:
+                data["ICD"]["library_path"] = os.path.normpath(Path(vk_icd).absolute().parent / library_path)
+        content = json.dumps(data, indent=4)
+
+        profile_path = get_profile_path(name)
+        profile_path.parent.mkdir(exist_ok=True)
+        try:
+            if profile_path.read_text() == content:
+                return profile_path
+        except OSError:
+            pass
+
+        tmp_path = profile_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(content)
+        os.replace(tmp_path, profile_path)
+        return profile_path
+
+    def register_system_profiles():
+        for name, vk_icd in system_profiles.items():
+            if get_profile_path(name).is_file():
+                continue
+            try:
+                register_profile(name, vk_icd.get())
+            except FileNotFoundError:
+                pass  # Driver is not installed
+
+    def get_profiles():
+        register_system_profiles()
+        return sorted(path.stem for path in vk_profiles_dir.get().glob("*.json"))
+
+    def get_active_profile():
+        try:
+            target = Path(os.readlink(vk_icd_dush_path.get()))
+        except OSError:
+            return None  # Missing or a regular file written by older versions of Dush
+        return target.stem if target.parent == vk_profiles_dir.get() else None
+
+    def activate_profile(name):
+        # The workspace vk.json, which VK_ICD_FILENAMES points to, is a symlink to the profile. It's replaced
+        # atomically, so Vulkan applications starting at the same time see either the old or the new driver.
+        profile_path = get_profile_path(name)
+        if not profile_path.is_file():
+            register_system_profiles()
+            if not profile_path.is_file():
+                raise KeyError(f"Unknown Vulkan driver profile: {name}. Available profiles: {', '.join(get_profiles())}")
 
-            with open(vk_icd, "r") as file:
-                data = json.load(file)
-                installed_driver_path = data["ICD"]["library_path"]
+        link_path = vk_icd_dush_path.get()
+        tmp_link_path = link_path.with_name(f".{link_path.name}.{os.getpid()}.tmp")
+        tmp_link_path.unlink(missing_ok=True)
+        tmp_link_path.symlink_to(profile_path)
+        os.replace(tmp_link_path, link_path)
+        print(f"Installed Vulkan driver: {get_profile_driver_path(name)} (profile {name} via {link_path})")
 
-        print(f"Installed Vulkan driver: {installed_driver_path} (via {vk_icd_dush_path.get()})")
+    def get_profile_env(name):
+        # VK_DRIVER_FILES is read by Vulkan loader 1.3.207 and newer, VK_ICD_FILENAMES by older ones
+        profile_path = str(get_profile_path(name))
+        return {
+            "VK_DRIVER_FILES": profile_path,
+            "VK_ICD_FILENAMES": profile_path,
+        }
 
     def install_system_amdgpupro_driver():
-        install_linux_vulkan_driver(vk_icd_installation_amdgpupro_path.get())
+        activate_profile("amdgpupro")
 
     def install_system_radv_driver():
-        install_linux_vulkan_driver(vk_icd_installation_radv_path.get())
+        activate_profile("radv")
@@ -1,12 +1,22 @@
+import random
+import re
+import statistics
+import time
 from pathlib import Path
 
 import dush.core as core
 from dush.framework import *
 from dush.projects.mesa.install_vulkan import (
-    install_linux_vulkan_driver,
+    activate_profile,
+    get_active_profile,
+    get_profile_driver_path,
+    get_profile_env,
+    get_profiles,
     install_system_radv_driver,
+    register_profile,
 )
 from dush.utils import *
+from dush.utils import cached_step
 
 """
 Useful resources about building Mesa:
@@ -54,6 +64,72 @@ def get_installation_dir(build_dir):
     return build_dir / "install"
 
 
+def get_profile_name(project_dir, config):
+    # E.g. mesa_debug or mesa2_release for a second clone
+    return f"{project_dir.name}_{str(config.build_type).lower()}"
+
+
+def register_build_profiles():
+    # Driver profiles of all installed builds in all clones. Profiles of builds installed after this change are
+    # registered by the install command, this picks up the older ones.
+    for project_dir in get_project_dirs():
+        for build_type in BuildConfig.allowed_build_types:
+            config = BuildConfig(build_type=build_type)
+            vk_icd_path = get_vk_icd_json_path(get_installation_dir(get_build_dir(project_dir, config)))
+            if vk_icd_path.is_file():
+                register_profile(get_profile_name(project_dir, config), vk_icd_path)
+
+
+def run_benchmark_once(command, profile, fps_regex):
+    # Returns FPS parsed from the output if the regex is specified, otherwise duration of the command
+    begin = time.perf_counter()
+    result = run_command(command, shell=True, stdout=Stdout.return_back(), stderr=Stdout.return_back(), env=get_profile_env(profile))
+    duration = time.perf_counter() - begin
+    if fps_regex is None:
+        return duration
+
+    matches = fps_regex.findall(f"{result.stdout}\n{result.stderr or ''}")
+    if not matches:
+        raise ValueError(f"Could not find FPS in output of {command} for profile {profile}")
+    match = matches[-1]
+    return float(match[0] if isinstance(match, tuple) else match)
+
+
+def print_benchmark_report(samples, unit, lower_is_better, confidence=0.95):
+    from dush.utils.benchmark import confidence_interval, welch_t_test
+
+    name_width = max(len(profile) for profile in samples)
+    print(f"Results ({len(next(iter(samples.values())))} runs per profile, {confidence:.0%} confidence intervals):")
+    for profile, profile_samples in samples.items():
+        mean, half_width = confidence_interval(profile_samples, confidence)
+        stdev = statistics.stdev(profile_samples) if len(profile_samples) > 1 else 0.0
+        print(f"    {profile:<{name_width}}  mean={mean:.6g}{unit} +- {half_width:.3g}{unit}  stdev={stdev:.3g}{unit}")
+
+    # Every profile is compared with the first one
+    baseline_profile, baseline_samples = next(iter(samples.items()))
+    baseline_mean = statistics.mean(baseline_samples)
+    for profile, profile_samples in list(samples.items())[1:]:
+        difference = (statistics.mean(profile_samples) - baseline_mean) / baseline_mean if baseline_mean != 0 else 0.0
+        is_better = (difference < 0) == lower_is_better
+        if len(profile_samples) < 2:
+            print(f"    {profile} vs {baseline_profile}: {difference:+.2%}, not enough runs to test significance")
+            continue
+        _, _, p_value = welch_t_test(profile_samples, baseline_samples)
+        verdict = ("better" if is_better else "worse") if p_value < 1 - confidence else "no significant difference"
+        print(f"    {profile} vs {baseline_profile}: {difference:+.2%} (p={p_value:.3g}), {verdict}")
+
+
+# Ninja checks all its targets and reinstalls every file, even if nothing changed. Skip it when sources, build
+# configuration and installed files are the same as after the last successful installation.
+@cached_step(
+    inputs=["{project_dir}", "{build_dir}/build.ninja"],
+    outputs=["{driver_path}", "{vk_icd_path}"],
+    excluded=["{project_dir}/.git", "{project_dir}/build.*"],
+)
+def compile_and_install(project_dir, build_dir, driver_path, vk_icd_path):
+    core.compile_with_ninja("install", build_dir)
+
+
 # ----------------------------------------------------------- Commands
 @command
 def meson(config=""):
@@ -98,12 +174,15 @@ def install(config="", perform_compilation=True):
     build_dir = get_build_dir(project_dir, config)
     installation_dir = get_installation_dir(build_dir)
 
-    if perform_compilation:
-        core.compile_with_ninja("install", build_dir)
-
     # Hardcoded for radv. Add configuration if needed.
     vk_icd_path = get_vk_icd_json_path(installation_dir)
-    install_linux_vulkan_driver(vk_icd_path)
+
+    if perform_compilation:
+        compile_and_install(project_dir, build_dir, get_driver_path(installation_dir), vk_icd_path)
+
+    profile_name = get_profile_name(project_dir, config)
+    register_profile(profile_name, vk_icd_path)
+    activate_profile(profile_name)
 
 
 @command
@@ -112,6 +191,79 @@ def uninstall():
     install_system_radv_driver()
 
 
+@command
+def profiles():
+    register_build_profiles()
+    active_profile = get_active_profile()
+    for name in get_profiles():
+        marker = "*" if name == active_profile else " "
+        print(f"{marker} {name:<20} {get_profile_driver_path(name)}")
+
+
+@command
+def use_profile(name):
+    activate_profile(name)
+
+
+# Prints environment selecting the driver for the current shell only, e.g. eval "$(mesa profile_env radv -- -q)".
+# Multiple builds can be used side by side this way. Empty name means the active profile.
+@command
+def profile_env(name=""):
+    register_build_profiles()
+    if not name:
+        name = get_active_profile()
+        if name is None:
+            raise KeyError("No Vulkan driver profile is active")
+    if name not in get_profiles():
+        raise KeyError(f"Unknown Vulkan driver profile: {name}. Available profiles: {', '.join(get_profiles())}")
+
+    for env_name, value in get_profile_env(name).items():
+        print(f'export {env_name}="{value}"')
+
+
+# Runs a benchmark command against multiple driver profiles and tells whether their performance differs, e.g.
+#   mesa bench mesa_release,mesa2_release "vkmark --size 800x600" --fps_regex="Score: (\d+)"
+# Runs of all profiles are interleaved in random order, so drift of the machine (thermals, background jobs) affects
+# all of them equally. Without fps_regex the duration of the command is measured.
+@command
+def bench(profiles, benchmark_command, repetitions=10, warmup=1, fps_regex="", output=""):
+    repetitions = interpret_arg(repetitions, int, "repetitions")
+    warmup = interpret_arg(warmup, int, "warmup")
+
+    from dush.utils.benchmark import BenchmarkResults
+
+    register_build_profiles()
+    profiles = [profile.strip() for profile in profiles.split(",") if profile.strip()]
+    if len(set(profiles)) != len(profiles) or len(profiles) < 2:
+        raise ValueError("Specify at least two distinct comma-separated driver profiles to compare")
+    for profile in profiles:
+        if profile not in get_profiles():
+            raise KeyError(f"Unknown Vulkan driver profile: {profile}. Available profiles: {', '.join(get_profiles())}")
+    fps_regex = re.compile(fps_regex) if fps_regex else None
+
+    for _ in range(warmup):
+        for profile in profiles:
+            run_benchmark_once(benchmark_command, profile, fps_regex)
+
+    samples = {profile: [] for profile in profiles}
+    for repetition in range(repetitions):
+        order = random.sample(profiles, len(profiles))
+        for profile in order:
+            samples[profile].append(run_benchmark_once(benchmark_command, profile, fps_regex))
+        print(f"Run {repetition + 1}/{repetitions}: " + "  ".join(f"{profile}={samples[profile][-1]:.6g}" for profile in profiles))
+
+    unit, lower_is_better = ("fps", False) if fps_regex is not None else ("s", True)
+    print_benchmark_report(samples, unit, lower_is_better)
+
+    if output:
+        results = BenchmarkResults("mesa", {"command": benchmark_command, "repetitions": repetitions})
+        for profile in profiles:
+            results.add_samples(profile, samples[profile], unit, lower_is_better)
+            results.metadata[f"driver.{profile}"] = get_profile_driver_path(profile)
+        results.save(output)
+        print(f"Saved results to {output}")
+
+
 # ----------------------------------------------------------- Main procedure
 if is_main:
     BuildConfig.configure(
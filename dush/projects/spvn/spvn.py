@@ -1,9 +1,15 @@
+import concurrent.futures
 import enum
+import os
 import random
+import time
+from datetime import datetime
 from pathlib import Path
 
+import dush.core as core
 from dush.framework import *
 from dush.utils import *
+from dush.utils import FileLock, hash_directory_combined
 
 # ----------------------------------------------------------- Helpers for commands
 is_main = __name__ == "__main__"
@@ -25,31 +31,57 @@ class TaskType(enum.Enum):
             raise ValueError(f"Invalid {name}: {arg}. Valid types are: {TaskType.Persistent.value}, {TaskType.FailQuickly.value}")
 
 
-# ----------------------------------------------------------- Commands
-@command
-def compile():
-    get_project_dir()
-    run_command("go build .")
+class LoadTestError(Exception):
+    pass
 
 
-@command
-def run_server(perform_compilation=True):
-    perform_compilation = interpret_arg(perform_compilation, bool, "perform_compilation")
+def get_binary_path(project_dir):
+    return project_dir / ("spieven.exe" if is_windows() else "spieven")
 
-    get_project_dir()
 
-    if perform_compilation:
-        compile()
+def get_binary_hash_path(project_dir):
+    return project_dir / "spieven.dush_hash"
 
-    run_command("go run . serve")
 
+def compute_sources_hash(project_dir):
+    # Only files affecting the binary are hashed. Tests and hidden directories (e.g. .git) are skipped.
+    return hash_directory_combined(project_dir, ["**/*.go", "**/go.mod", "**/go.sum"], ["**/*_test.go", "**/.*"])
 
-@command
-def sched(task_type=TaskType.FailQuickly):
-    task_type = interpret_arg(task_type, TaskType, "task_type")
 
-    get_project_dir()
+def build_binary(project_dir, force=False):
+    # Builds the binary only if Go sources changed since the last build, so commands can execute it directly
+    # instead of going through "go run", which links the binary every time. Concurrent commands wait for each other.
+    binary_path = get_binary_path(project_dir)
+    hash_path = get_binary_hash_path(project_dir)
+    lock_path = project_dir / "spieven.dush_lock"
+    for path in (binary_path, hash_path, lock_path):
+        core.add_transient_gitignore(path)
 
+    with open(lock_path, "a") as lock_file, FileLock(lock_file):
+        sources_hash = compute_sources_hash(project_dir)
+        if not force and binary_path.is_file() and hash_path.is_file() and hash_path.read_text() == sources_hash:
+            return binary_path
+
+        # Build to a temporary file, so an interrupted build doesn't leave a broken binary with a valid hash
+        tmp_binary_path = binary_path.with_name(f".{binary_path.name}.{os.getpid()}.tmp")
+        try:
+            run_command(f"go build -o {tmp_binary_path} .", cwd=project_dir)
+            os.replace(tmp_binary_path, binary_path)
+        finally:
+            tmp_binary_path.unlink(missing_ok=True)
+        hash_path.write_text(sources_hash)
+    return binary_path
+
+
+def get_binary(project_dir, perform_compilation=True):
+    # Without compilation a stale binary is accepted, but it still has to be built if there is none.
+    binary_path = get_binary_path(project_dir)
+    if perform_compilation or not binary_path.is_file():
+        build_binary(project_dir)
+    return binary_path
+
+
+def get_schedule_args(task_type, friendly_name):
     args = ""
     args += " --display h"
     match task_type:
@@ -59,22 +91,158 @@ def sched(task_type=TaskType.FailQuickly):
             args += " --max-subsequent-failures 0"
         case _:
             raise ValueError(f"Invalid task type: {task_type}")
-    args += f" --friendly-name {random.randint(0, 1000):04d}"
+    args += f" --friendly-name {friendly_name}"
     args += " -- bash test_scripts/test_script.sh"
+    return args
+
+
+def wait_for_server(binary_path, server, project_dir, timeout_seconds=10):
+    # Server is ready when clients can talk to it
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        if not server.is_running():
+            raise LoadTestError("Server exited prematurely. Is another instance already running?")
+        if run_command(f"{binary_path} list", stdout=Stdout.ignore(), stderr=Stdout.ignore(), ignore_error=True, cwd=project_dir).return_value == 0:
+            return
+        if time.monotonic() > deadline:
+            raise LoadTestError(f"Server did not respond within {timeout_seconds}s")
+        time.sleep(0.1)
+
+
+def submit_tasks(binary_path, project_dir, tasks_count, rate, concurrency, task_type, name_prefix):
+    # Submissions are scheduled at fixed times (open loop), so a slow scheduler does not lower the offered load.
+    # Rate 0 means submitting as fast as the concurrency allows. Returns latencies of submissions and total time.
+    latencies = [None] * tasks_count
+    begin = time.perf_counter()
+
+    def submit(index):
+        if rate > 0:
+            delay = begin + index / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        args = get_schedule_args(task_type, f"{name_prefix}_{index:05d}")
+        submit_begin = time.perf_counter()
+        run_command(f"{binary_path} schedule{args}", stdout=Stdout.ignore(), stderr=Stdout.return_back(), cwd=project_dir)
+        latencies[index] = time.perf_counter() - submit_begin
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(submit, index) for index in range(tasks_count)]
+        for future in futures:
+            future.result()
+    return latencies, time.perf_counter() - begin
+
+
+def wait_for_drain(binary_path, project_dir, name_prefix, timeout_seconds):
+    # List shows only active tasks, so the queue is drained when none of ours are listed anymore.
+    # Returns None if it did not happen in time.
+    begin = time.perf_counter()
+    while True:
+        output = run_command(f"{binary_path} list", stdout=Stdout.return_back(), cwd=project_dir).stdout
+        if name_prefix not in output:
+            return time.perf_counter() - begin
+        if time.perf_counter() - begin > timeout_seconds:
+            return None
+        time.sleep(0.1)
+
+
+# ----------------------------------------------------------- Commands
+@command
+def compile(force=False):
+    force = interpret_arg(force, bool, "force")
+
+    project_dir = get_project_dir()
+    build_binary(project_dir, force)
+
+
+@command
+def run_server(perform_compilation=True):
+    perform_compilation = interpret_arg(perform_compilation, bool, "perform_compilation")
+
+    project_dir = get_project_dir()
+    binary_path = get_binary(project_dir, perform_compilation)
+    run_command(f"{binary_path} serve", cwd=project_dir)
 
-    run_command(f"go run . schedule{args}")
+
+@command
+def sched(task_type=TaskType.FailQuickly):
+    task_type = interpret_arg(task_type, TaskType, "task_type")
+
+    project_dir = get_project_dir()
+    binary_path = get_binary(project_dir)
+
+    args = get_schedule_args(task_type, f"{random.randint(0, 1000):04d}")
+    run_command(f"{binary_path} schedule{args}", cwd=project_dir)
 
 
 @command
 def list_tasks(perform_compilation=True, *args):
     perform_compilation = interpret_arg(perform_compilation, bool, "perform_compilation")
 
-    get_project_dir()
+    project_dir = get_project_dir()
+    binary_path = get_binary(project_dir, perform_compilation)
+    run_command(f"{binary_path} list {' '.join(args)}", cwd=project_dir)
 
-    if perform_compilation:
-        compile()
 
-    run_command(f"go run . list {' '.join(args)}")
+# Starts a server and submits many tasks to measure performance of the scheduler. The binary is built once and
+# executed directly, so measurements do not include compilation. Rate is in tasks per second, 0 means no limit.
+@command
+def load_test(tasks=100, rate=0, concurrency=4, task_type=TaskType.FailQuickly, drain_timeout=60, output="", baseline="", threshold=1.25):
+    tasks = interpret_arg(tasks, int, "tasks")
+    rate = interpret_arg(rate, int, "rate")
+    concurrency = interpret_arg(concurrency, int, "concurrency")
+    task_type = interpret_arg(task_type, TaskType, "task_type")
+    drain_timeout = interpret_arg(drain_timeout, int, "drain_timeout")
+    threshold = interpret_arg(threshold, float, "threshold")
+
+    from dush.utils.benchmark import BenchmarkResults
+
+    project_dir = get_project_dir()
+    output_dir = project_dir / "load_test_results"
+    output_dir.mkdir(exist_ok=True)
+    core.add_transient_gitignore(output_dir)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = Path(output) if output else output_dir / f"sched_{timestamp}.json"
+
+    binary_path = build_binary(project_dir)
+    name_prefix = f"load_test_{timestamp}"
+    with open(output_dir / f"server_{timestamp}.log", "w") as server_log:
+        server = start_command(f"{binary_path} serve", stdout=Stdout.print_to_file(server_log), stderr=Stdout.print_to_file(server_log), cwd=project_dir)
+        try:
+            wait_for_server(binary_path, server, project_dir)
+            print(f"Submitting {tasks} tasks with concurrency {concurrency} at {f'{rate} tasks/s' if rate > 0 else 'unlimited rate'}")
+            latencies, submit_time = submit_tasks(binary_path, project_dir, tasks, rate, concurrency, task_type, name_prefix)
+
+            # Persistent tasks never finish, so there is nothing to wait for
+            drain_time = None
+            if task_type == TaskType.FailQuickly:
+                drain_time = wait_for_drain(binary_path, project_dir, name_prefix, drain_timeout)
+                if drain_time is None:
+                    print(f"WARNING: Tasks did not finish within {drain_timeout}s")
+        finally:
+            server.process.terminate()
+            server.wait(ignore_error=True)
+
+    results = BenchmarkResults("spvn", {"tasks": tasks, "rate": rate, "concurrency": concurrency, "task_type": task_type.value})
+    results.add_samples("spvn.sched.submit_latency", latencies)
+    results.add_samples("spvn.sched.throughput", [tasks / submit_time], unit="tasks/s", lower_is_better=False)
+    if drain_time is not None:
+        results.add_samples("spvn.sched.drain_time", [drain_time])
+    results.save(output)
+
+    latency = results.results["spvn.sched.submit_latency"]
+    print(f"Submit latency: p50={latency['median'] * 1000:.1f}ms  p90={latency['p90'] * 1000:.1f}ms  p99={latency['p99'] * 1000:.1f}ms  max={latency['max'] * 1000:.1f}ms")
+    print(f"Throughput: {tasks / submit_time:.1f} tasks/s")
+    if drain_time is not None:
+        print(f"Queue drained {drain_time:.2f}s after the last submission")
+    print(f"Saved results to {output}")
+
+    if baseline:
+        regressions = results.compare(BenchmarkResults.load(baseline), threshold)
+        for regression in regressions:
+            print(f"    {regression}")
+        if regressions:
+            raise LoadTestError(f"{len(regressions)} measurements regressed compared to {baseline} (threshold {threshold}x)")
+        print(f"No regressions compared to {baseline} (threshold {threshold}x)")
 
 
 # ----------------------------------------------------------- Main procedure
@@ -4,6 +4,7 @@ from pathlib import Path
 import dush.core as core
 from dush.framework import *
 from dush.utils import *
+from dush.utils import cached_step
 
 # ----------------------------------------------------------- Helpers for commands
 is_main = __name__ == "__main__"
@@ -31,6 +32,17 @@ def get_unit_tests_binary_path(build_dir):
     return result
 
 
+# The .pro file is missing dependency of unit tests on the YUViewLib, so they are not relinked when only the library
+# changed. Remove the executable to force relinking, but only if the library is different than last time.
+@cached_step(
+    inputs=["{build_dir}/YUViewLib/**/libYUViewLib.a", "{build_dir}/YUViewLib/**/YUViewLib.lib"],
+    outputs=["{unit_test_path}"],
+)
+def relink_unit_tests(build_dir, unit_test_path, compile_function):
+    unit_test_path.unlink(missing_ok=True)
+    compile_function()
+
+
 # ----------------------------------------------------------- Commands
 @command
 def qmake(config=""):
@@ -53,18 +65,18 @@ def compile(config=""):
     project_dir = get_project_dir()
     build_dir = get_build_dir(project_dir, config)
 
-    # Remove unit tests executable to ensure it's recompiled. The .pro file is missing dependency on the YUViewLib.
-    unit_test_path = get_unit_tests_binary_path(build_dir)
-    unit_test_path.unlink(missing_ok=True)
-
-    if is_windows():
-        core.compile_with_nmake(
-            directory=build_dir,
-            vc_varsall_path=vc_varsall_path,
-        )
-        core.qmake_deploy(qt_path, exe_path)
-    else:
-        core.compile_with_make(directory=build_dir)
+    def compile_function():
+        if is_windows():
+            core.compile_with_nmake(
+                directory=build_dir,
+                vc_varsall_path=vc_varsall_path,
+            )
+            core.qmake_deploy(qt_path, exe_path)
+        else:
+            core.compile_with_make(directory=build_dir)
+
+    compile_function()
+    relink_unit_tests(build_dir, get_unit_tests_binary_path(build_dir), compile_function)
     print(f"Compiled application: {get_app_binary_path(build_dir)}")
 
 
@@ -84,9 +96,10 @@ def run(config="", perform_compilation=False):
 
 
 @command
-def run_unit_tests(config="", perform_compilation=False, test_pattern=""):
+def run_unit_tests(config="", perform_compilation=False, test_pattern="", shards=1):
     config = interpret_arg(config, BuildConfig, "config")
     perform_compilation = interpret_arg(perform_compilation, bool, "perform_compilation")
+    shards = interpret_arg(shards, int, "shards")
 
     project_dir = get_project_dir()
     build_dir = get_build_dir(project_dir, config)
@@ -94,6 +107,12 @@ def run_unit_tests(config="", perform_compilation=False, test_pattern=""):
     if perform_compilation:
         compile(config)
 
+    # Run tests in parallel processes if requested. Value 0 means one shard per CPU.
+    if shards != 1:
+        output_dir = build_dir / "unit_test_results"
+        core.run_gtests_sharded(get_unit_tests_binary_path(build_dir), shards or None, test_pattern, output_dir)
+        return
+
     command = str(get_unit_tests_binary_path(build_dir))
     if test_pattern:
         command = f"{command} --gtest_filter={test_pattern}"
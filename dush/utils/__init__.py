@@ -1,28 +1,78 @@
-from dush.utils.arg import OptionEnable, interpret_arg
-from dush.utils.build_config import Bitness, BuildConfig, BuildType, Compiler
-from dush.utils.os_function import is_linux, is_windows, linux_only, windows_only
-from dush.utils.paths import (
-    EnvPath,
-    HardcodedPath,
-    LocalOrRemotePath,
-    RaiiChdir,
-    dush_path,
-    workspace_path,
-)
-from dush.utils.project_dir import (
-    DushProject,
-    get_project_dir,
-    get_project_dirs,
-    project_repositories,
-    workspace_path,
-)
-from dush.utils.run_command import (
-    CommandError,
-    CommandTimeout,
-    Stdin,
-    Stdout,
-    open_url,
-    run_command,
-    run_function,
-    wrap_command_with_vcvarsall,
+from dush.utils.lazy_import import make_package_lazy
+
+# Submodules are imported on first use of their attributes, so scripts only pay for what they actually use. Project
+# scripts star-import this package, which imports every module exporting names to __all__. Only cheap modules needed
+# by most projects are star-exported, the rest has to be imported by name.
+__all__, __getattr__, __dir__ = make_package_lazy(
+    __name__,
+    {
+        "dush.utils.arg": [
+            "OptionEnable",
+            "interpret_arg",
+        ],
+        "dush.utils.build_config": [
+            "Bitness",
+            "BuildConfig",
+            "BuildType",
+            "Compiler",
+        ],
+        "dush.utils.file_lock": [
+            "FileLock",
+        ],
+        "dush.utils.hashing": [
+            "combine_hashes",
+            "expand_patterns",
+            "hash_directory",
+            "hash_directory_combined",
+            "hash_file",
+            "hash_files",
+        ],
+        "dush.utils.jobserver": [
+            "Jobserver",
+        ],
+        "dush.utils.os_function": [
+            "is_linux",
+            "is_windows",
+            "linux_only",
+            "windows_only",
+        ],
+        "dush.utils.paths": [
+            "EnvPath",
+            "HardcodedPath",
+            "LocalOrRemotePath",
+            "RaiiChdir",
+            "dush_path",
+            "get_cache_dir",
+            "workspace_path",
+        ],
+        "dush.utils.project_dir": [
+            "DushProject",
+            "get_project_dir",
+            "get_project_dirs",
+            "project_repositories",
+        ],
+        "dush.utils.run_command": [
+            "CommandError",
+            "CommandTimeout",
+            "Stdin",
+            "Stdout",
+            "open_url",
+            "run_command",
+            "run_function",
+            "start_command",
+            "wrap_command_with_vcvarsall",
+        ],
+        "dush.utils.step_cache": [
+            "cached_step",
+            "run_cached_step",
+        ],
+    },
+    [
+        "dush.utils.arg",
+        "dush.utils.build_config",
+        "dush.utils.os_function",
+        "dush.utils.paths",
+        "dush.utils.project_dir",
+        "dush.utils.run_command",
+    ],
 )
@@ -27,6 +27,11 @@ def interpret_arg(arg, arg_type, name, **kwargs):
             return int(arg)
         except ValueError:
             raise ValueError(f"Argument {name} must be an integer")
+    elif arg_type == float:
+        try:
+            return float(arg)
+        except ValueError:
+            raise ValueError(f"Argument {name} must be a number")
     elif arg_type == Path:
         if arg is None or arg == "":
             if kwargs.get("allow_empty", True):
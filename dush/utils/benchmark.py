@@ -0,0 +1,211 @@
+import json
+import math
+import platform
+import statistics
+import time
+from datetime import datetime
+
+
+def _beta_continued_fraction(a, b, x, max_iterations=300, epsilon=1e-14):
+    # Continued fraction for the incomplete beta function evaluated with the modified Lentz's method
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, max_iterations + 1):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)), -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            delta = c * d
+            result *= delta
+        if abs(delta - 1.0) < epsilon:
+            break
+    return result
+
+
+def regularized_incomplete_beta(a, b, x):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # The continued fraction converges quickly only on one side of the mean, use symmetry on the other one
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def student_t_two_sided_p_value(t, degrees_of_freedom):
+    # Probability of a Student's t statistic at least as extreme as t
+    if math.isinf(t):
+        return 0.0
+    return regularized_incomplete_beta(degrees_of_freedom / 2.0, 0.5, degrees_of_freedom / (degrees_of_freedom + t * t))
+
+
+def student_t_critical_value(confidence, degrees_of_freedom):
+    # Inverse of the two-sided p-value found by bisection, e.g. 2.228 for 95% confidence and 10 degrees of freedom
+    low, high = 0.0, 1.0
+    while student_t_two_sided_p_value(high, degrees_of_freedom) > 1.0 - confidence:
+        high *= 2.0
+    for _ in range(100):
+        middle = (low + high) / 2.0
+        if student_t_two_sided_p_value(middle, degrees_of_freedom) > 1.0 - confidence:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2.0
+
+
+def confidence_interval(samples, confidence=0.95):
+    # Returns mean and half-width of its confidence interval, assuming samples are normally distributed
+    mean = statistics.mean(samples)
+    if len(samples) < 2:
+        return mean, float("inf")
+    standard_error = statistics.stdev(samples) / math.sqrt(len(samples))
+    return mean, student_t_critical_value(confidence, len(samples) - 1) * standard_error
+
+
+def welch_t_test(samples_a, samples_b):
+    """
+    Tests whether means of two groups of samples differ. Unlike Student's t-test, it does not assume both groups
+    have the same variance, which is rarely true for different driver builds. Returns the t statistic, degrees of
+    freedom and the two-sided p-value. Small p-value (e.g. below 0.05) means the difference is unlikely to be noise.
+    """
+
+    if len(samples_a) < 2 or len(samples_b) < 2:
+        raise ValueError("Welch's t-test needs at least 2 samples in each group")
+
+    mean_difference = statistics.mean(samples_a) - statistics.mean(samples_b)
+    variance_a = statistics.variance(samples_a) / len(samples_a)
+    variance_b = statistics.variance(samples_b) / len(samples_b)
+    if variance_a + variance_b == 0:
+        # Constant samples, e.g. very coarse timers. Any difference is significant.
+        return (0.0, math.inf, 1.0) if mean_difference == 0 else (math.copysign(math.inf, mean_difference), math.inf, 0.0)
+
+    t = mean_difference / math.sqrt(variance_a + variance_b)
+    degrees_of_freedom = (variance_a + variance_b) ** 2 / (variance_a**2 / (len(samples_a) - 1) + variance_b**2 / (len(samples_b) - 1))
+    return t, degrees_of_freedom, student_t_two_sided_p_value(t, degrees_of_freedom)
+
+
+class BenchmarkRegression:
+    def __init__(self, name, baseline_value, current_value, ratio):
+        self.name = name
+        self.baseline_value = baseline_value
+        self.current_value = current_value
+        self.ratio = ratio
+
+    def __str__(self):
+        return f"{self.name}: {self.baseline_value:.6g} -> {self.current_value:.6g} ({self.ratio:.2f}x worse)"
+
+
+class BenchmarkResults:
+    """
+    Collection of benchmark measurements. Each measurement is a list of samples with a unit. Results are saved as
+    JSON, so they can be compared between commits. Comparison uses medians, which are less sensitive to outliers
+    than means.
+    """
+
+    def __init__(self, suite_name, metadata={}):
+        self.suite_name = suite_name
+        self.metadata = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        }
+        self.metadata.update(metadata)
+        self.results = {}
+
+    def add_samples(self, name, samples, unit="s", lower_is_better=True):
+        samples = list(samples)
+        if not samples:
+            raise ValueError(f"Benchmark {name} has no samples")
+
+        self.results[name] = {
+            "unit": unit,
+            "lower_is_better": lower_is_better,
+            "samples": samples,
+            "min": min(samples),
+            "max": max(samples),
+            "mean": statistics.mean(samples),
+            "median": statistics.median(samples),
+            "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+            "p90": self._percentile(samples, 90),
+            "p99": self._percentile(samples, 99),
+        }
+
+    @staticmethod
+    def _percentile(samples, percent):
+        if len(samples) == 1:
+            return samples[0]
+        return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+    def measure(self, name, function, repetitions, warmup=1, setup=None):
+        # Setup function is called before every run and is not measured.
+        for _ in range(warmup):
+            if setup is not None:
+                setup()
+            function()
+
+        samples = []
+        for _ in range(repetitions):
+            if setup is not None:
+                setup()
+            begin = time.perf_counter()
+            function()
+            samples.append(time.perf_counter() - begin)
+        self.add_samples(name, samples)
+
+    def merge(self, other):
+        self.results.update(other.results)
+
+    def save(self, path):
+        data = {
+            "suite": self.suite_name,
+            "metadata": self.metadata,
+            "results": self.results,
+        }
+        with open(path, "w") as file:
+            json.dump(data, file, indent=4)
+
+    @staticmethod
+    def load(path):
+        with open(path, "r") as file:
+            data = json.load(file)
+
+        result = BenchmarkResults(data["suite"])
+        result.metadata = data["metadata"]
+        result.results = data["results"]
+        return result
+
+    def compare(self, baseline, threshold):
+        # Returns benchmarks which got worse than baseline by more than the threshold ratio, e.g. 1.2 means a
+        # benchmark is allowed to be 20% slower. Benchmarks missing on either side are not compared.
+        regressions = []
+        for name, result in self.results.items():
+            baseline_result = baseline.results.get(name)
+            if baseline_result is None:
+                continue
+
+            baseline_value = baseline_result["median"]
+            current_value = result["median"]
+            if result["lower_is_better"]:
+                ratio = current_value / baseline_value if baseline_value > 0 else 1.0
+            else:
+                ratio = baseline_value / current_value if current_value > 0 else float("inf")
+
+            if ratio > threshold:
+                regressions.append(BenchmarkRegression(name, baseline_value, current_value, ratio))
+        return regressions
+
+    def print_summary(self):
+        name_width = max((len(name) for name in self.results), default=0)
+        for name, result in self.results.items():
+            unit = result["unit"]
+            print(
+                f"    {name:<{name_width}}  median={result['median']:.6g}{unit}  min={result['min']:.6g}{unit}  "
+                f"stdev={result['stdev']:.3g}{unit}  samples={len(result['samples'])}"
+            )
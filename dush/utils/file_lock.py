@@ -0,0 +1,87 @@
+from dush.utils.os_function import linux_only, windows_only
+
+
+class FileLock:
+    """
+    Advisory lock held on an already opened file for the duration of a with block. It does not prevent other
+    programs from accessing the file. It only serializes Dush processes that cooperate by taking the same lock,
+    for example two configures running concurrently in the same repository.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    def __enter__(self):
+        _lock_file(self._file)
+        return self
+
+    def __exit__(self, *args):
+        _unlock_file(self._file)
+
+    def try_acquire(self):
+        # Non-blocking variant for callers which can do something else when the lock is taken, e.g. pick another
+        # resource from a pool. Returns True if the lock was acquired. It has to be released with release().
+        return _try_lock_file(self._file)
+
+    def release(self):
+        _unlock_file(self._file)
+
+
+@linux_only
+def _lock_file(file):
+    import fcntl
+
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+
+@linux_only
+def _try_lock_file(file):
+    import fcntl
+
+    try:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+@linux_only
+def _unlock_file(file):
+    import fcntl
+
+    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+@windows_only
+def _lock_file(file):
+    import msvcrt
+
+    # Windows locks byte ranges starting at current position. Always lock the first byte, so all processes compete
+    # for the same range. LK_LOCK gives up after 10 attempts, so keep retrying until we succeed.
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass
+
+
+@windows_only
+def _try_lock_file(file):
+    import msvcrt
+
+    file.seek(0)
+    try:
+        msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+@windows_only
+def _unlock_file(file):
+    import msvcrt
+
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,261 @@
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import select
+import struct
+import time
+
+from dush.utils.os_function import is_linux
+
+# Constants from sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+INOTIFY_EVENT_HEADER = struct.Struct("iIII")
+INOTIFY_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+
+class IgnoreRules:
+    """
+    Simplified gitignore rules. Patterns without a slash match names at any depth, e.g. "build*". Patterns with
+    a slash match paths relative to the root directory, e.g. "src/generated". Trailing slash limits the pattern
+    to directories. Negations are not supported.
+    """
+
+    def __init__(self, patterns=[]):
+        self._name_patterns = []
+        self._path_patterns = []
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        pattern = pattern.strip()
+        if not pattern or pattern.startswith("#") or pattern.startswith("!"):
+            return
+
+        only_directories = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if "/" in pattern:
+            self._path_patterns.append((pattern.lstrip("/"), only_directories))
+        else:
+            self._name_patterns.append((pattern, only_directories))
+
+    def add_file(self, path):
+        try:
+            with open(path, "r") as file:
+                for line in file:
+                    self.add(line)
+        except FileNotFoundError:
+            pass
+
+    def is_ignored(self, relative_path, is_directory):
+        # Relative path has to use forward slashes
+        name = relative_path.rsplit("/", 1)[-1]
+        for pattern, only_directories in self._name_patterns:
+            if (is_directory or not only_directories) and fnmatch.fnmatchcase(name, pattern):
+                return True
+        for pattern, only_directories in self._path_patterns:
+            if (is_directory or not only_directories) and fnmatch.fnmatchcase(relative_path, pattern):
+                return True
+        return False
+
+
+class FileWatcher:
+    """
+    Reports changes to files inside a directory tree. On Linux inotify is used directly through ctypes, so no
+    additional packages are required. When inotify is not available (other platforms or watch limit reached), the
+    tree is periodically scanned for modification times instead. Ignored directories are not descended into, which
+    matters a lot for huge build directories.
+    """
+
+    def __init__(self, root_dir, ignore_rules=None, poll_interval=1.0):
+        self._root_dir = os.path.abspath(root_dir)
+        self._ignore_rules = ignore_rules if ignore_rules is not None else IgnoreRules()
+        self._poll_interval = poll_interval
+
+        self._inotify_fd = None
+        if is_linux():
+            try:
+                self._init_inotify()
+            except OSError:
+                self._close_inotify()
+        if self._inotify_fd is None:
+            self._snapshot = self._take_snapshot()
+
+    def is_using_inotify(self):
+        return self._inotify_fd is not None
+
+    def close(self):
+        self._close_inotify()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def wait(self, timeout=None):
+        # Returns a set of changed paths. It is empty if nothing changed before the timeout.
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining_time = None if deadline is None else max(0, deadline - time.monotonic())
+            if self._inotify_fd is not None:
+                changes = self._wait_inotify(remaining_time)
+            else:
+                changes = self._wait_polling(remaining_time)
+
+            # Events for ignored files are dropped, so we may have to keep waiting.
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def wait_debounced(self, debounce, timeout=None):
+        # Waits for changes and then keeps collecting them until the tree is quiet for the debounce period. Editors
+        # and version control tools usually touch many files in a burst and we want to react only once.
+        changes = self.wait(timeout)
+        if changes:
+            while True:
+                more_changes = self.wait(debounce)
+                if not more_changes:
+                    break
+                changes |= more_changes
+        return changes
+
+    def _get_relative_path(self, path):
+        return os.path.relpath(path, self._root_dir).replace(os.sep, "/")
+
+    def _is_ignored(self, path, is_directory):
+        if path == self._root_dir:
+            return False
+        return self._ignore_rules.is_ignored(self._get_relative_path(path), is_directory)
+
+    # ------------------------------------------------------------------------- inotify backend
+    def _init_inotify(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self._inotify_fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._inotify_fd < 0:
+            self._inotify_fd = None
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched_dirs = {}
+        self._add_inotify_watches(self._root_dir)
+
+    def _close_inotify(self):
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+
+    def _add_inotify_watches(self, directory):
+        # Inotify is not recursive, so every subdirectory needs its own watch.
+        watch_descriptor = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), INOTIFY_WATCH_MASK)
+        if watch_descriptor < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return  # Directory was removed in the meantime
+            raise OSError(error, f"inotify_add_watch failed for {directory}")
+        self._watched_dirs[watch_descriptor] = directory
+
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and not self._is_ignored(entry.path, True):
+                self._add_inotify_watches(entry.path)
+
+    def _wait_inotify(self, timeout):
+        readable, _, _ = select.select([self._inotify_fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changes = set()
+        try:
+            buffer = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset < len(buffer):
+            watch_descriptor, mask, _, name_length = INOTIFY_EVENT_HEADER.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + name_length].rstrip(b"\0"))
+            offset += name_length
+
+            if mask & IN_Q_OVERFLOW:
+                # Some events were lost. Report the whole tree as changed.
+                changes.add(self._root_dir)
+                continue
+            if mask & IN_IGNORED:
+                self._watched_dirs.pop(watch_descriptor, None)
+                continue
+
+            directory = self._watched_dirs.get(watch_descriptor)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            is_directory = bool(mask & IN_ISDIR)
+            if self._is_ignored(path, is_directory):
+                continue
+
+            if is_directory and mask & (IN_CREATE | IN_MOVED_TO) and self._inotify_fd is not None:
+                try:
+                    self._add_inotify_watches(path)
+                except OSError as error:
+                    # Usually the watch limit was reached. Polling is slower, but sees the whole tree.
+                    print(f"WARNING: {error}. Falling back to polling for changes.")
+                    self._close_inotify()
+                    self._snapshot = self._take_snapshot()
+            changes.add(path)
+        return changes
+
+    # ------------------------------------------------------------------------- polling backend
+    def _take_snapshot(self):
+        snapshot = {}
+        directories = [self._root_dir]
+        while directories:
+            directory = directories.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            for entry in entries:
+                try:
+                    is_directory = entry.is_dir(follow_symlinks=False)
+                    if self._is_ignored(entry.path, is_directory):
+                        continue
+                    if is_directory:
+                        directories.append(entry.path)
+                    else:
+                        stat = entry.stat(follow_symlinks=False)
+                        snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    pass
+        return snapshot
+
+    def _wait_polling(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            sleep_time = self._poll_interval
+            if deadline is not None:
+                sleep_time = min(sleep_time, max(0, deadline - time.monotonic()))
+            time.sleep(sleep_time)
+
+            snapshot = self._take_snapshot()
+            changes = {path for path in snapshot.keys() ^ self._snapshot.keys()}
+            changes |= {path for path, signature in snapshot.items() if self._snapshot.get(path, signature) != signature}
+            self._snapshot = snapshot
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
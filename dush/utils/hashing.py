@@ -0,0 +1,282 @@
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from dush.framework import framework
+from dush.utils.file_lock import FileLock
+from dush.utils.paths import get_cache_dir
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Small files are read into a reusable buffer, big ones are mapped to memory, so their content is never copied
+CHUNK_SIZE = 1024 * 1024
+MMAP_THRESHOLD = 8 * CHUNK_SIZE
+
+# Files modified this recently are hashed, but not cached. They may still be written to within the resolution of
+# modification times, so their size and mtime could stay the same after another change.
+RACY_MTIME_SECONDS = 2
+
+# Oldest entries are dropped from the persistent cache when it grows above this size
+MAX_CACHE_ENTRIES = 500000
+
+_GLOB_MAGIC_REGEX = re.compile(r"[*?[]")
+
+
+def get_hash_algorithm():
+    # xxHash is an order of magnitude faster, but it's an optional dependency. BLAKE2 is the fastest in hashlib.
+    return "xxh3_128" if xxhash is not None else "blake2b"
+
+
+def _create_hasher():
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=16)
+
+
+_thread_local = threading.local()
+
+
+def _get_buffer():
+    # Each thread of the pool reuses its own buffer
+    buffer = getattr(_thread_local, "buffer", None)
+    if buffer is None:
+        buffer = _thread_local.buffer = memoryview(bytearray(CHUNK_SIZE))
+    return buffer
+
+
+def _hash_file_content(path, size):
+    hasher = _create_hasher()
+    with open(path, "rb") as file:
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                hasher.update(mapping)
+        else:
+            buffer = _get_buffer()
+            while length := file.readinto(buffer):
+                hasher.update(buffer[:length])
+    return hasher.hexdigest()
+
+
+class FileHashCache:
+    """
+    Persistent cache of file hashes shared by all Dush processes. Entries are keyed by device and inode and are
+    valid as long as size and modification time of the file did not change, so unchanged files are never read
+    again, even if they were moved or the directory was recloned with hardlinks. The cache is loaded on first use
+    and new entries are merged with the file on save, so concurrent processes do not lose each other's entries.
+    """
+
+    def __init__(self):
+        self._path = get_cache_dir("hashing") / f"{get_hash_algorithm()}.json"
+        self._entries = None
+        self._new_entries = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self._path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _get_key(stat):
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def get(self, stat):
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            entry = self._entries.get(self._get_key(stat))
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        return None
+
+    def put(self, stat, file_hash):
+        if time.time() - stat.st_mtime_ns / 1e9 < RACY_MTIME_SECONDS:
+            return
+        entry = [stat.st_size, stat.st_mtime_ns, file_hash]
+        with self._lock:
+            self._entries[self._get_key(stat)] = entry
+            self._new_entries[self._get_key(stat)] = entry
+
+    def save(self):
+        with self._lock:
+            if not self._new_entries:
+                return
+            with open(self._path.with_suffix(".lock"), "a") as lock_file, FileLock(lock_file):
+                entries = self._load()
+                entries.update(self._new_entries)
+                if len(entries) > MAX_CACHE_ENTRIES:
+                    entries = dict(list(entries.items())[-MAX_CACHE_ENTRIES:])
+
+                tmp_path = self._path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, "w") as file:
+                    json.dump(entries, file, separators=(",", ":"))
+                os.replace(tmp_path, self._path)
+            self._entries = entries
+            self._new_entries = {}
+
+
+_file_hash_cache = FileHashCache()
+
+# Saving rewrites the whole cache file, which may take longer than hashing a few files. Save once after each command
+# and when the process exits, in case hashing is used outside of commands.
+framework.register_flush(_file_hash_cache.save)
+atexit.register(_file_hash_cache.save)
+
+
+def _hash_file(path):
+    stat = os.stat(path)
+    file_hash = _file_hash_cache.get(stat)
+    if file_hash is None:
+        file_hash = _hash_file_content(path, stat.st_size)
+        _file_hash_cache.put(stat, file_hash)
+    return file_hash
+
+
+def hash_files(paths, jobs=None):
+    """
+    Returns a dictionary of hashes of given files. Files are read by a pool of threads, since hashing releases the
+    GIL and reading many small files is dominated by I/O latency. Hashes of unchanged files come from the persistent
+    cache. Hashes are not cryptographically secure, they are only meant to detect changes.
+    """
+
+    paths = [os.fspath(path) for path in paths]
+    if jobs is None:
+        jobs = min(32, (os.cpu_count() or 1) * 2)
+
+    if len(paths) <= 1 or jobs <= 1:
+        hashes = [_hash_file(path) for path in paths]
+    else:
+        # Imported here, since it's expensive and not needed for a single file
+        import concurrent.futures
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            hashes = list(executor.map(_hash_file, paths, chunksize=64))
+    return dict(zip(paths, hashes))
+
+
+def hash_file(path):
+    return hash_files([path])[os.fspath(path)]
+
+
+def combine_hashes(hashes):
+    # Single hash of a dictionary returned by hash_files() or hash_directory(). Paths are a part of it, so renames
+    # are detected as well.
+    hasher = _create_hasher()
+    for path, file_hash in sorted(hashes.items()):
+        hasher.update(f"{path}\0{file_hash}\n".encode())
+    return hasher.hexdigest()
+
+
+def _translate_pattern(pattern):
+    # Converts a glob pattern to a regex matching whole paths. "**/" matches any number of directories, "*", "?" and
+    # negated sets like "[!x]" never match slashes.
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+        elif pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+        elif pattern[index] == "*":
+            regex += "[^/]*"
+            index += 1
+        elif pattern[index] == "?":
+            regex += "[^/]"
+            index += 1
+        elif pattern[index] == "[":
+            # "]" right after "[" or "[!" is a part of the set, like in fnmatch
+            end = index + 1
+            if pattern.startswith("!", end):
+                end += 1
+            if pattern.startswith("]", end):
+                end += 1
+            end = pattern.find("]", end)
+            if end == -1:
+                regex += re.escape("[")
+                index += 1
+            else:
+                content = re.sub(r"([&~|\[\]\\])", r"\\\1", pattern[index + 1 : end])
+                if content.startswith("!"):
+                    content = "^/" + content[1:]
+                elif content.startswith("^"):
+                    content = "\\" + content
+                regex += f"[{content}]"
+                index = end + 1
+        else:
+            regex += re.escape(pattern[index])
+            index += 1
+    return re.compile(f"{regex}$")
+
+
+def _split_pattern(pattern):
+    # Returns the longest leading directory without wildcards and a regex for the whole pattern
+    parts = pattern.split("/")
+    for index, part in enumerate(parts):
+        if _GLOB_MAGIC_REGEX.search(part):
+            return "/".join(parts[:index]) or "/", _translate_pattern(pattern)
+    return pattern, None
+
+
+def is_glob_pattern(pattern):
+    return _GLOB_MAGIC_REGEX.search(Path(pattern).as_posix()) is not None
+
+
+def expand_patterns(patterns, excluded=()):
+    """
+    Returns sorted paths of files matching any of the glob patterns. Patterns are absolute paths which may contain
+    "*", "?", "[...]" and "**" for any number of directories. Paths of directories are equivalent to "dir/**".
+    Files and directories matching any of the excluded patterns are skipped. Excluded directories are not entered,
+    so big subtrees like build directories or .git cost nothing. Paths of files without wildcards are returned if
+    they exist, regardless of exclusions.
+    """
+
+    excluded = [_translate_pattern(Path(pattern).as_posix()) for pattern in excluded]
+    result = set()
+    for pattern in patterns:
+        base_dir, regex = _split_pattern(Path(pattern).as_posix())
+        if regex is None:
+            if os.path.isfile(base_dir):
+                result.add(base_dir)
+                continue
+            elif os.path.isdir(base_dir):
+                regex = _translate_pattern(f"{base_dir}/**")
+            else:
+                continue
+
+        for dir_path, dir_names, file_names in os.walk(base_dir):
+            dir_path = Path(dir_path).as_posix()
+            dir_names[:] = [name for name in dir_names if not any(excluded_regex.match(f"{dir_path}/{name}") for excluded_regex in excluded)]
+            for file_name in file_names:
+                file_path = f"{dir_path}/{file_name}"
+                if regex.match(file_path) and not any(excluded_regex.match(file_path) for excluded_regex in excluded):
+                    result.add(file_path)
+    return sorted(result)
+
+
+def hash_directory(root_dir, include=("**",), exclude=(), jobs=None):
+    """
+    Returns hashes of files in the directory matching any of the include patterns and none of the exclude patterns.
+    Patterns are relative to the directory, e.g. "**/*.go" or "build.*". Keys of the dictionary are relative paths.
+    """
+
+    root_dir = Path(root_dir).absolute().as_posix()
+    paths = expand_patterns([f"{root_dir}/{pattern}" for pattern in include], [f"{root_dir}/{pattern}" for pattern in exclude])
+    return {Path(path).relative_to(root_dir).as_posix(): file_hash for path, file_hash in hash_files(paths, jobs).items()}
+
+
+def hash_directory_combined(root_dir, include=("**",), exclude=(), jobs=None):
+    # Single hash of the matched files, which changes when any of them is changed, added, removed or renamed
+    return combine_hashes(hash_directory(root_dir, include, exclude, jobs))
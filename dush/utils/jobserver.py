@@ -0,0 +1,40 @@
+import os
+
+
+class Jobserver:
+    """
+    GNU Make compatible jobserver limiting the total number of jobs run by multiple concurrent build processes.
+    Without it, each of them assumes it owns all the CPUs and running a few builds at once oversubscribes the
+    machine. Make, cargo and the tools they spawn (e.g. cc crate) take a token from the pipe before starting a
+    job beyond the first one. Every client owns one implicit token, so the pipe is filled with the remaining ones.
+
+    Pass get_env() and get_fds() to start_command() of every client. Only POSIX systems are supported.
+    """
+
+    def __init__(self, jobs=None, clients_count=1):
+        self.jobs = jobs if jobs is not None else os.cpu_count()
+        self._read_fd, self._write_fd = os.pipe()
+        os.write(self._write_fd, b"+" * max(0, self.jobs - clients_count))
+
+    def get_env(self):
+        # Older tools only understand --jobserver-fds, newer ones prefer --jobserver-auth
+        flags = f"-j{self.jobs} --jobserver-fds={self._read_fd},{self._write_fd} --jobserver-auth={self._read_fd},{self._write_fd}"
+        return {
+            "MAKEFLAGS": flags,
+            "CARGO_MAKEFLAGS": flags,
+        }
+
+    def get_fds(self):
+        return (self._read_fd, self._write_fd)
+
+    def close(self):
+        if self._read_fd is not None:
+            os.close(self._read_fd)
+            os.close(self._write_fd)
+            self._read_fd = self._write_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
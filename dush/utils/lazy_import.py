@@ -0,0 +1,45 @@
+import importlib
+import sys
+import types
+
+
+class _LazyPackage(types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it as an attribute of its package. Some submodules are named the same as
+        # the function they define (e.g. dush.core.cmake.cmake), so bind the function instead of the submodule.
+        lazy_attributes = self.__dict__.get("_lazy_attributes", {})
+        if isinstance(value, types.ModuleType) and lazy_attributes.get(name) == value.__name__:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def make_package_lazy(package_name, modules, star_modules=None):
+    """
+    Makes a package import its submodules only when one of their attributes is accessed for the first time (PEP 562).
+    The modules argument maps submodule names to lists of attributes the package exports from them. Returns values
+    for __all__, __getattr__ and __dir__ of the package.
+
+    "from package import *" accesses every name in __all__, so it imports all modules listed there. If star_modules
+    is given, only attributes of these modules are listed in __all__. Attributes of other modules have to be imported
+    by name, e.g. "from package import name".
+    """
+    package = sys.modules[package_name]
+    lazy_attributes = {name: module_name for module_name, names in modules.items() for name in names}
+
+    def __getattr__(name):
+        module_name = lazy_attributes.get(name)
+        if module_name is None:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module_name), name)
+        setattr(package, name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(package.__dict__) | set(lazy_attributes))
+
+    package._lazy_attributes = lazy_attributes
+    package.__class__ = _LazyPackage
+    if star_modules is None:
+        star_modules = modules.keys()
+    star_attributes = [name for module_name in star_modules for name in modules[module_name]]
+    return (star_attributes, __getattr__, __dir__)
@@ -1,10 +1,64 @@
 import os
+import stat
 from pathlib import Path
 
+from dush.framework import framework
+from dush.utils.os_function import is_windows
+
+
+class StatCache:
+    """
+    Cache of os.stat() results shared by path resolution helpers. Paths like workspace, toolchain locations or
+    project directories are checked many times during a command, but they are not expected to change while it
+    runs. Framework clears the cache before each command, so commands never see results older than their start.
+    Missing paths are cached as well.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def stat(self, path):
+        key = os.fspath(path)
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+
+        try:
+            result = os.stat(key)
+        except (FileNotFoundError, NotADirectoryError):
+            result = None
+        self._entries[key] = result
+        return result
+
+    def exists(self, path):
+        return self.stat(path) is not None
+
+    def is_dir(self, path):
+        result = self.stat(path)
+        return result is not None and stat.S_ISDIR(result.st_mode)
+
+    def is_file(self, path):
+        result = self.stat(path)
+        return result is not None and stat.S_ISREG(result.st_mode)
+
+    def clear(self):
+        self._entries.clear()
+
+
+stat_cache = StatCache()
+framework.register_cache(stat_cache)
+
+
+class PredefinedPath(os.PathLike):
+    """
+    Path resolved on first use and cached, including resolutions which did not find anything. Objects can be passed
+    directly to functions accepting paths, like open() or subprocess.Popen().
+    """
 
-class PredefinedPath:
     def __init__(self, required, is_directory, lazy_resolve):
         self._path = None
+        self._is_resolved = False
         self._required = required
         self._is_directory = is_directory
 
@@ -15,33 +69,57 @@ class PredefinedPath:
         raise NotImplementedError()
 
     def get(self):
-        if self._path is None:
-            self._path = self._resolve()
+        if not self._is_resolved:
+            path = self._resolve()
 
             if self._required:
-                if self._path is None:
+                if path is None:
                     raise ValueError("Predefined path is missing.")
-                if self._is_directory and not self._path.is_dir():
-                    raise FileNotFoundError(f"Predefined file path is invalid. {self._path}")
-                if not self._is_directory and not self._path.is_file():
-                    raise FileNotFoundError(f"Predefined directory path is invalid. {self._path}")
+                if self._is_directory and not stat_cache.is_dir(path):
+                    raise FileNotFoundError(f"Predefined file path is invalid. {path}")
+                if not self._is_directory and not stat_cache.is_file(path):
+                    raise FileNotFoundError(f"Predefined directory path is invalid. {path}")
+
+            self._path = path
+            self._is_resolved = True
 
         return self._path
 
     def __str__(self):
         return str(self.get())
 
+    def __fspath__(self):
+        path = self.get()
+        if path is None:
+            raise TypeError("Predefined path is missing.")
+        return os.fspath(path)
+
     def __truediv__(self, subdir):
-        return Path(str(self)) / subdir
+        path = self.get()
+        if path is None:
+            raise TypeError("Predefined path is missing.")
+        return path / subdir
 
 
 class HardcodedPath(PredefinedPath):
-    def __init__(self, path, required=True, is_directory=True, lazy_resolve=True):
+    """
+    Path known upfront. It can be relative to a base PredefinedPath, which is not resolved until this path is used,
+    e.g. HardcodedPath("vk.json", base=workspace_path).
+    """
+
+    def __init__(self, path, required=True, is_directory=True, lazy_resolve=True, base=None):
         self._hardcoded_path = path
+        self._base = base
         super().__init__(required, is_directory, lazy_resolve)
 
     def _resolve(self):
-        return Path(self._hardcoded_path)
+        if self._base is None:
+            return Path(self._hardcoded_path)
+
+        base = self._base.get()
+        if base is None:
+            return None
+        return base / self._hardcoded_path
 
 
 class EnvPath(PredefinedPath):
@@ -110,6 +188,19 @@ class LocalOrRemotePath:
     def __truediv__(self, other):
         return LocalOrRemotePath(path=self._path / other, is_ssh=self._is_ssh, ssh_host=self._ssh_host)
 
+
+def get_cache_dir(*subdirs):
+    # Persistent caches are kept outside of Dush and workspace directories, so they survive cleaning and recloning.
+    if is_windows():
+        cache_root = os.environ.get("LOCALAPPDATA", Path.home() / "AppData/Local")
+    else:
+        cache_root = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+
+    cache_dir = Path(cache_root, "dush", *subdirs)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
 # This variable points to a directory which contains all of the developer's work projects.
 workspace_path = EnvPath("DUSH_WORKSPACE", lazy_resolve=False)
 dush_path = EnvPath("DUSH_PATH", lazy_resolve=False)
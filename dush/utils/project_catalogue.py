@@ -0,0 +1,171 @@
+import json
+import os
+import shlex
+from pathlib import Path
+
+"""
+Project catalogue is a compiled form of config.ini files of all projects in dush/projects directory. Parsing
+all the files every time Python script runs or a shell starts is wasteful, so they are parsed once and saved to:
+    - catalogue.json for Python and PowerShell frontend,
+    - catalogue.bash for Bash frontend, which can source it without spawning any processes.
+Both files are placed in dush/projects directory and regenerated whenever any config.ini is added, removed or
+modified. Known keys are validated during generation. Warnings about unexpected keys are printed only then, but
+errors about missing keys are saved in the catalogue, because the frontends refuse to initialize such projects.
+
+Run this module to regenerate the catalogue manually:
+    python -m dush.utils.project_catalogue
+"""
+
+# All project's config.ini should define those keys and only those keys.
+KNOWN_KEYS = (
+    "name",
+    "name_friendly",
+    "name_directory",
+    "dir_inside_root",
+    "has_repository",
+    "has_main_command",
+    "has_bash_scripts",
+    "has_python_scripts",
+    "has_git_submodules",
+    "upstream_url",
+    "upstream_main_branch",
+    "upstream_dev_branch",
+)
+
+# Increment when format of generated files changes.
+CATALOGUE_VERSION = 1
+
+projects_dir = Path(__file__).parent.parent / "projects"
+catalogue_json_path = projects_dir / "catalogue.json"
+catalogue_bash_path = projects_dir / "catalogue.bash"
+
+
+def read_config_file(config_file_path):
+    config = {}
+    with open(config_file_path, "r") as file:
+        for line in file:
+            # Extract key/value pair
+            equals_sign_pos = line.find("=")
+            if equals_sign_pos == -1:
+                continue
+            key = line[:equals_sign_pos].strip()
+            value = line[equals_sign_pos + 1 :].strip()
+            config[key] = value
+    return config
+
+
+def _find_config_files():
+    return sorted(projects_dir.glob("*/config.ini"))
+
+
+def _get_bash_identifier(project_dir_name):
+    return "".join(c if c.isalnum() or c == "_" else "_" for c in project_dir_name)
+
+
+def build_catalogue():
+    projects = {}
+    for config_file_path in _find_config_files():
+        project_dir_name = config_file_path.parent.name
+        mtime_ns = config_file_path.stat().st_mtime_ns
+        config = read_config_file(config_file_path)
+
+        # Validate the keys. This is done only once after config changes, so frontends do not have to do it.
+        for key in config:
+            if key not in KNOWN_KEYS:
+                print(f'WARNING: Dush project {project_dir_name} defines unexpected setting "{key}" in its config.ini')
+        config = {key: value for key, value in config.items() if key in KNOWN_KEYS}
+        errors = [f"ERROR: Dush project {project_dir_name} does not define config key {key}" for key in KNOWN_KEYS if key not in config]
+
+        projects[project_dir_name] = {
+            "path": str(config_file_path.parent),
+            "config_mtime_ns": mtime_ns,
+            "config": config,
+            "errors": errors,
+        }
+
+    return {
+        "version": CATALOGUE_VERSION,
+        "projects": projects,
+    }
+
+
+def _format_bash_catalogue(catalogue):
+    lines = [
+        "# Generated by dush.utils.project_catalogue from config.ini files. Do not edit.",
+        f"_dush_catalogue_config_count={len(catalogue['projects'])}",
+    ]
+    for project_dir_name, project in catalogue["projects"].items():
+        identifier = _get_bash_identifier(project_dir_name)
+        entries = " ".join(f"[{key}]={shlex.quote(value)}" for key, value in project["config"].items())
+        errors = " ".join(shlex.quote(error) for error in project["errors"])
+        lines.append(f"declare -gA _dush_catalogue_{identifier}=({entries})")
+        lines.append(f"declare -ga _dush_catalogue_errors_{identifier}=({errors})")
+    return "\n".join(lines) + "\n"
+
+
+def _write_file_atomically(path, content):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", newline="\n") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def save_catalogue(catalogue):
+    # Write bash file last. Bash frontend compares its mtime against config files to detect changes.
+    _write_file_atomically(catalogue_json_path, json.dumps(catalogue, indent=4))
+    _write_file_atomically(catalogue_bash_path, _format_bash_catalogue(catalogue))
+
+
+def _is_catalogue_valid(catalogue):
+    if catalogue.get("version") != CATALOGUE_VERSION:
+        return False
+
+    projects = catalogue["projects"]
+    config_file_paths = _find_config_files()
+    if len(config_file_paths) != len(projects):
+        return False
+    for config_file_path in config_file_paths:
+        project = projects.get(config_file_path.parent.name)
+        if project is None or project["config_mtime_ns"] != config_file_path.stat().st_mtime_ns:
+            return False
+    return True
+
+
+_catalogue = None
+
+
+def load_catalogue():
+    global _catalogue
+    if _catalogue is not None:
+        return _catalogue
+
+    try:
+        with open(catalogue_json_path, "r") as file:
+            catalogue = json.load(file)
+        if _is_catalogue_valid(catalogue):
+            _catalogue = catalogue
+            return _catalogue
+    except (OSError, ValueError, KeyError):
+        pass
+
+    _catalogue = build_catalogue()
+    try:
+        save_catalogue(_catalogue)
+    except OSError:
+        pass  # Catalogue is only an optimization. Dush directory may be read-only.
+    return _catalogue
+
+
+def get_catalogued_config(project_dir):
+    # Returns config of a project from dush/projects directory or None for projects located elsewhere.
+    project_dir = Path(project_dir).resolve()
+    if project_dir.parent != projects_dir.resolve():
+        return None
+    project = load_catalogue()["projects"].get(project_dir.name)
+    if project is None:
+        return None
+    return project["config"]
+
+
+if __name__ == "__main__":
+    save_catalogue(build_catalogue())
@@ -2,8 +2,9 @@ import os
 import re
 from pathlib import Path
 
-from dush.framework import *
-from dush.utils import *
+from dush.framework import framework
+from dush.utils.paths import stat_cache, workspace_path
+from dush.utils.project_catalogue import get_catalogued_config, load_catalogue, read_config_file
 
 
 class DushProject:
@@ -16,26 +17,21 @@ class DushProjectRepository:
         self._projects = dict()
 
     def load_all(self):
-        for config_file in dush_path.get().glob("dush/projects/**/config.ini"):
-            project_dir = Path(config_file).parent
-            self.load(project_dir)
+        for project in load_catalogue()["projects"].values():
+            self._add(Path(project["path"]), project["config"])
 
     def load(self, project_dir):
+        # Projects from Dush repository are read from the precompiled catalogue. Projects located elsewhere
+        # have to read their config.ini directly.
+        config = get_catalogued_config(project_dir)
+        if config is None:
+            config = read_config_file(Path(project_dir) / "config.ini")
+        return self._add(project_dir, config)
+
+    def _add(self, project_dir, config):
         project = DushProject(project_dir)
-
-        # Read config
-        config_file_path = project_dir / "config.ini"
-        with open(config_file_path, "r") as file:
-            for line in file:
-                # Extract key/value pair
-                equals_sign_pos = line.find("=")
-                if equals_sign_pos == -1:
-                    continue
-                key = line[:equals_sign_pos].strip()
-                value = line[equals_sign_pos + 1 :].strip()
-
-                # Set as attributes of the project
-                setattr(project, key, value)
+        for key, value in config.items():
+            setattr(project, key, value)
 
         # Add the project
         name = project.name.lower()
@@ -99,6 +95,12 @@ class IncorrectProjectDirectory(Exception):
     pass
 
 
+# Results of get_project_dir() for given cwd and arguments. Commands often call it many times, e.g. once per
+# helper function. Cleared by the framework before each command.
+_project_dir_cache = {}
+framework.register_cache(_project_dir_cache)
+
+
 def get_project_dir(root_name_prefix=None, suffix=None, do_chdir=True):
     # Get arguments from current directory if not specified
     if suffix is None:
@@ -109,8 +111,25 @@ def get_project_dir(root_name_prefix=None, suffix=None, do_chdir=True):
     if framework.get_framework_args().project_dir_force is not None:
         root_name_prefix = framework.get_framework_args().project_dir_force
 
-    cwd = Path(os.getcwd())
+    cwd = os.getcwd()
+    cache_key = (cwd, root_name_prefix, suffix)
+    new_cwd = _project_dir_cache.get(cache_key)
+    if new_cwd is None:
+        new_cwd = _find_project_dir(Path(cwd), root_name_prefix, suffix)
+        _project_dir_cache[cache_key] = new_cwd
+
+    # cd to the path if requested
+    if do_chdir:
+        try:
+            os.chdir(new_cwd)
+        except FileNotFoundError:
+            raise IncorrectProjectDirectory(f"invalid {root_name_prefix} repo")
+
+    # Return the path
+    return new_cwd
+
 
+def _find_project_dir(cwd, root_name_prefix, suffix):
     # Get project's root directory
     try:
         subdir = cwd.relative_to(workspace_path.get())
@@ -129,15 +148,6 @@ def get_project_dir(root_name_prefix=None, suffix=None, do_chdir=True):
     new_cwd = workspace_path / subdir
     if suffix and suffix != ".":
         new_cwd = new_cwd / suffix
-
-    # cd to the path if requested
-    if do_chdir:
-        try:
-            os.chdir(new_cwd)
-        except FileNotFoundError:
-            raise IncorrectProjectDirectory(f"invalid {root_name_prefix} repo")
-
-    # Return the path
     return new_cwd
 
 
@@ -160,7 +170,7 @@ def get_project_dirs(root_name_prefix=None, suffix=None):
             continue
 
         project_dir = workspace_path / name / suffix
-        if not project_dir.is_dir():
+        if not stat_cache.is_dir(project_dir):
             raise IncorrectProjectDirectory(f"invalid {root_name_prefix} repo")
 
         result.append(project_dir)
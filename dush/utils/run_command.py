@@ -11,11 +11,10 @@ from pathlib import Path
 
 import dush.framework.framework as framework
 from dush.utils.os_function import is_windows, windows_only
-from dush.utils.paths import RaiiChdir
 
 
 class Command:
-    def __init__(self, command, process):
+    def __init__(self, command, process, stdin=None, stdout=None, stderr=None):
         self.command = command
         self.process = process
         self.execution_time = None
@@ -23,10 +22,35 @@ class Command:
         self.stdout = None
         self.stderr = None
 
-    def wait(self):
-        if self._return_value is None:
-            self._return_value = self._process.wait()
-        return self._return_value
+        self._stdin = stdin
+        self._stdout = stdout
+        self._stderr = stderr
+        self._begin_timestamp = datetime.datetime.now()
+
+    def is_running(self):
+        return self.return_value is None and self.process.poll() is None
+
+    def wait(self, timeout_seconds=None, ignore_error=False):
+        if self.return_value is None:
+            try:
+                (stdout_data, stderr_data) = self.process.communicate(input=self._stdin.communicate_arg, timeout=timeout_seconds)
+                self.return_value = self.process.wait()
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.communicate()
+                raise CommandTimeout(self)
+            self.execution_time = datetime.datetime.now() - self._begin_timestamp
+
+            # Process output
+            if stdout_data is not None and (self._stdout.should_return or self.return_value != 0):
+                self.stdout = stdout_data.decode("utf-8")
+            if stderr_data is not None and (self._stderr.should_return or self.return_value != 0):
+                self.stderr = stderr_data.decode("utf-8")
+
+        # Raise exception on error
+        if self.return_value != 0 and not ignore_error:
+            raise CommandError(self)
+        return self.return_value
 
 
 class CommandErrorBase(Exception):
@@ -90,27 +114,29 @@ class Stdout:
         return Stdout(file_handle, False)
 
 
-class EnvSaver:
-    def __enter__(self):
-        self._saved_env = os.environ
-        return self
+def create_env(env={}, paths=[], ld_library_paths=[]):
+    # Returns environment for a child process or None, if it should just inherit ours. Environment of this process
+    # is never modified, so multiple commands with different environments can run concurrently.
+    if not (env or paths or ld_library_paths):
+        return None
+
+    result = dict(os.environ)
 
-    def prepend_paths(self, env_name, separator, paths):
+    # Set key/value environment variables
+    for key, value in env.items():
+        result[str(key)] = str(value)
+
+    # Prepend new paths to current PATH and LD_LIBRARY_PATH values
+    def prepend_paths(env_name, separator, paths):
         if not paths:
             return
-
         new_paths = separator.join((str(x) for x in paths))
-        current_path = os.environ.get(env_name, default="")
-        if current_path:
-            os.environ[env_name] = new_paths + separator + current_path
-        else:
-            os.environ[env_name] = new_paths
-
-    def set(self, env_name, value):
-        os.environ[str(env_name)] = str(value)
+        current_path = result.get(env_name, "")
+        result[env_name] = new_paths + separator + current_path if current_path else new_paths
 
-    def __exit__(self, *args):
-        os.environ = self._saved_env
+    prepend_paths("PATH", os.pathsep, paths)
+    prepend_paths("LD_LIBRARY_PATH", ":", ld_library_paths)
+    return result
 
 
 def generate_bat_script(raw_command, cwd, paths, env):
@@ -153,21 +179,27 @@ def print_run_command(raw_command, cwd):
     print(f"Running command: {raw_command} (in directory {cwd})")
 
 
-def run_command(
+def start_command(
     raw_command,
     *,
     shell=False,
     stdin=Stdin.empty(),
     stdout=Stdout.print_to_console(),
     stderr=Stdout.print_to_console(),
-    ignore_error=False,
     cwd=None,
     env={},
     paths=[],
     ld_library_paths=[],
     generate_bat=False,
-    timeout_seconds=None,
+    pass_fds=(),
 ):
+    """
+    Starts a command without waiting for it. Returned Command object has to be waited for with Command.wait(),
+    which also raises an exception on errors. Use it to run multiple commands concurrently. Outputs returned back
+    are buffered in pipes, so commands producing a lot of output should rather print to files. File descriptors
+    listed in pass_fds are inherited by the command, e.g. pipe of a Jobserver.
+    """
+
     # Debug options
     if generate_bat:
         generate_bat_script(raw_command, cwd, paths, env)
@@ -180,43 +212,50 @@ def run_command(
     else:
         command = raw_command
 
-    # Create ExitStack for conditional context managers
-    with ExitStack() as context:
-        # Set cwd
-        if cwd:
-            context.enter_context(RaiiChdir(cwd))
-
-        # Set environment
-        if env or paths or ld_library_paths:
-            env_state = context.enter_context(EnvSaver())
-
-            # Set key/value environment variables
-            for key, value in env.items():
-                env_state.set(key, value)
+    process = subprocess.Popen(
+        command,
+        shell=shell,
+        stdin=stdin.popen_arg,
+        stdout=stdout.popen_arg,
+        stderr=stderr.popen_arg,
+        cwd=cwd if cwd else None,
+        env=create_env(env, paths, ld_library_paths),
+        pass_fds=pass_fds,
+    )
+    return Command(raw_command, process, stdin, stdout, stderr)
 
-            # Prepend new paths to current PATH and LD_LIBRARY_PATH values
-            env_state.prepend_paths("PATH", os.pathsep, paths)
-            env_state.prepend_paths("LD_LIBRARY_PATH", ":", ld_library_paths)
 
-        # Execute the command and wait for it to return
-        process = subprocess.Popen(command, shell=shell, stdin=stdin.popen_arg, stdout=stdout.popen_arg, stderr=stderr.popen_arg)
-        result = Command(raw_command, process)
-        try:
-            (stdout_data, stderr_data) = process.communicate(input=stdin.communicate_arg, timeout=timeout_seconds)
-            result.return_value = process.wait()
-        except subprocess.TimeoutExpired:
-            process.kill()
-            raise CommandTimeout(result)
-
-        # Process output
-        if stdout_data is not None and (stdout.should_return or result.return_value != 0):
-            result.stdout = stdout_data.decode("utf-8")
-        if stderr_data is not None and (stderr.should_return or result.return_value != 0):
-            result.stderr = stderr_data.decode("utf-8")
-
-    # Raise exception on error
-    if result.return_value != 0 and not ignore_error:
-        raise CommandError(result)
+def run_command(
+    raw_command,
+    *,
+    shell=False,
+    stdin=Stdin.empty(),
+    stdout=Stdout.print_to_console(),
+    stderr=Stdout.print_to_console(),
+    ignore_error=False,
+    cwd=None,
+    env={},
+    paths=[],
+    ld_library_paths=[],
+    generate_bat=False,
+    timeout_seconds=None,
+    pass_fds=(),
+):
+    # Execute the command and wait for it to return
+    result = start_command(
+        raw_command,
+        shell=shell,
+        stdin=stdin,
+        stdout=stdout,
+        stderr=stderr,
+        cwd=cwd,
+        env=env,
+        paths=paths,
+        ld_library_paths=ld_library_paths,
+        generate_bat=generate_bat,
+        pass_fds=pass_fds,
+    )
+    result.wait(timeout_seconds=timeout_seconds, ignore_error=ignore_error)
 
     # Return the command object
     return result
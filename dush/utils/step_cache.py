@@ -0,0 +1,119 @@
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from dush.utils.file_lock import FileLock
+from dush.utils.hashing import combine_hashes, expand_patterns, hash_files, is_glob_pattern
+from dush.utils.paths import workspace_path
+
+
+class StepState:
+    # Digest of inputs of the last successful run of a step
+    def __init__(self, path):
+        self._path = path
+        try:
+            with open(path, "r") as file:
+                self.digest = json.load(file)["digest"]
+        except (OSError, ValueError, KeyError):
+            self.digest = None
+
+    def save(self, digest):
+        self.digest = digest
+        tmp_path = self._path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"digest": digest}, file)
+        os.replace(tmp_path, self._path)
+
+
+def _compute_inputs_digest(inputs, excluded, env):
+    hasher = hashlib.sha256()
+    hasher.update(combine_hashes(hash_files(expand_patterns(inputs, excluded))).encode())
+    for name in env:
+        hasher.update(f"\n${name}\0{os.environ.get(name)}".encode())
+    return hasher.hexdigest()
+
+
+def _outputs_exist(outputs):
+    for pattern in outputs:
+        if is_glob_pattern(pattern):
+            if not expand_patterns([pattern]):
+                return False
+        elif not os.path.exists(pattern):
+            return False
+    return True
+
+
+def get_steps_dir():
+    steps_dir = Path(workspace_path) / ".dush_steps"
+    steps_dir.mkdir(exist_ok=True)
+    return steps_dir
+
+
+def run_cached_step(name, function, inputs, outputs=(), env=(), excluded=(), force=False):
+    """
+    Calls the function unless its inputs did not change since its last successful call and all outputs exist.
+    Inputs and outputs are glob patterns described in expand_patterns(). Inputs are hashed by content, with hashes
+    of unchanged files taken from the persistent cache of dush.utils.hashing. Values of listed environment variables
+    are treated as inputs as well. State of steps is kept per workspace and is keyed by the name and the patterns, so
+    the same step for different directories or configs is tracked separately. Concurrent invocations of the same
+    step wait for each other. Returns True if the function was called.
+    """
+
+    inputs = [Path(pattern).as_posix() for pattern in inputs]
+    outputs = [Path(pattern).as_posix() for pattern in outputs]
+    key = hashlib.sha256("\n".join([name, *inputs, "", *outputs]).encode()).hexdigest()[:32]
+    steps_dir = get_steps_dir()
+
+    with open(steps_dir / f"{key}.lock", "a") as lock_file, FileLock(lock_file):
+        state = StepState(steps_dir / f"{key}.json")
+        digest = _compute_inputs_digest(inputs, excluded, env)
+        if not force and digest == state.digest and _outputs_exist(outputs):
+            # Single write, so messages of steps run from multiple threads do not interleave
+            print(f"Skipping {name}, inputs did not change since last run\n", end="")
+            return False
+
+        function()
+
+        # Save inputs as they were before the step. If they were edited while it ran, the next run sees a difference
+        # and repeats the step instead of skipping it with outputs built from old inputs. Steps modifying their own
+        # inputs (e.g. cargo writing Cargo.lock) cost one extra run this way.
+        state.save(digest)
+        return True
+
+
+def cached_step(inputs, outputs=(), env=(), excluded=()):
+    """
+    Decorator making a function a cached step. Patterns may contain placeholders for arguments of the function,
+    e.g. "{build_dir}/**/*.cpp", which are filled on every call. See run_cached_step().
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Importing inspect is expensive. Steps are decorated when a script is loaded, so do it only when a step
+            # is actually called.
+            import inspect
+
+            bound_args = inspect.signature(function).bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            values = {name: Path(value).as_posix() if isinstance(value, os.PathLike) else value for name, value in bound_args.arguments.items()}
+
+            def format_patterns(patterns):
+                return [pattern.format(**values) for pattern in patterns]
+
+            result = []
+            run_cached_step(
+                function.__qualname__,
+                lambda: result.append(function(*args, **kwargs)),
+                format_patterns(inputs),
+                format_patterns(outputs),
+                env,
+                format_patterns(excluded),
+            )
+            return result[0] if result else None
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,18 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+repo_path = Path(__file__).parent.parent
+sys.path.insert(0, str(repo_path))
+
+# Dush modules resolve the workspace and the cache directory on import, so point them to a temporary directory before
+# any test imports them. Caches of the user are never touched this way.
+_tmp_dir = Path(tempfile.mkdtemp(prefix="dush_tests_"))
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+(_tmp_dir / "workspace").mkdir()
+os.environ["DUSH_PATH"] = str(repo_path)
+os.environ["DUSH_WORKSPACE"] = str(_tmp_dir / "workspace")
+os.environ["XDG_CACHE_HOME"] = str(_tmp_dir / "cache")
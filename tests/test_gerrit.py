@@ -0,0 +1,161 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+from dush.core.gerrit import GerritClient, GerritError
+
+
+class FakeGerrit(ThreadingHTTPServer):
+    """
+    Minimal Gerrit REST API serving changes from a dictionary keyed by change numbers. It counts requests and
+    connections and can drop a connection after a response, like servers closing idle keep-alive connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeGerritHandler)
+        self.changes = {}
+        self.requests = []
+        self.connections_count = 0
+        self.close_after_response = False
+
+    def add_change(self, change_number, patchset, updated):
+        commit = f"{change_number:04}{patchset:04}".ljust(40, "0")
+        self.changes[change_number] = {
+            "id": f"project~main~I{change_number:040}",
+            "change_id": f"I{change_number:040}",
+            "_number": change_number,
+            "updated": updated,
+            "current_revision": commit,
+            "revisions": {commit: {"_number": patchset, "ref": f"refs/changes/{change_number % 100:02}/{change_number}/{patchset}"}},
+        }
+
+    def find_change(self, change_id):
+        for change in self.changes.values():
+            if change_id in [str(change["_number"]), change["change_id"], change["id"]]:
+                return change
+        return None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeGerritHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections_count += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append((url.path, self.headers.get("If-None-Match")))
+        if url.path == "/a/changes/":
+            query = parse_qs(url.query)["q"][0]
+            change_ids = [unquote(term.removeprefix("change:")) for term in query.split(" OR ")]
+            changes = [self.server.find_change(change_id) for change_id in change_ids]
+            self.send_json([change for change in changes if change is not None], None)
+        else:
+            change = self.server.find_change(unquote(url.path.removeprefix("/a/changes/")))
+            if change is None:
+                self.send_json(None, None, 404)
+            elif self.headers.get("If-None-Match") == change["updated"]:
+                self.send_json(None, change["updated"], 304)
+            else:
+                self.send_json(change, change["updated"])
+        self.close_connection = self.server.close_after_response
+
+    def send_json(self, data, etag, status=200):
+        body = b"" if data is None else (")]}'\n" + json.dumps(data)).encode()
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def gerrit():
+    server = FakeGerrit()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(gerrit, tmp_path):
+    with GerritClient(gerrit.base_url, cache_dir=tmp_path) as client:
+        client._auth_header = "Basic dXNlcjpwYXNzd29yZA=="  # Don't ask git for credentials
+        yield client
+
+
+def get_patchset(change):
+    return GerritClient.extract_current_revision(change)[0]
+
+
+def test_get_change_revalidates_cached_change(gerrit, client):
+    gerrit.add_change(12345, 1, "2026-01-01 10:00:00")
+    assert get_patchset(client.get_change(12345)) == 1
+    assert get_patchset(client.get_change(12345)) == 1
+    gerrit.add_change(12345, 2, "2026-01-02 10:00:00")
+    assert get_patchset(client.get_change(12345)) == 2
+    assert gerrit.requests == [
+        ("/a/changes/12345", None),
+        ("/a/changes/12345", "2026-01-01 10:00:00"),
+        ("/a/changes/12345", "2026-01-01 10:00:00"),
+    ]
+
+
+def test_get_change_shares_cache_entry_of_number_and_change_id(gerrit, client, tmp_path):
+    gerrit.add_change(12345, 1, "2026-01-01 10:00:00")
+    change_id = "I" + "12345".zfill(40)
+    client.get_change(12345)
+    client.get_change(change_id)
+    client.get_change(change_id)
+    assert gerrit.requests[1:] == [(f"/a/changes/{change_id}", None), (f"/a/changes/{change_id}", "2026-01-01 10:00:00")]
+    assert [path.name for path in tmp_path.glob("*.json")] == ["12345.json"]
+
+
+def test_get_change_not_found(gerrit, client):
+    with pytest.raises(GerritError):
+        client.get_change(404)
+
+
+def test_get_changes_queries_all_changes_at_once(gerrit, client):
+    gerrit.add_change(101, 1, "2026-01-01 10:00:00")
+    gerrit.add_change(102, 3, "2026-01-01 10:00:00")
+    changes = client.get_changes([102, "I" + "101".zfill(40), "project~main~I" + "102".zfill(40)])
+    assert [change["_number"] for change in changes] == [102, 101, 102]
+    assert len(gerrit.requests) == 1
+
+    # Cache entries written by the batch query are refreshed when changes are updated
+    gerrit.add_change(101, 2, "2026-01-02 10:00:00")
+    assert [get_patchset(change) for change in client.get_changes([101, 102])] == [2, 3]
+    assert get_patchset(client.get_change(101)) == 2
+
+    with pytest.raises(GerritError):
+        client.get_changes([101, 404])
+
+
+def test_reconnects_after_server_closed_connection(gerrit, client):
+    gerrit.add_change(12345, 1, "2026-01-01 10:00:00")
+    client.get_change(12345)
+    client.get_change(12345)
+    assert gerrit.connections_count == 1
+
+    gerrit.close_after_response = True
+    client.get_change(12345)
+    client.get_change(12345)
+    assert gerrit.connections_count == 2
+    assert len(gerrit.requests) == 4
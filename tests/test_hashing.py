@@ -0,0 +1,21 @@
+import fnmatch
+
+import pytest
+
+from dush.utils.hashing import expand_patterns
+
+
+@pytest.mark.parametrize("pattern", ["[!x]*.c", "[^x]*.c", "[]x]*.c", "[!]x]*.c", "[a-c]*.c", "[!a-c]*.c"])
+def test_sets_match_like_fnmatch(tmp_path, pattern):
+    names = ["!b.c", "^b.c", "]b.c", "ab.c", "bb.c", "xb.c", "yb.c"]
+    for name in names:
+        (tmp_path / name).touch()
+
+    paths = expand_patterns([f"{tmp_path.as_posix()}/{pattern}"])
+    assert [path.rsplit("/", 1)[1] for path in paths] == sorted(name for name in names if fnmatch.fnmatchcase(name, pattern))
+
+
+def test_negated_set_does_not_match_slash(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "b").touch()
+    assert expand_patterns([f"{tmp_path.as_posix()}/a[!x]b"]) == []
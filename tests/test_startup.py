@@ -0,0 +1,107 @@
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+repo_path = Path(__file__).parent.parent
+
+# Importing everything a minimal project needs must not take longer than this. Same limit is enforced by the
+# benchmark suite, but there it's only checked when benchmarks are run.
+import_budget_seconds = 0.075
+
+# Smallest possible project script. It imports Dush the same way real projects do.
+minimal_project_source = """\
+import sys
+
+import dush.core as core
+from dush.framework import *
+from dush.utils import *
+
+
+@command
+def noop():
+    pass
+
+
+@command
+def print_modules():
+    print("\\n".join(sys.modules))
+
+
+if __name__ == "__main__":
+    framework.main()
+"""
+
+
+# Project with a cached step. Steps are decorated on load, so the decorator must not need anything expensive.
+cached_step_project_source = minimal_project_source.replace(
+    "@command\ndef noop",
+    """\
+from dush.utils import cached_step
+
+
+@cached_step(["{source_dir}/**"])
+def build(source_dir):
+    pass
+
+
+@command
+def noop""",
+)
+
+
+@pytest.fixture
+def project_script(tmp_path):
+    project_script = tmp_path / "minimal_project.py"
+    project_script.write_text(minimal_project_source)
+    return project_script
+
+
+def run_project(project_script, args, python_args=()):
+    workspace_dir = project_script.parent / "workspace"
+    workspace_dir.mkdir(exist_ok=True)
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join([str(repo_path), env.get("PYTHONPATH", "")])
+    env["DUSH_PATH"] = str(repo_path)
+    env["DUSH_WORKSPACE"] = str(workspace_dir)
+    env["XDG_CACHE_HOME"] = str(project_script.parent / "cache")
+    command = [sys.executable, *python_args, str(project_script), *args, "--", "-q"]
+    return subprocess.run(command, env=env, cwd=workspace_dir, check=True, capture_output=True, text=True)
+
+
+def measure_import_time(project_script):
+    # Python reports import time of each module in microseconds. Cumulative times of top level imports, the ones
+    # without any indentation before the module name, add up to the total import time.
+    process = run_project(project_script, ["noop"], ["-X", "importtime"])
+    total_microseconds = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip() == "cumulative" or name.startswith("  "):
+            continue
+        total_microseconds += int(cumulative)
+    return total_microseconds / 1000000
+
+
+def test_star_import_skips_expensive_modules(project_script):
+    modules = run_project(project_script, ["print_modules"]).stdout.splitlines()
+    for module in ["dush.utils.file_lock", "dush.utils.hashing", "dush.utils.jobserver", "dush.utils.step_cache", "concurrent.futures", "inspect"]:
+        assert module not in modules
+
+
+def test_cached_step_skips_expensive_modules(tmp_path):
+    project_script = tmp_path / "cached_step_project.py"
+    project_script.write_text(cached_step_project_source)
+    modules = run_project(project_script, ["print_modules"]).stdout.splitlines()
+    assert "dush.utils.step_cache" in modules
+    assert "inspect" not in modules
+    assert "concurrent.futures" not in modules
+
+
+def test_import_time_budget(project_script):
+    import_time = statistics.median(measure_import_time(project_script) for _ in range(5))
+    assert import_time <= import_budget_seconds, f"Importing a minimal project takes {import_time:.3f}s, budget is {import_budget_seconds:.3f}s"